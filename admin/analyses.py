@@ -56,9 +56,10 @@ class ListeningAnalyseAdmin(TortoiseModelAdmin):
 @register(WritingAnalyse)
 class WritingAnalyseAdmin(TortoiseModelAdmin):
     list_display = (
-        "id", "writing", "overall_band_score", "duration", "created_at",
+        "id", "writing", "overall_band_score", "duration", "prompt_version", "created_at",
     )
     list_select_related = ("writing",)
+    list_filter = ("prompt_version",)
     formfield_overrides = {
         "task_achievement_score":                (WidgetType.InputNumber, {"step": 0.1}),
         "lexical_resource_score":               (WidgetType.InputNumber, {"step": 0.1}),
@@ -94,9 +95,10 @@ class WritingAnalyseAdmin(TortoiseModelAdmin):
 @register(SpeakingAnalyse)
 class SpeakingAnalyseAdmin(TortoiseModelAdmin):
     list_display = (
-        "id", "speaking", "overall_band_score", "duration", "created_at",
+        "id", "speaking", "overall_band_score", "duration", "prompt_version", "created_at",
     )
     list_select_related = ("speaking",)
+    list_filter = ("prompt_version",)
     formfield_overrides = {
         "fluency_and_coherence_score":          (WidgetType.InputNumber, {"step": 0.1}),
         "lexical_resource_score":               (WidgetType.InputNumber, {"step": 0.1}),
@@ -132,9 +134,10 @@ class SpeakingAnalyseAdmin(TortoiseModelAdmin):
 class ReadingAnalyseAdmin(TortoiseModelAdmin):
     list_display = (
         "id", "user", "passage", "correct_answers",
-        "overall_score", "duration", "created_at",
+        "overall_score", "duration", "prompt_version", "created_at",
     )
     list_select_related = ("user", "passage")
+    list_filter = ("prompt_version",)
     formfield_overrides = {
         "correct_answers": (WidgetType.InputNumber, {}),
         "overall_score":   (WidgetType.InputNumber, {"step": 0.1}),
@@ -1,11 +1,25 @@
 from fastadmin import TortoiseModelAdmin, register, WidgetType
 from tortoise.exceptions import ValidationError as TortoiseValidationError
 from fastadmin.api.exceptions import AdminApiException
-from models import User, Reading, ReadingPassage, ReadingQuestion, ReadingVariant, ReadingAnswer
+from models import User, Reading, ReadingPassage, ReadingQuestion, ReadingVariant, ReadingAnswer, ReadingAnswerVerdict, ReadingAnswerKey
 from models.tests.constants import Constants
+from services.reading_catalogue import reading_catalogue
+
+class ReadingCatalogueAdminMixin:
+    """
+    Reloads the in-memory reading catalogue after passages, questions or variants change.
+    """
+    async def save_model(self, id: int | None, payload: dict) -> dict:
+        result = await super().save_model(id, payload)
+        reading_catalogue.invalidate()
+        return result
+
+    async def delete_model(self, id: int) -> None:
+        await super().delete_model(id)
+        reading_catalogue.invalidate()
 
 @register(ReadingPassage)
-class ReadingPassageAdmin(TortoiseModelAdmin):
+class ReadingPassageAdmin(ReadingCatalogueAdminMixin, TortoiseModelAdmin):
     list_display    = ("id", "title", "level", "number")
     list_filter     = ("level",)
     search_fields   = ("title",)
@@ -39,7 +53,7 @@ from models import ReadingQuestion, ReadingPassage
 from models.tests.constants import Constants
 
 @register(ReadingQuestion)
-class ReadingQuestionAdmin(TortoiseModelAdmin):
+class ReadingQuestionAdmin(ReadingCatalogueAdminMixin, TortoiseModelAdmin):
     list_display        = ("id", "passage", "text", "type", "score")
     list_filter         = ("passage", "type")
     list_select_related = ("passage",)
@@ -67,7 +81,7 @@ class ReadingQuestionAdmin(TortoiseModelAdmin):
 
     async def save_model(self, id: int | None, payload: dict) -> dict:
         try:
-            return await super().save_model(id, payload)
+            result = await super().save_model(id, payload)
         except TortoiseValidationError as e:
             errors = {}
             for msg in e.args:
@@ -76,9 +90,14 @@ class ReadingQuestionAdmin(TortoiseModelAdmin):
                     errors[fld.strip()] = txt.strip()
             detail = "; ".join(f"{k}: {v}" for k, v in errors.items())
             raise AdminApiException(status_code=400, detail=detail)
+        if id is not None:
+            # Cached verdicts and answer keys were made for the previous question text
+            await ReadingAnswerVerdict.filter(question_id=id).delete()
+            await ReadingAnswerKey.filter(question_id=id).delete()
+        return result
 
 @register(ReadingVariant)
-class ReadingVariantAdmin(TortoiseModelAdmin):
+class ReadingVariantAdmin(ReadingCatalogueAdminMixin, TortoiseModelAdmin):
     list_display        = ("id", "question", "text", "is_correct")
     list_filter         = ("question", "is_correct")
     list_select_related = ("question",)
@@ -209,3 +228,38 @@ class ReadingAnswerAdmin(TortoiseModelAdmin):
                     errors[fld.strip()] = txt.strip()
             detail = "; ".join(f"{k}: {v}" for k, v in errors.items())
             raise AdminApiException(status_code=400, detail=detail)
+
+@register(ReadingAnswerVerdict)
+class ReadingAnswerVerdictAdmin(TortoiseModelAdmin):
+    list_display        = ("id", "question", "answer", "is_correct", "hits")
+    list_filter         = ("question", "is_correct")
+    list_select_related = ("question",)
+    search_fields       = ("answer",)
+
+    formfield_overrides = {
+        "correct_answer": (WidgetType.TextArea, {}),
+        "explanation"   : (WidgetType.TextArea, {}),
+        "is_correct"    : (WidgetType.Switch, {}),
+    }
+
+@register(ReadingAnswerKey)
+class ReadingAnswerKeyAdmin(TortoiseModelAdmin):
+    list_display        = ("id", "question", "kind", "canonical_answer")
+    list_filter         = ("kind",)
+    list_select_related = ("question",)
+    search_fields       = ("canonical_answer",)
+
+    formfield_overrides = {
+        "canonical_answer": (WidgetType.TextArea, {}),
+        "kind"            : (WidgetType.Select, {
+            "options": [
+                {"label": k.replace("_", " ").title(), "value": k}
+                for k in (
+                    ReadingAnswerKey.TRUE_FALSE_NOT_GIVEN,
+                    ReadingAnswerKey.YES_NO_NOT_GIVEN,
+                    ReadingAnswerKey.SHORT_ANSWER,
+                    ReadingAnswerKey.FREE_FORM,
+                )
+            ]
+        }),
+    }
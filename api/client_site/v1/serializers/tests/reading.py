@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from services.reading_catalogue import reading_catalogue
 
 class VariantSerializer(BaseModel):
     id: int = Field(..., description="ID of the variant")
@@ -23,8 +24,7 @@ class QuestionListSerializer(BaseModel):
 
     @classmethod
     async def from_orm(cls, obj) -> "QuestionListSerializer":
-        variants = await obj.variants.all()
-        answers = [await VariantSerializer.from_orm(v) for v in variants]
+        answers = [await VariantSerializer.from_orm(v) for v in obj.variants]
         return cls(
             id=obj.id,
             text=obj.text,
@@ -41,8 +41,7 @@ class PassageSerializer(BaseModel):
 
     @classmethod
     async def from_orm(cls, obj) -> "PassageSerializer":
-        questions_qs = await obj.questions.all()
-        questions = [await QuestionListSerializer.from_orm(q) for q in questions_qs]
+        questions = [await QuestionListSerializer.from_orm(q) for q in obj.questions]
         return cls(
             id=obj.id,
             title=obj.title,
@@ -70,10 +69,9 @@ class QuestionAnalysisSerializer(BaseModel):
 
     @classmethod
     async def from_orm(cls, obj) -> "QuestionAnalysisSerializer":
-        variants = await obj.variants.all()
         answers = [
             {"id": v.id, "text": v.text, "is_correct": v.is_correct}
-            for v in variants
+            for v in obj.variants
         ]
         return cls(
             id=obj.id,
@@ -124,7 +122,8 @@ class ReadingSessionSerializer(BaseModel):
 
     @classmethod
     async def from_orm(cls, obj) -> "ReadingSessionSerializer":
-        passages = await obj.passages.all().prefetch_related("questions__variants")
+        passage_ids = sorted(await obj.passages.all().values_list("id", flat=True))
+        passages = await reading_catalogue.get_passages(passage_ids)
         passages_serialized = [await PassageSerializer.from_orm(p) for p in passages]
         return cls(
             id=obj.id,
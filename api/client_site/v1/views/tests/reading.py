@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, Request, HTTPException
+from fastapi import APIRouter, Depends, Query, status, Request, HTTPException
 from typing import Dict, Any
 
 from models.transactions import TransactionType
@@ -7,6 +7,7 @@ from ...serializers.tests.reading import (
     PassageSerializer,
     SubmitPassageAnswerSerializer,
 )
+from services.chatgpt.resilience import is_available
 from services.tests import ReadingService
 from utils.auth import active_user
 from utils import get_translation, check_user_tokens
@@ -88,15 +89,39 @@ async def submit_passage_answers(
 )
 async def finish_reading(
     session_id: int,
+    background: bool = Query(False, description="Queue the analysis and return a job handle"),
     user=Depends(active_user),
     t: Dict[str, str] = Depends(get_translation),
+    redis=Depends(get_arq_redis),
 ):
     """
     Finish a reading session.
+    With background=true the analysis runs on the worker; poll /analysis/status/ for the result.
+    While OpenAI is unavailable the analysis is always queued.
     """
+    if background or not is_available("gpt-4o"):
+        return await ReadingService.finish_session_background(session_id, user.id, t, redis)
     result = await ReadingService.finish_session(session_id, user.id, t)
     return result
 
+@router.get(
+    "/{session_id}/analysis/status/",
+    response_model=Dict[str, Any],
+    status_code=status.HTTP_200_OK,
+    summary="Get background reading analysis status"
+)
+async def reading_analysis_status(
+    session_id: int,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the analysis to finish (long-poll)"),
+    user=Depends(active_user),
+    t: Dict[str, str] = Depends(get_translation),
+    redis=Depends(get_arq_redis),
+):
+    """
+    Status of a queued reading analysis; includes the full analysis once ready.
+    """
+    return await ReadingService.get_analysis_status(session_id, user.id, t, redis, wait)
+
 @router.post(
     "/{session_id}/cancel/",
     response_model=Dict[str, Any],
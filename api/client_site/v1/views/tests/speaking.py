@@ -7,8 +7,10 @@ from ...serializers.tests.speaking import SpeakingSerializer
 from services.tests import SpeakingService
 from models.tests import TestTypeEnum
 from utils.auth import active_user
+from services.chatgpt.resilience import is_available
 from utils import get_translation, check_user_tokens
 from utils.arq_pool import get_arq_redis
+from utils.sse import sse_response
 
 router = APIRouter()
 
@@ -63,6 +65,8 @@ async def submit_speaking_answers(
     part3_audio: Optional[UploadFile] = File(None),
     is_finished: bool = Form(True),
     is_cancelled: bool = Form(False),
+    background: bool = Form(False),
+    stream: bool = Form(False),
     user=Depends(active_user),
     t: Dict[str, str] = Depends(get_translation),
     redis=Depends(get_arq_redis),
@@ -70,6 +74,10 @@ async def submit_speaking_answers(
 ):
     """
     Submit audio answers for a speaking session.
+    With background=true transcription and analysis run on the worker; poll /status/ for progress.
+    With stream=true the answers are transcribed, then the analysis is sent as
+    server-sent events as it is generated (see /analysis/stream/).
+    While OpenAI is unavailable the answers always go to the worker.
     """
     audio_files = {
         "part1": part1_audio,
@@ -79,16 +87,46 @@ async def submit_speaking_answers(
     lang_code = "en"
     if request:
         lang_code = request.headers.get("accept-language", "en").split(",")[0].lower()
+    if background or not (is_available("whisper-1") and is_available("gpt-4o")):
+        return await SpeakingService.submit_answers_background(
+            session_id=session_id,
+            user_id=user.id,
+            audio_files=audio_files,
+            t=t,
+            redis=redis,
+            lang_code=lang_code
+        )
     result = await SpeakingService.submit_answers(
         session_id=session_id,
         user_id=user.id,
         audio_files=audio_files,
         t=t,
-        lang_code=lang_code
+        lang_code=lang_code,
+        analyse=not stream,
+        redis=redis if stream else None,
     )
+    if stream:
+        return sse_response(await SpeakingService.stream_analysis(session_id, user.id, t, lang_code, wait=False))
     return result
 
 
+@router.get(
+    "/{session_id}/status/",
+    response_model=Dict[str, Any],
+    status_code=status.HTTP_200_OK,
+    summary="Get processing status of a submitted speaking session"
+)
+async def get_speaking_status(
+    session_id: int,
+    user=Depends(active_user),
+    t: Dict[str, str] = Depends(get_translation),
+):
+    """
+    Per-part processing state (uploaded/transcribed/analysed) and the analysis once ready.
+    """
+    return await SpeakingService.get_status(session_id, user.id, t)
+
+
 @router.post(
     "/{session_id}/cancel/",
     status_code=status.HTTP_200_OK,
@@ -140,3 +178,25 @@ async def get_speaking_analysis(
     """
     result = await SpeakingService.get_analysis(session_id, user.id, t, request)
     return result
+
+
+@router.get(
+    "/{session_id}/analysis/stream/",
+    status_code=status.HTTP_200_OK,
+    summary="Stream the analysis of a completed speaking session"
+)
+async def stream_speaking_analysis(
+    session_id: int,
+    user=Depends(active_user),
+    t: Dict[str, str] = Depends(get_translation),
+    request: Request = None,
+):
+    """
+    Server-sent events: "status" while background processing runs, "field" and
+    "delta" while the analysis is generated (scores first), then "result" with
+    the saved analysis ("error" if it failed).
+    """
+    lang_code = "en"
+    if request:
+        lang_code = request.headers.get("accept-language", "en").split(",")[0].lower()
+    return sse_response(await SpeakingService.stream_analysis(session_id, user.id, t, lang_code))
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Request
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request
+from fastapi.responses import FileResponse
 from typing import Dict, Any, Optional
 
 from models.transactions import TransactionType
@@ -7,7 +8,10 @@ from ...serializers.tests.writing import WritingSerializer, WritingSubmitRequest
 from services.tests import WritingService
 from models.tests import TestTypeEnum
 from utils.auth import active_user
+from services.chatgpt.resilience import is_available
 from utils import get_translation, check_user_tokens
+from utils.arq_pool import get_arq_redis
+from utils.sse import sse_response
 
 router = APIRouter()
 
@@ -49,6 +53,24 @@ async def get_writing_session(
     return await WritingSerializer.from_orm(session_data)
 
 
+@router.get(
+    "/{session_id}/diagram/",
+    response_class=FileResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get the Task 1 diagram of a writing session"
+)
+async def get_writing_diagram(
+    session_id: int,
+    user=Depends(active_user),
+    t: Dict[str, str] = Depends(get_translation),
+):
+    """
+    Serve the Task 1 diagram image, rendering it on first request if the file is missing.
+    """
+    path = await WritingService.get_diagram(session_id, user.id, t)
+    return FileResponse(path, headers={"Cache-Control": "private, max-age=31536000, immutable"})
+
+
 @router.post(
     "/session/{session_id}/submit/",
     status_code=status.HTTP_201_CREATED,
@@ -57,14 +79,32 @@ async def get_writing_session(
 async def submit_writing_answers(
     session_id: int,
     payload: WritingSubmitRequest,
+    stream: bool = Query(False, description="Stream the analysis as server-sent events"),
     user=Depends(active_user),
     t: Dict[str, str] = Depends(get_translation),
+    redis=Depends(get_arq_redis),
     request: Request = None,
 ):
+    """
+    Submit answers and analyse them. With stream=true the response is an
+    event stream: "field" (completed scores and texts) and "delta" (feedback
+    text as it is written) events, then "result" with the saved analysis.
+    While OpenAI is unavailable the analysis is queued instead; fetch it from /analysis/.
+    """
     lang_code = "en"
     if request:
         lang_code = request.headers.get("accept-language", "en").split(",")[0].lower()
 
+    if not is_available("gpt-4o"):
+        return await WritingService.submit_answers_background(
+            session_id=session_id,
+            user_id=user.id,
+            part1_answer=payload.part1_answer,
+            part2_answer=payload.part2_answer,
+            t=t,
+            redis=redis,
+            lang_code=lang_code,
+        )
     result = await WritingService.submit_answers(
         session_id=session_id,
         user_id=user.id,
@@ -72,7 +112,10 @@ async def submit_writing_answers(
         part2_answer=payload.part2_answer,
         t=t,
         lang_code=lang_code,
+        analyse=not stream,
     )
+    if stream:
+        return sse_response(await WritingService.stream_analysis(session_id, user.id, t, lang_code))
     return result
 
 
@@ -123,4 +166,25 @@ async def get_writing_analysis(
     Get analysis for a completed writing session.
     """
     result = await WritingService.get_analysis(session_id, user.id, t, request)
-    return result
\ No newline at end of file
+    return result
+
+@router.get(
+    "/session/{session_id}/analysis/stream/",
+    status_code=status.HTTP_200_OK,
+    summary="Stream the analysis of a completed writing session"
+)
+async def stream_writing_analysis(
+    session_id: int,
+    user=Depends(active_user),
+    t: Dict[str, str] = Depends(get_translation),
+    request: Request = None,
+):
+    """
+    Server-sent events: "field" and "delta" while the analysis is generated,
+    then "result" with the saved analysis ("error" if it failed).
+    A session that is already analysed gets the "result" event right away.
+    """
+    lang_code = "en"
+    if request:
+        lang_code = request.headers.get("accept-language", "en").split(",")[0].lower()
+    return sse_response(await WritingService.stream_analysis(session_id, user.id, t, lang_code))
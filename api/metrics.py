@@ -0,0 +1,58 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from redis.exceptions import RedisError
+
+from config import METRICS_TOKEN
+from services.chatgpt.telemetry import llm_telemetry
+
+logger = logging.getLogger("llm_telemetry")
+
+
+def check_metrics_token(authorization: Optional[str] = Header(None)):
+    """
+    The metrics are hidden (404) until METRICS_TOKEN is set.
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+
+
+def metrics_unavailable(error: RedisError) -> HTTPException:
+    """
+    The counters of all processes live in Redis; one process's own counts
+    would look like a counter reset, so the scrape fails instead.
+    """
+    logger.warning(f"LLM metrics unavailable: {error}")
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Metrics are temporarily unavailable")
+
+
+router = APIRouter(dependencies=[Depends(check_metrics_token)], include_in_schema=False)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    OpenAI call counters of the API and the worker, in the Prometheus text format.
+    """
+    try:
+        body = await llm_telemetry.render_prometheus()
+    except RedisError as e:
+        raise metrics_unavailable(e)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@router.get("/metrics/llm/")
+async def llm_metrics_summary(
+    seconds: Optional[int] = Query(None, gt=0, description="Length of the window, up to LLM_METRICS_WINDOW"),
+):
+    """
+    Calls, tokens, cache hit rate and latency per call site over a recent window.
+    """
+    try:
+        return {"features": await llm_telemetry.summary(seconds)}
+    except RedisError as e:
+        raise metrics_unavailable(e)
@@ -0,0 +1,91 @@
+"""
+Measure speaking audio pre-processing (silence trimming, mono 16 kHz, Opus):
+bytes before/after and processing time per file, optionally Whisper time.
+
+    python -m benchmarks.audio_preprocess media/user_audios/sample.webm other.wav
+    python -m benchmarks.audio_preprocess --sample 60      # synthetic 60 s stereo WAV
+    python -m benchmarks.audio_preprocess --transcribe sample.wav
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from services.audio_preprocessor import OUTPUT_EXTENSION, preprocess_file
+
+
+def make_sample(path: Path, seconds: int, rate: int = 48000):
+    """
+    Stereo 16-bit WAV: 20% leading silence, modulated tones, 20% trailing silence.
+    """
+    silence = np.zeros(int(seconds * 0.2 * rate))
+    t = np.arange(int(seconds * 0.6 * rate)) / rate
+    voice = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    mono = np.concatenate([silence, voice, silence])
+    frames = (np.stack([mono, mono], axis=1) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(frames.tobytes())
+
+
+async def transcribe_seconds(path: Path) -> float:
+    from services.chatgpt.speaking_integration import ChatGPTSpeakingIntegration
+
+    started = time.perf_counter()
+    await ChatGPTSpeakingIntegration().transcribe_audio_file_async(path)
+    return time.perf_counter() - started
+
+
+async def main(files: list[Path], transcribe: bool):
+    loop = asyncio.get_running_loop()
+    total_in = total_out = 0
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor(max_workers=1) as pool:
+        # Warm up the worker process
+        await loop.run_in_executor(pool, int, 0)
+        for src in files:
+            dst = Path(tmp) / f"{src.stem}{OUTPUT_EXTENSION}"
+            started = time.perf_counter()
+            ok = await loop.run_in_executor(pool, preprocess_file, str(src), str(dst))
+            elapsed = time.perf_counter() - started
+            if not ok:
+                print(f"{src.name}: pre-processing failed (is ffmpeg installed?)")
+                continue
+
+            size_in, size_out = src.stat().st_size, dst.stat().st_size
+            total_in += size_in
+            total_out += size_out
+            line = (
+                f"{src.name}: {size_in / 1024:.0f} KB -> {size_out / 1024:.0f} KB "
+                f"({size_out / size_in:.1%}) in {elapsed * 1000:.0f} ms"
+            )
+            if transcribe:
+                before, after = await transcribe_seconds(src), await transcribe_seconds(dst)
+                line += f", whisper {before:.1f} s -> {after:.1f} s"
+            print(line)
+
+    if total_in:
+        print(f"total: {total_in / 1024:.0f} KB -> {total_out / 1024:.0f} KB ({total_out / total_in:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark speaking audio pre-processing.")
+    parser.add_argument("files", nargs="*", type=Path, help="Audio files to process")
+    parser.add_argument("--sample", type=int, metavar="SECONDS", help="Add a synthetic stereo WAV of this length")
+    parser.add_argument("--transcribe", action="store_true", help="Also time Whisper on original and processed files")
+    args = parser.parse_args()
+
+    files = list(args.files)
+    if args.sample:
+        sample = Path(tempfile.gettempdir()) / f"speaking-sample-{args.sample}s.wav"
+        make_sample(sample, args.sample)
+        files.append(sample)
+    if not files:
+        parser.error("pass audio files or --sample SECONDS")
+    asyncio.run(main(files, args.transcribe))
@@ -0,0 +1,115 @@
+"""
+Measure writing diagram rendering: charts per second with the old pyplot code
+on the calling thread, with the chart renderer process pool and from its disk
+cache, plus the average file size.
+
+    python -m benchmarks.diagram_render
+    python -m benchmarks.diagram_render --charts 200 --workers 4 --format svg
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from services.chart_renderer import CHART_TYPES, DIAGRAM_FORMATS, ChartRenderer, render_chart
+
+
+def make_diagram(seed: int) -> dict:
+    rng = random.Random(seed)
+    categories = ["Food", "Housing", "Transport", "Health", "Leisure"]
+    return {
+        "categories": categories,
+        "year1": 2000,
+        "year2": 2020,
+        "data_year1": [rng.randint(5, 40) for _ in categories],
+        "data_year2": [rng.randint(5, 40) for _ in categories],
+    }
+
+
+def render_pyplot(chart_type: str, diagram_data: dict) -> bytes:
+    """
+    The previous implementation: global pyplot state, one call at a time.
+    """
+    import io
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    d = diagram_data
+    if chart_type == "pie":
+        fig, axs = plt.subplots(1, 2, figsize=(12, 6))
+        axs[0].pie(d["data_year1"], labels=d["categories"], autopct="%1.1f%%", startangle=140)
+        axs[1].pie(d["data_year2"], labels=d["categories"], autopct="%1.1f%%", startangle=140)
+    else:
+        fig, ax = plt.subplots(figsize=(8, 6))
+        draw = ax.bar if chart_type == "bar" else ax.plot
+        draw(d["categories"], d["data_year1"], label=str(d["year1"]))
+        draw(d["categories"], d["data_year2"], label=str(d["year2"]))
+        ax.legend()
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png")
+    plt.close()
+    return buffer.getvalue()
+
+
+async def loop_lag(stop: asyncio.Event) -> float:
+    """
+    Longest delay of a 10 ms timer while rendering runs, i.e. how long the loop was blocked.
+    """
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst
+
+
+async def main(charts: int, workers: int, fmt: str):
+    jobs = [(CHART_TYPES[i % len(CHART_TYPES)], make_diagram(i)) for i in range(charts)]
+
+    async def inline():
+        for chart_type, data in jobs:
+            render_pyplot(chart_type, data)
+            await asyncio.sleep(0)
+
+    async def pooled(renderer: ChartRenderer):
+        await asyncio.gather(*[renderer.render(chart_type, data) for chart_type, data in jobs])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp) / "diagrams"
+        renderer = ChartRenderer(workers=workers, output_dir=output_dir, media_dir=Path(tmp), fmt=fmt)
+        # Warm up both paths (imports, fonts, worker processes) on a chart outside the run
+        warmup = ("bar", make_diagram(-1))
+        render_pyplot(*warmup)
+        render_chart(*warmup)
+        await renderer.render(*warmup)
+
+        runs = (
+            ("pyplot on the loop", inline),
+            (f"process pool x{workers}", lambda: pooled(renderer)),
+            ("disk cache", lambda: pooled(renderer)),
+        )
+        for name, run in runs:
+            stop = asyncio.Event()
+            lag = asyncio.create_task(loop_lag(stop))
+            started = time.perf_counter()
+            await run()
+            elapsed = time.perf_counter() - started
+            stop.set()
+            print(f"{name:>22}: {charts / elapsed:7.1f} charts/s, worst loop stall {await lag * 1000:7.1f} ms")
+        renderer.shutdown()
+
+        sizes = [path.stat().st_size for path in output_dir.iterdir()]
+        print(f"{fmt} files: {len(sizes)}, average {sum(sizes) / len(sizes) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--charts", type=int, default=60, help="charts to render per run")
+    parser.add_argument("--workers", type=int, default=2, help="renderer worker processes")
+    parser.add_argument("--format", choices=DIAGRAM_FORMATS, default="png", help="diagram file format")
+    args = parser.parse_args()
+    asyncio.run(main(args.charts, args.workers, args.format))
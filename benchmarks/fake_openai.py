@@ -0,0 +1,186 @@
+"""
+Local stand-in for the OpenAI API, for exercising retries, hedging and the
+circuit breaker without spending tokens. Serves chat completions (plain,
+JSON-schema and streamed) and audio transcriptions with configurable
+latency and failures:
+
+    python -m benchmarks.fake_openai --port 8089 --error-rate 0.2 --slow-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 uvicorn main:app
+
+Behaviour can be changed while it runs (e.g. to simulate an outage):
+
+    curl -X POST localhost:8089/_fake/config -d '{"error_rate": 1.0}'
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+app = FastAPI(title="Fake OpenAI")
+
+settings = {
+    "latency": 0.2,  # seconds before a normal reply
+    "slow_rate": 0.0,  # share of replies that take slow_latency instead
+    "slow_latency": 5.0,
+    "error_rate": 0.0,  # share of requests answered with a 500
+    "rate_limit_rate": 0.0,  # share of requests answered with a 429
+    "chunk_delay": 0.01,  # seconds between streamed chunks
+}
+stats = {"requests": 0, "errors": 0}
+
+
+def sample_value(schema: dict, defs: dict):
+    """
+    Smallest value matching a (strict structured outputs) JSON schema.
+    """
+    if "$ref" in schema:
+        return sample_value(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: sample_value(value, defs) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_value(schema.get("items", {}), defs)]
+    if kind == "number":
+        return 6.0
+    if kind == "integer":
+        return 1
+    if kind == "boolean":
+        return True
+    return "Fake text from the local OpenAI stand-in."
+
+
+async def misbehave():
+    """
+    Wait like the real API and maybe fail; returns an error response or None.
+    """
+    stats["requests"] += 1
+    roll = random.random()
+    if roll < settings["error_rate"]:
+        stats["errors"] += 1
+        await asyncio.sleep(settings["latency"] / 4)
+        return JSONResponse({"error": {"message": "Fake server error", "type": "server_error"}}, status_code=500)
+    if roll < settings["error_rate"] + settings["rate_limit_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(
+            {"error": {"message": "Fake rate limit", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": "1"},
+        )
+    slow = random.random() < settings["slow_rate"]
+    await asyncio.sleep(settings["slow_latency"] if slow else settings["latency"])
+    return None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    try:
+        body = await request.json()
+    except ClientDisconnect:
+        # A hedged duplicate that lost the race
+        return Response(status_code=499)
+    error = await misbehave()
+    if error is not None:
+        return error
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        content = json.dumps(sample_value(schema, schema.get("$defs", {})))
+    elif response_format.get("type") == "json_object":
+        content = "{}"
+    else:
+        content = "Fake reply from the local OpenAI stand-in."
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4o")
+    # About four characters per token, like the real tokenizer on English text
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in body.get("messages", [])) // 4
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": prompt_tokens + len(content) // 4,
+    }
+
+    if body.get("stream"):
+        async def chunks():
+            for i in range(0, len(content), 8):
+                delta = {"content": content[i:i + 8]}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(settings["chunk_delay"])
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    await request.body()
+    error = await misbehave()
+    if error is not None:
+        return error
+    return PlainTextResponse("This is a fake transcript of the answer.")
+
+
+@app.post("/_fake/config")
+async def update_config(request: Request):
+    settings.update({key: float(value) for key, value in (await request.json()).items() if key in settings})
+    return settings
+
+
+@app.get("/_fake/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    for key, value in settings.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=value)
+    args = parser.parse_args()
+    settings.update({key: getattr(args, key) for key in settings})
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
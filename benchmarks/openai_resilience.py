@@ -0,0 +1,107 @@
+"""
+Exercise the OpenAI resilience layer (services/chatgpt/resilience.py) against
+the local fake server, in-process:
+
+    tail    - 5% of replies are slow: p50/p99 with and without hedging
+    flaky   - 20% of requests fail: success rate with and without retries
+    outage  - every request fails: requests sent and time to fail, with the
+              circuit breaker versus plain retries
+
+    python -m benchmarks.openai_resilience --calls 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import openai
+import uvicorn
+
+from benchmarks import fake_openai
+from services.chatgpt import resilience
+from services.chatgpt.resilience import CircuitBreaker, ProviderUnavailableError, call_openai
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def run_calls(client: openai.AsyncOpenAI, model: str, calls: int, concurrency: int, **policy) -> dict:
+    """
+    Send `calls` completions through call_openai; returns latencies and outcome counts.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    requests_before = fake_openai.stats["requests"]
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call_openai(
+                    model,
+                    lambda: client.chat.completions.create(model=model, messages=[{"role": "user", "content": "hi"}]),
+                    **policy,
+                )
+            except (ProviderUnavailableError, openai.OpenAIError):
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(calls)])
+    return {
+        "elapsed": time.perf_counter() - started,
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 0.99),
+        "ok": calls - failures,
+        "sent": fake_openai.stats["requests"] - requests_before,
+    }
+
+
+def report(name: str, result: dict, calls: int):
+    print(
+        f"{name:>28}: ok {result['ok']:4}/{calls}, sent {result['sent']:4}, "
+        f"p50 {result['p50'] * 1000:7.0f} ms, p99 {result['p99'] * 1000:7.0f} ms, total {result['elapsed']:5.1f} s"
+    )
+
+
+async def main(calls: int, port: int, concurrency: int):
+    server = uvicorn.Server(uvicorn.Config(fake_openai.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    client = openai.AsyncOpenAI(api_key="sk-fake", base_url=f"http://127.0.0.1:{port}/v1", max_retries=0, timeout=30)
+    base = {"latency": 0.05, "slow_rate": 0.0, "slow_latency": 2.0, "error_rate": 0.0, "rate_limit_rate": 0.0}
+
+    print("tail: 5% of replies take 2 s")
+    fake_openai.settings.update(base, slow_rate=0.05)
+    report("no hedging", await run_calls(client, "tail-plain", calls, concurrency, hedge_after=0), calls)
+    report("hedge after 150 ms", await run_calls(client, "tail-hedged", calls, concurrency, hedge_after=0.15), calls)
+
+    print("flaky: 20% of requests fail with 500")
+    fake_openai.settings.update(base, error_rate=0.2)
+    report("no retries", await run_calls(client, "flaky-plain", calls, concurrency, retries=0), calls)
+    report("2 retries, jittered", await run_calls(client, "flaky-retry", calls, concurrency, retries=2), calls)
+
+    print("outage: every request fails")
+    fake_openai.settings.update(base, error_rate=1.0)
+    # A threshold no run reaches stands for "no breaker"
+    resilience._breakers["outage-plain"] = CircuitBreaker("outage-plain", threshold=10 ** 9)
+    report("retries, no breaker", await run_calls(client, "outage-plain", calls, concurrency, retries=2), calls)
+    report("retries + breaker", await run_calls(client, "outage-breaker", calls, concurrency, retries=2), calls)
+
+    await client.close()
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="completions per run")
+    parser.add_argument("--concurrency", type=int, default=20, help="calls in flight at once")
+    parser.add_argument("--port", type=int, default=8089, help="port of the in-process fake server")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.port, args.concurrency))
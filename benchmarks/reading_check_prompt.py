@@ -0,0 +1,130 @@
+"""
+Prompt size of reading answer checks on the fixture passages:
+
+    legacy  - full passage, all questions and the old template; the model
+              echoes answers and computes stats (one request per user)
+    compact - relevant sentences only, verdict-only output
+    batched - compact, with the checks of concurrent users sent together
+
+Tokens are counted with tiktoken when it is available, otherwise estimated.
+ChatGPT is replaced by a stub that returns a verdict for every question.
+
+    python -m benchmarks.reading_check_prompt --users 8 --answers 2
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from config import BASE_DIR
+from services.chatgpt import reading_integration
+from services.chatgpt.passage_index import estimate_tokens
+from services.chatgpt.reading_integration import ChatGPTReadingIntegration, PassageCheckBatcher
+from services.chatgpt.schemas import ReadingAnswerChecks
+
+LEGACY_TEMPLATE = 'PROMPT_TEMPLATE = """\nYou are an IELTS Reading answer evaluator.\n\nFor each passage, you will receive:\n- passage_id (from the database)\n- a list of questions, each with question_id (from the database), question text, type, and user_answer.\n\nDo not process MULTIPLE_CHOICE questions here. Only TEXT questions require evaluation.\n\nYour task:\n1. Return an object for the passage with:\n   - analysis: an array of objects, one per question, each with:\n       question_id: (must match the input question_id)\n       user_answer: (exactly as provided)\n       correct_answer: (the expected correct text, if provided. Otherwise, empty)\n       explanation: (short reason if incorrect; empty if correct)\n       is_correct: (true or false for each question, never null)\n\n2. stats (object) for the passage:\n   - total_correct: (int)\n   - total_questions: (int)\n   - accuracy: (percentage, int: e.g., 50 means 50%)\n   - overall_score: (IELTS band from 0-9, int)\n\nReturn ONLY the JSON object, without markdown, comments, or explanations about your process.\n\nExample (including an incorrect answer):\n```json\n{\n  "analysis": [\n    {\n      "question_id": 501,\n      "user_answer": "Gene editing can alter DNA to treat diseases",\n      "correct_answer": "Gene editing can alter DNA to treat diseases",\n      "explanation": "",\n      "is_correct": true\n    },\n    {\n      "question_id": 502,\n      "user_answer": "It reduces greenhouse gas emissions",\n      "correct_answer": "It doesn\'t directly address fossil fuel usage",\n      "explanation": "The provided answer doesn\'t match the intended context of gene editing",\n      "is_correct": false\n    }\n  ],\n  "stats": {\n    "total_correct": 1,\n    "total_questions": 2,\n    "accuracy": 50,\n    "overall_score": 5\n  }\n}\n```\nHere is the data to analyze:\n(data)\n"""\n'
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.encoding_for_model("gpt-4o")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+except Exception:
+    # Not installed, or its encoding files cannot be downloaded
+    count_tokens = estimate_tokens
+
+
+def load_fixtures() -> list[tuple[dict, list[dict]]]:
+    """
+    Fixture passages with their TEXT questions.
+    """
+    with open(BASE_DIR / "fixtures" / "reading_passages.json", encoding="utf-8") as f:
+        passages = json.load(f)
+    with open(BASE_DIR / "fixtures" / "reading_questions.json", encoding="utf-8") as f:
+        questions = json.load(f)
+    by_passage = {}
+    for q in questions:
+        if q["type"] == "TEXT":
+            by_passage.setdefault(q["passage_id"], []).append(q)
+    return [(p, by_passage[p["id"]]) for p in passages if by_passage.get(p["id"])]
+
+
+def legacy_prompt(passage: dict, questions: list[dict]) -> str:
+    payload = [{"passage_id": passage["id"], "text": passage["text"], "questions": questions}]
+    return LEGACY_TEMPLATE.replace("(data)", json.dumps(payload, ensure_ascii=False))
+
+
+class Recorder:
+    """
+    Stub for _structured_completion: records prompt tokens and the output budget.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.max_tokens = 0
+
+    async def __call__(self, model, messages, schema, cached=False, **kwargs):
+        prompt = messages[0]["content"]
+        self.requests += 1
+        self.prompt_tokens += count_tokens(prompt)
+        self.max_tokens += kwargs.get("max_tokens", 0)
+        payload = json.loads(prompt[prompt.index("Data:") + len("Data:"):])
+        await asyncio.sleep(0.01)
+        return ReadingAnswerChecks(analysis=[
+            {"question_id": q["id"], "correct_answer": "", "explanation": "", "is_correct": True}
+            for q in payload["questions"]
+        ])
+
+
+async def main(users: int, answers: int, seed: int):
+    rng = random.Random(seed)
+    fixtures = load_fixtures()
+    recorder = Recorder()
+
+    async def structured_completion(integration, *args, **kwargs):
+        return await recorder(*args, **kwargs)
+
+    reading_integration.BaseChatGPTIntegration._structured_completion = structured_completion
+
+    # Every user answers `answers` random free-form questions of each passage; a few answers repeat
+    sessions = []
+    for _ in range(users):
+        session = []
+        for passage, questions in fixtures:
+            picked = rng.sample(questions, min(answers, len(questions)))
+            session.append((passage, [
+                {"question_id": q["id"], "question": q["text"], "type": q["type"],
+                  "user_answer": rng.choice(["renewable energy", "it helps farmers", f"answer {rng.randint(1, 50)}"])}
+                for q in picked
+            ]))
+        sessions.append(session)
+
+    legacy_tokens = sum(
+        count_tokens(legacy_prompt(passage, questions)) for session in sessions for passage, questions in session
+    )
+    legacy_requests = sum(len(session) for session in sessions)
+    # The legacy call reserved 6000 output tokens per request
+    print(f"{'legacy':>8}: {legacy_requests:5} requests, {legacy_tokens:8} prompt tokens, "
+          f"{legacy_tokens / legacy_requests:6.0f} per request, output budget {6000 * legacy_requests}")
+
+    for name, window in (("compact", 0), ("batched", 0.05)):
+        recorder.__init__()
+        reading_integration.passage_check_batcher = PassageCheckBatcher(window=window)
+        integration = ChatGPTReadingIntegration(api_key="sk-benchmark")
+        await asyncio.gather(*[
+            integration.check_passage_answers(passage["text"], questions, passage_id=passage["id"])
+            for session in sessions for passage, questions in session
+        ])
+        print(f"{name:>8}: {recorder.requests:5} requests, {recorder.prompt_tokens:8} prompt tokens, "
+              f"{recorder.prompt_tokens / recorder.requests:6.0f} per request, output budget {recorder.max_tokens}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8, help="sessions checked at the same time")
+    parser.add_argument("--answers", type=int, default=2, help="free-form answers per passage sent to ChatGPT")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.answers, args.seed))
@@ -0,0 +1,106 @@
+"""
+Writing analysis jobs in the worker, one request each versus micro-batched
+(WritingAnalysisBatcher): requests sent, prompt tokens and the time a job
+takes. ChatGPT is replaced by a stub that answers after a fixed latency plus
+a per-candidate generation time; jobs arrive at random over `--spread` seconds.
+
+    python -m benchmarks.worker_batching
+    python -m benchmarks.worker_batching --jobs 200 --spread 5 --window 1 --max-items 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from services.chatgpt import writing_integration
+from services.chatgpt.passage_index import estimate_tokens
+from services.chatgpt.schemas import WritingAnalyses, WritingAnalysis
+from services.chatgpt.writing_integration import WritingAnalysisBatcher
+
+CRITERION = {"Score": 6.0, "Feedback": "Adequate."}
+TASK1 = {
+    key: CRITERION
+    for key in ("TaskAchievement", "CoherenceAndCohesion", "LexicalResource", "GrammaticalRangeAndAccuracy", "WordCount")
+} | {"TimingFeedback": {"Feedback": "On time."}}
+TASK2 = {
+    key: CRITERION
+    for key in ("TaskResponse", "CoherenceAndCohesion", "LexicalResource", "GrammaticalRangeAndAccuracy", "WordCount")
+} | {"TimingFeedback": {"Feedback": "On time."}}
+
+
+class Recorder:
+    """
+    Stub for _structured_completion: counts requests and prompt tokens.
+    """
+    def __init__(self, latency: float, per_candidate: float):
+        self.latency = latency
+        self.per_candidate = per_candidate
+        self.requests = 0
+        self.prompt_tokens = 0
+
+    async def __call__(self, model, messages, schema, cached=False, **kwargs):
+        self.requests += 1
+        self.prompt_tokens += sum(estimate_tokens(message["content"]) for message in messages)
+        data = json.loads(messages[-1]["content"])
+        # Output is generated token by token, so a batch takes longer than one analysis
+        await asyncio.sleep(self.latency + self.per_candidate * len(data))
+        if schema is WritingAnalysis:
+            return WritingAnalysis(Task1=TASK1, Task2=TASK2, overall_feedback="ok")
+        return WritingAnalyses(analyses=[
+            {"candidate": item["candidate"], "Task1": TASK1, "Task2": TASK2, "overall_feedback": "ok"}
+            for item in data
+        ])
+
+
+def make_test(rng: random.Random) -> tuple:
+    words = " ".join(rng.choice(["people", "cities", "should", "because", "however", "growth"]) for _ in range(260))
+    part1 = SimpleNamespace(
+        content="The chart shows household spending in 2000 and 2020.",
+        diagram_data={"categories": ["Food", "Housing", "Transport"], "data_year1": [20, 30, 10], "data_year2": [15, 40, 12]},
+        answer=words[:900],
+    )
+    part2 = SimpleNamespace(content="Some people think cities should ban cars. Discuss both views.", answer=words)
+    return part1, part2
+
+
+async def main(jobs: int, spread: float, window: float, max_items: int, latency: float, seed: int):
+    rng = random.Random(seed)
+    tests = [make_test(rng) for _ in range(jobs)]
+    arrivals = sorted(rng.uniform(0, spread) for _ in range(jobs))
+    recorder = Recorder(latency, per_candidate=latency / 2)
+
+    async def structured_completion(integration, *args, **kwargs):
+        return await recorder(*args, **kwargs)
+
+    writing_integration.BaseChatGPTIntegration._structured_completion = structured_completion
+
+    for name, batch_window in (("one by one", 0), (f"batched {window}s/{max_items}", window)):
+        recorder.requests = recorder.prompt_tokens = 0
+        batcher = WritingAnalysisBatcher(window=batch_window, max_items=max_items)
+        started = time.perf_counter()
+
+        async def job(test: tuple, arrival: float) -> float:
+            await asyncio.sleep(arrival)
+            job_started = time.perf_counter()
+            await batcher.analyse(*test, lang_code="en")
+            return time.perf_counter() - job_started
+
+        durations = await asyncio.gather(*[job(test, arrival) for test, arrival in zip(tests, arrivals)])
+        elapsed = time.perf_counter() - started
+        print(f"{name:>18}: {recorder.requests:4} requests, {recorder.prompt_tokens:7} prompt tokens, "
+              f"job p50 {statistics.median(durations):5.2f}s max {max(durations):5.2f}s, all done in {elapsed:5.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=100, help="writing analysis jobs")
+    parser.add_argument("--spread", type=float, default=5.0, help="seconds over which jobs arrive")
+    parser.add_argument("--window", type=float, default=1.0, help="batch window in seconds")
+    parser.add_argument("--max-items", type=int, default=4, help="candidates per batched request")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub time to first token in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.jobs, args.spread, args.window, args.max_items, args.latency, args.seed))
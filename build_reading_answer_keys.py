@@ -0,0 +1,23 @@
+import argparse
+import asyncio
+from tortoise import Tortoise
+
+from config import DATABASE_CONFIG
+from services.analyses.reading_answer_key_service import ReadingAnswerKeyService
+
+
+async def main(passage_ids: list[int] | None, overwrite: bool):
+    await Tortoise.init(config=DATABASE_CONFIG)
+    try:
+        saved = await ReadingAnswerKeyService.build(passage_ids=passage_ids, overwrite=overwrite)
+        print(f"✅ {saved} answer keys saved")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Derive answer keys for reading TEXT questions.")
+    parser.add_argument("--passage", type=int, action="append", dest="passage_ids", help="Passage id (repeatable), all passages by default")
+    parser.add_argument("--overwrite", action="store_true", help="Rebuild keys that already exist")
+    args = parser.parse_args()
+    asyncio.run(main(args.passage_ids, args.overwrite))
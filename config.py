@@ -53,6 +53,77 @@ DATABASE_CONFIG = {
 
 REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
 
+# === LLM response cache ===
+LLM_CACHE_ENABLED = config("LLM_CACHE_ENABLED", cast=bool, default=True)
+LLM_CACHE_TTL = config("LLM_CACHE_TTL", cast=int, default=60 * 60 * 24 * 7)
+LLM_CACHE_MAX_ENTRIES = config("LLM_CACHE_MAX_ENTRIES", cast=int, default=50000)
+
+# === Reading catalogue ===
+READING_CATALOGUE_MAX_AGE = config("READING_CATALOGUE_MAX_AGE", cast=int, default=300)
+
+# === Reading answer checks ===
+# Passage context sent per free-form question, in tokens; the whole text is sent
+# when the excerpts would cover more than READING_EXCERPT_MAX_SHARE of it
+READING_EXCERPT_TOKENS = config("READING_EXCERPT_TOKENS", cast=int, default=160)
+READING_EXCERPT_MAX_SHARE = config("READING_EXCERPT_MAX_SHARE", cast=float, default=0.75)
+# Checks of the same passage arriving within the window share one request (0 disables)
+READING_CHECK_BATCH_WINDOW = config("READING_CHECK_BATCH_WINDOW", cast=float, default=0.2)
+READING_CHECK_BATCH_MAX = config("READING_CHECK_BATCH_MAX", cast=int, default=30)
+
+# === Background analysis ===
+# Longest time a status request waits for a queued analysis (long-poll)
+ANALYSIS_MAX_WAIT = config("ANALYSIS_MAX_WAIT", cast=float, default=25.0)
+# Streamed (SSE) analysis: longest wait for background transcription, and keep-alive interval
+ANALYSIS_STREAM_MAX_WAIT = config("ANALYSIS_STREAM_MAX_WAIT", cast=float, default=120.0)
+ANALYSIS_STREAM_KEEPALIVE = config("ANALYSIS_STREAM_KEEPALIVE", cast=float, default=15.0)
+# A streamed submit also queues the analysis this many seconds later, in case the stream does not finish
+ANALYSIS_STREAM_FALLBACK_DELAY = config("ANALYSIS_STREAM_FALLBACK_DELAY", cast=float, default=300.0)
+
+# === Analysis worker (arq) ===
+# Jobs run at once per worker; they mostly wait on OpenAI, whose concurrency is capped separately
+WORKER_MAX_JOBS = config("WORKER_MAX_JOBS", cast=int, default=50)
+# Queued jobs can wait a little longer than users on the site for their batch to fill up
+WORKER_READING_CHECK_BATCH_WINDOW = config("WORKER_READING_CHECK_BATCH_WINDOW", cast=float, default=1.0)
+# Writing analyses in the same language arriving within the window share one request (0 disables).
+# Each one is ~1.5k output tokens, so a few fit in gpt-4o's output limit
+WRITING_ANALYSE_BATCH_WINDOW = config("WRITING_ANALYSE_BATCH_WINDOW", cast=float, default=2.0)
+WRITING_ANALYSE_BATCH_MAX = config("WRITING_ANALYSE_BATCH_MAX", cast=int, default=4)
+
+# === Audio pre-processing ===
+AUDIO_PREPROCESS_ENABLED = config("AUDIO_PREPROCESS_ENABLED", cast=bool, default=True)
+AUDIO_PREPROCESS_WORKERS = config("AUDIO_PREPROCESS_WORKERS", cast=int, default=2)
+AUDIO_PREPROCESS_TIMEOUT = config("AUDIO_PREPROCESS_TIMEOUT", cast=float, default=60.0)
+AUDIO_SILENCE_THRESHOLD_DB = config("AUDIO_SILENCE_THRESHOLD_DB", cast=int, default=-50)
+AUDIO_BITRATE = config("AUDIO_BITRATE", default="24k")
+FFMPEG_BINARY = config("FFMPEG_BINARY", default="ffmpeg")
+
+# === Writing question generation ===
+# Deadline for generating both writing tasks
+WRITING_GENERATION_TIMEOUT = config("WRITING_GENERATION_TIMEOUT", cast=float, default=60.0)
+
+# === Chart rendering ===
+CHART_RENDER_WORKERS = config("CHART_RENDER_WORKERS", cast=int, default=1)
+# Writing diagram file format: "png" or "svg"
+DIAGRAM_FORMAT = config("DIAGRAM_FORMAT", default="png")
+# Unreferenced diagram files younger than this are kept by the cleanup job
+DIAGRAM_GC_GRACE = config("DIAGRAM_GC_GRACE", cast=int, default=60 * 60 * 24)
+
+# === Task pools ===
+# Ready-made test content kept in Redis and refilled by the arq worker
+SPEAKING_POOL_SIZE = config("SPEAKING_POOL_SIZE", cast=int, default=50)
+WRITING_POOL_SIZE = config("WRITING_POOL_SIZE", cast=int, default=30)
+TASK_POOL_REFILL_BATCH = config("TASK_POOL_REFILL_BATCH", cast=int, default=10)
+
+# === Transcription ===
+# Backend names: "openai" (whisper-1 API) or "local" (faster-whisper on CPU)
+TRANSCRIPTION_BACKEND = config("TRANSCRIPTION_BACKEND", default="openai")
+# Backend used when the primary one is rate limited or unavailable, empty to disable
+TRANSCRIPTION_FALLBACK = config("TRANSCRIPTION_FALLBACK", default="")
+LOCAL_WHISPER_MODEL = config("LOCAL_WHISPER_MODEL", default="small")
+LOCAL_WHISPER_COMPUTE_TYPE = config("LOCAL_WHISPER_COMPUTE_TYPE", default="int8")
+LOCAL_WHISPER_WORKERS = config("LOCAL_WHISPER_WORKERS", cast=int, default=1)
+LOCAL_WHISPER_CPU_THREADS = config("LOCAL_WHISPER_CPU_THREADS", cast=int, default=4)
+
 # === Email settings ===
 EMAIL_BACKEND = config("EMAIL_BACKEND", default="http")  # smtp или http
 EMAIL_FROM = config("EMAIL_FROM", default="no-reply@example.com")
@@ -76,6 +147,55 @@ GOOGLE_CLIENT_ID = config("GOOGLE_CLIENT_ID", default="")
 GOOGLE_CLIENT_SECRET = config("GOOGLE_CLIENT_SECRET", default="https://maps.googleapis.com/maps/api/place/autocomplete/json")
 OPENAI_API_KEY = config("OPENAI_API_KEY", default="")
 
+# === Prompts ===
+# How often a prompt file is checked for changes when used, in seconds (0 disables reloading)
+PROMPT_RELOAD_INTERVAL = config("PROMPT_RELOAD_INTERVAL", cast=float, default=5.0)
+
+# === OpenAI client settings ===
+OPENAI_TIMEOUT = config("OPENAI_TIMEOUT", cast=float, default=120.0)
+OPENAI_MAX_CONNECTIONS = config("OPENAI_MAX_CONNECTIONS", cast=int, default=100)
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = config("OPENAI_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=20)
+OPENAI_MAX_CONCURRENCY = config("OPENAI_MAX_CONCURRENCY", cast=int, default=32)
+# Extra requests for a structured reply that does not match its schema
+OPENAI_STRUCTURED_RETRIES = config("OPENAI_STRUCTURED_RETRIES", cast=int, default=1)
+# Per-model limits as "model:limit" pairs, e.g. "gpt-4o:16,whisper-1:8"
+OPENAI_MODEL_CONCURRENCY = {
+    model.strip(): int(limit)
+    for model, limit in (
+        item.rsplit(":", 1) for item in config("OPENAI_MODEL_CONCURRENCY", cast=Csv(), default="gpt-4o:16,whisper-1:8")
+    )
+}
+
+# === OpenAI resilience ===
+# Alternative API endpoint, e.g. a local fake server (benchmarks/fake_openai.py)
+OPENAI_BASE_URL = config("OPENAI_BASE_URL", default=None)
+# Total time for one call including retries, in seconds
+OPENAI_CALL_DEADLINE = config("OPENAI_CALL_DEADLINE", cast=float, default=120.0)
+# Extra attempts after timeouts, connection errors, 429 and 5xx
+OPENAI_RETRIES = config("OPENAI_RETRIES", cast=int, default=2)
+OPENAI_RETRY_BASE_DELAY = config("OPENAI_RETRY_BASE_DELAY", cast=float, default=0.5)
+OPENAI_RETRY_MAX_DELAY = config("OPENAI_RETRY_MAX_DELAY", cast=float, default=8.0)
+# Send a second identical request when the first is slower than this, as
+# "model:seconds" pairs, e.g. "gpt-4o-mini:4". Empty disables hedging.
+OPENAI_HEDGE_AFTER = {
+    model.strip(): float(seconds)
+    for model, seconds in (
+        item.rsplit(":", 1) for item in config("OPENAI_HEDGE_AFTER", cast=Csv(), default="")
+    )
+}
+# Consecutive failures that open a model's circuit breaker, and seconds before a trial call
+OPENAI_BREAKER_THRESHOLD = config("OPENAI_BREAKER_THRESHOLD", cast=int, default=5)
+OPENAI_BREAKER_RESET = config("OPENAI_BREAKER_RESET", cast=float, default=30.0)
+
+# === LLM telemetry ===
+LLM_METRICS_ENABLED = config("LLM_METRICS_ENABLED", cast=bool, default=True)
+# Counts are written to Redis at most this often per process, in seconds
+LLM_METRICS_FLUSH_INTERVAL = config("LLM_METRICS_FLUSH_INTERVAL", cast=float, default=10.0)
+# Per-minute history kept for the rolling summary, in seconds
+LLM_METRICS_WINDOW = config("LLM_METRICS_WINDOW", cast=int, default=60 * 60 * 24)
+# Bearer token required by /metrics and /metrics/llm/ (empty: endpoints return 404)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
 # === Telegram bot settings ===
 TELEGRAM_BOT_TOKEN = config("TELEGRAM_BOT_TOKEN", default="")
 
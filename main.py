@@ -7,6 +7,13 @@ from config import (
     DATABASE_CONFIG, ALLOWED_HOSTS, ADMIN_SECRET_KEY
 )
 from api.client_site.v1 import router as client_site_v1_router
+from api.metrics import router as metrics_router
+from services.chatgpt.base_integration import close_async_clients
+from services.chatgpt.telemetry import llm_telemetry
+from services.reading_catalogue import reading_catalogue
+from services.audio_preprocessor import audio_preprocessor
+from services.chart_renderer import chart_renderer
+from services.transcription import transcription_backend
 
 # === Logging configuration ===
 logging.basicConfig(
@@ -41,6 +48,7 @@ app.add_middleware(
 
 # === Routers and static files ===
 app.include_router(client_site_v1_router, prefix="/api/v1")
+app.include_router(metrics_router)
 app.mount("/media", StaticFiles(directory="media"), name="media")
 
 # === Database setup ===
@@ -56,6 +64,31 @@ import admin
 from fastadmin import fastapi_app as admin_app
 
 app.mount("/admin", admin_app, name="admin")
+
+# === Startup hooks ===
+@app.on_event("startup")
+async def load_reading_catalogue():
+    try:
+        await reading_catalogue.load()
+    except Exception as e:
+        # The catalogue is loaded lazily on first use instead
+        logging.getLogger("reading_catalogue").warning(f"Reading catalogue not preloaded: {e}")
+
+# === Shutdown hooks ===
+@app.on_event("shutdown")
+async def shutdown_openai_clients():
+    await close_async_clients()
+    await llm_telemetry.flush()
+
+@app.on_event("shutdown")
+def shutdown_audio_workers():
+    audio_preprocessor.shutdown()
+    transcription_backend.shutdown()
+
+@app.on_event("shutdown")
+def shutdown_chart_workers():
+    chart_renderer.shutdown()
+
 # === Root endpoint ===
 @app.get("/")
 def read_root():
@@ -40,6 +40,7 @@ class WritingAnalyse(BaseModel):
     overall_band_score = fields.DecimalField(max_digits=3, decimal_places=1, description="Overall band score")
     total_feedback = fields.TextField(description="Overall feedback")
     duration = fields.TimeDeltaField(null=True, description="Time taken for the test")
+    prompt_version = fields.CharField(max_length=255, null=True, description="Prompt templates the analysis was made with")
 
     class Meta:
         table = "writing_analyses"
@@ -64,6 +65,7 @@ class SpeakingAnalyse(BaseModel):
     pronunciation_score = fields.DecimalField(max_digits=3, decimal_places=1, null=True, description="Pronunciation score")
     pronunciation_feedback = fields.TextField(null=True, description="Feedback on pronunciation")
     duration = fields.TimeDeltaField(null=True, description="Duration of the speaking test")
+    prompt_version = fields.CharField(max_length=255, null=True, description="Prompt templates the analysis was made with")
 
     class Meta:
         table = "speaking_analyses"
@@ -81,6 +83,7 @@ class ReadingAnalyse(BaseModel):
     correct_answers = fields.IntField(default=0, description="Number of correct answers")
     overall_score = fields.DecimalField(max_digits=5, decimal_places=2, description="Overall score")
     duration = fields.TimeDeltaField(null=True, description="Time taken for the test")
+    prompt_version = fields.CharField(max_length=255, null=True, description="Answer-check prompt used, if ChatGPT checked any answer")
 
     class Meta:
         table = "reading_analyses"
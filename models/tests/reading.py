@@ -93,3 +93,41 @@ class ReadingVariant(BaseModel):
 
     def __str__(self) -> str:
         return f"Variant for {self.question.text}"
+
+class ReadingAnswerVerdict(BaseModel):
+    """Verdict for a normalized TEXT answer to a question: reused for identical answers instead of asking ChatGPT again."""
+    question = fields.ForeignKeyField('models.ReadingQuestion', related_name='verdicts', on_delete=fields.CASCADE, description="Related question")
+    answer = fields.CharField(max_length=255, description="Normalized answer text")
+    is_correct = fields.BooleanField(description="Whether the answer is correct")
+    correct_answer = fields.TextField(null=True, description="Correct answer text")
+    explanation = fields.TextField(null=True, description="Explanation for the verdict")
+    hits = fields.IntField(default=0, description="How many times the verdict was reused")
+
+    class Meta:
+        table = "reading_answer_verdicts"
+        verbose_name = "Answer Verdict"
+        verbose_name_plural = "Answer Verdicts"
+        unique_together = ("question_id", "answer")
+
+    def __str__(self) -> str:
+        return f"{self.answer} -> {self.is_correct}"
+
+class ReadingAnswerKey(BaseModel):
+    """Precomputed answer key for a TEXT question: kind, canonical answer and accepted variants for local grading."""
+    TRUE_FALSE_NOT_GIVEN = "true_false_not_given"
+    YES_NO_NOT_GIVEN = "yes_no_not_given"
+    SHORT_ANSWER = "short_answer"
+    FREE_FORM = "free_form"
+
+    question = fields.OneToOneField('models.ReadingQuestion', related_name='answer_key', on_delete=fields.CASCADE, description="Related question")
+    kind = fields.CharField(max_length=32, default=FREE_FORM, description="How the question can be graded")
+    canonical_answer = fields.TextField(null=True, description="Canonical correct answer")
+    accepted_answers = fields.JSONField(default=list, description="Accepted answer variants")
+
+    class Meta:
+        table = "reading_answer_keys"
+        verbose_name = "Answer Key"
+        verbose_name_plural = "Answer Keys"
+
+    def __str__(self) -> str:
+        return f"{self.kind}: {self.canonical_answer}"
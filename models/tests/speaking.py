@@ -23,10 +23,18 @@ class SpeakingPart(str, Enum):
 
 class Speaking(BaseModel):
     """Represents a speaking test instance for a user."""
+    # Processing states of a submitted part; "failed" means its transcription or the
+    # analysis failed (get_analysis retries it), "transcribed" waits for the analysis
+    PART_UPLOADED = "uploaded"
+    PART_TRANSCRIBED = "transcribed"
+    PART_ANALYSED = "analysed"
+    PART_FAILED = "failed"
+
     status = fields.CharEnumField(SpeakingStatus, null=True, default=SpeakingStatus.PENDING, description="Status of the speaking test")
     user = fields.ForeignKeyField("models.User", related_name="speaking_tests", on_delete=fields.CASCADE, description="User taking the speaking test")
     start_time = fields.DatetimeField(null=True, description="Start time of the test")
     end_time = fields.DatetimeField(null=True, description="End time of the test")
+    parts_status = fields.JSONField(default=dict, description="Processing state per submitted part, e.g. {\"part1\": \"transcribed\"}")
 
     class Meta:
         table = "speaking"
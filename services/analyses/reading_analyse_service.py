@@ -1,282 +1,267 @@
 from fastapi import HTTPException, status
 from datetime import timedelta
 import asyncio
+import logging
+from tortoise.transactions import in_transaction
 from models.tests.constants import Constants
 from services.chatgpt import ChatGPTReadingIntegration
+from services.chatgpt.resilience import ProviderUnavailableError
+from services.reading_catalogue import reading_catalogue
 from models.analyses import ReadingAnalyse
 from models.tests import Reading, ReadingAnswer
+from utils.ielts_score import reading_band
+from utils.query_counter import count_queries
+from .reading_answer_key_service import ReadingAnswerKeyService
+from .reading_grader import ReadingGrader
+from .reading_verdict_service import ReadingVerdictService
+
+logger = logging.getLogger("reading_analyse")
+
+# Columns written back to reading_answers after grading
+GRADED_FIELDS = ["status", "is_correct", "correct_answer", "explanation"]
+
+
+def normalize(text):
+    return (text or "").strip().lower()
+
 
 class ReadingAnalyseService:
     @staticmethod
-    async def analyse(reading_id: int, user_id: int) -> list[ReadingAnalyse]:
-        reading = await Reading.get_or_none(id=reading_id).prefetch_related("passages")
+    async def analyse(reading_id: int, user_id: int) -> list[list[dict]]:
+        """
+        Grade a completed reading session in three phases:
+        1. Load: session, answers, existing analyses, answer keys and verdicts (a fixed number of queries).
+        2. Compute: grade in memory; only free-form TEXT answers go to ChatGPT, one call per passage.
+        3. Write: one bulk update of answers and one bulk insert of analyses, in a transaction.
+        """
+        async with count_queries() as queries:
+            results = await ReadingAnalyseService._analyse(reading_id, user_id)
+        logger.info(f"Reading {reading_id} analysed: {len(results)} passages, {queries.count} queries")
+        return results
+
+    @staticmethod
+    async def _analyse(reading_id: int, user_id: int) -> list[list[dict]]:
+        # --- 1. Load ---
+        reading = await Reading.get_or_none(id=reading_id)
         if not reading:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                                 detail="Reading session not found")
-        
+
         if reading.status != Constants.ReadingStatus.COMPLETED.value:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail="Reading session not completed")
 
-        # Get all user answers for this session
-        all_answers = await ReadingAnswer.filter(
-            reading_id=reading_id, user_id=user_id
-        ).select_related("question")
-        
-        # Group answers by passage_id
-        answers_by_passage = {}
-        for a in all_answers:
-            if a.status == ReadingAnswer.ANSWERED:
-                answers_by_passage.setdefault(a.question.passage_id, []).append(a)
+        # ALL passages from session - not just those with answers
+        passage_ids = sorted(await reading.passages.all().values_list("id", flat=True))
+        analysed = set(await ReadingAnalyse.filter(
+            passage_id__in=passage_ids, user_id=user_id
+        ).values_list("passage_id", flat=True))
+        passages = [p for p in await reading_catalogue.get_passages(passage_ids) if p.id not in analysed]
+        if not passages:
+            return []
+
+        all_answers = await ReadingAnswer.filter(reading_id=reading_id, user_id=user_id)
+        answers_by_qid = {a.question_id: a for a in all_answers}
+
+        # Answered questions by passage; answers to unknown questions are ignored
+        submitted_by_passage = {}
+        text_answers = []
+        for p in passages:
+            for q in p.questions:
+                ans = answers_by_qid.get(q.id)
+                if not ans or ans.status != ReadingAnswer.ANSWERED:
+                    continue
+                submitted_by_passage.setdefault(p.id, []).append((q, ans))
+                if q.type == "TEXT" and (ans.text or "").strip():
+                    text_answers.append(ans)
+
+        keys = await ReadingAnswerKeyService.get_keys([a.question_id for a in text_answers])
+        graded = {}
+        for ans in text_answers:
+            local = ReadingGrader.grade(keys.get(ans.question_id), ans.text)
+            if local:
+                graded[ans.question_id] = local
 
+        free_form_answers = [a for a in text_answers if a.question_id not in graded]
+        verdicts = await ReadingVerdictService.lookup(free_form_answers)
+        for qid, verdict in verdicts.items():
+            graded[qid] = {
+                "is_correct": verdict.is_correct,
+                "correct_answer": verdict.correct_answer or "",
+                "explanation": verdict.explanation or "",
+            }
+
+        # --- 2. Compute ---
         chatgpt = ChatGPTReadingIntegration()
+        duration = (reading.end_time - reading.start_time) if (reading.start_time and reading.end_time) else timedelta(0)
 
-        def normalize(text):
-            return (text or "").strip().lower()
-        
-        # Get ALL passages from session - not just those with answers
-        passages = await reading.passages.all().prefetch_related("questions")
-        text_map = {p.id: p.text for p in passages}
-        
-        async def analyse_passage(passage_id: int, passage_text: str):
-            # Check if already analyzed
-            if await ReadingAnalyse.get_or_none(passage_id=passage_id, user_id=user_id):
-                return None
-
-            # Get answers if any
-            submitted = answers_by_passage.get(passage_id, [])
-            
-            # If no submit for this passage, mark all questions as incorrect
-            if not submitted:                
-                # Get all questions for this passage
-                passage = next((p for p in passages if p.id == passage_id), None)
-                if not passage:
-                    return None
-                    
-                questions = await passage.questions.all()
-                
-                # Create/update answers as "not answered and incorrect"
-                for q in questions:
-                    ans = next((a for a in all_answers if a.question_id == q.id), None)
-                    if ans:
-                        await ReadingAnswer.filter(id=ans.id).update(
-                            is_correct=False, 
-                            status=ReadingAnswer.NOT_ANSWERED,
-                            correct_answer="", 
-                            explanation="Not answered"
-                        )
-                    else:
-                        # If no answer record exists - create a new one
-                        await ReadingAnswer.create(
-                            reading_id=reading_id,
-                            user_id=user_id,
-                            question_id=q.id,
-                            status=ReadingAnswer.NOT_ANSWERED,
-                            is_correct=False,
-                            correct_answer="",
-                            explanation="Not answered"
-                        )
-                
-                # Create analysis record with score 0
-                await ReadingAnalyse.create(
-                    passage_id=passage_id,
-                    user_id=user_id,
-                    correct_answers=0,
-                    overall_score=1,  # Minimum IELTS score
-                    duration=(reading.end_time - reading.start_time) if (reading.start_time and reading.end_time) else timedelta(0)
-                )
-                
-                # Form response structure for skipped passage
-                questions_data = []
-                for q in questions:
-                    # Get options for MULTIPLE_CHOICE
-                    if q.type == "MULTIPLE_CHOICE":
-                        variants = await q.variants.all()
-                        correct_var = next((v for v in variants if v.is_correct), None)
-                        correct_answer = correct_var.text if correct_var else ""
-                    else:
-                        correct_answer = ""
-                    
-                    questions_data.append({
+        updated_answers = []
+        new_answers = []
+        verdict_answers, verdict_analysis = [], []
+        analyses = []
+
+        def grade_answer(ans: ReadingAnswer, **values):
+            for field, value in values.items():
+                setattr(ans, field, value)
+            updated_answers.append(ans)
+
+        def skipped_passage(passage) -> dict:
+            # No submit for this passage: mark all questions as not answered and incorrect
+            questions_data = []
+            for q in passage.questions:
+                values = {
+                    "status": ReadingAnswer.NOT_ANSWERED,
+                    "is_correct": False,
+                    "correct_answer": "",
+                    "explanation": "Not answered",
+                }
+                ans = answers_by_qid.get(q.id)
+                if ans:
+                    grade_answer(ans, **values)
+                else:
+                    new_answers.append(ReadingAnswer(
+                        reading_id=reading_id, user_id=user_id, question_id=q.id, **values
+                    ))
+
+                correct_var = q.correct_variant if q.type == "MULTIPLE_CHOICE" else None
+                questions_data.append({
+                    "question_id": q.id,
+                    "user_answer": "",
+                    "correct_answer": correct_var.text if correct_var else "",
+                    "explanation": "Not answered",
+                    "is_correct": False
+                })
+
+            analyses.append(ReadingAnalyse(
+                passage_id=passage.id,
+                user_id=user_id,
+                correct_answers=0,
+                overall_score=1,  # Minimum IELTS score
+                duration=duration
+            ))
+            return {
+                "passages": {
+                    "passage_id": passage.id,
+                    "analysis": questions_data
+                },
+                "stats": {
+                    "total_correct": 0,
+                    "total_questions": len(passage.questions),
+                    "accuracy": 0,
+                    "overall_score": 1
+                }
+            }
+
+        async def analyse_passage(passage) -> dict:
+            submitted = submitted_by_passage.get(passage.id)
+            if not submitted:
+                return skipped_passage(passage)
+
+            mc_analysis = []
+            text_analysis = []
+            unseen = []
+            prompt_version = None
+            for q, ans in submitted:
+                # Empty answers are incorrect
+                if not (ans.text or "").strip():
+                    grade_answer(ans, is_correct=False, correct_answer="", explanation="No answer provided.")
+                    continue
+
+                # MULTIPLE_CHOICE is checked on backend
+                if q.type == "MULTIPLE_CHOICE":
+                    correct_answer = q.correct_variant.text if q.correct_variant else ""
+                    is_corr = normalize(ans.text) == normalize(correct_answer)
+                    explanation = "" if is_corr else "Incorrect option."
+                    grade_answer(ans, is_correct=is_corr, correct_answer=correct_answer, explanation=explanation)
+                    mc_analysis.append({
                         "question_id": q.id,
-                        "user_answer": "",
+                        "user_answer": ans.text,
                         "correct_answer": correct_answer,
-                        "explanation": "Not answered",
-                        "is_correct": False
+                        "explanation": explanation,
+                        "is_correct": is_corr
                     })
-                
-                return [{
-                    "passages": {
-                        "passage_id": passage_id,
-                        "analysis": questions_data
-                    },
-                    "stats": {
-                        "total_correct": 0,
-                        "total_questions": len(questions),
-                        "accuracy": 0,
-                        "overall_score": 1
-                    }
-                }]
-            
-            # Handling passages with answers
-            # Sort answers
-            non_empty = [ans for ans in submitted if (ans.text or "").strip()]
-            empty_qs = [ans for ans in submitted if not (ans.text or "").strip()]
-            
-            # Mark empty answers as incorrect
-            for ans in empty_qs:
-                await ReadingAnswer.filter(
-                    reading_id=reading_id, user_id=user_id,
-                    question_id=ans.question.id
-                ).update(is_correct=False, correct_answer="", explanation="No answer provided.")
-            
-            # Separate questions by type
-            multiple_choice_answers = [a for a in non_empty if a.question.type == "MULTIPLE_CHOICE"]
-            text_answers = [a for a in non_empty if a.question.type == "TEXT"]
-            
-            # 1. Check MULTIPLE_CHOICE on backend
-            mc_analysis = []
-            correct_mc = 0
-            for ans in multiple_choice_answers:
-                variants = await ans.question.variants.all()
-                correct_var = next((v for v in variants if v.is_correct), None)
-                correct_answer = correct_var.text if correct_var else ""
-                is_corr = normalize(ans.text) == normalize(correct_answer)
-                explanation = "" if is_corr else "Incorrect option."
-                
-                await ReadingAnswer.filter(
-                    reading_id=reading_id, user_id=user_id,
-                    question_id=ans.question.id
-                ).update(
-                    is_correct=is_corr,
-                    correct_answer=correct_answer,
-                    explanation=explanation
-                )
-                
-                mc_analysis.append({
-                    "question_id": ans.question.id,
-                    "user_answer": ans.text,
-                    "correct_answer": correct_answer,
-                    "explanation": explanation,
-                    "is_correct": is_corr
-                })
-                
-                if is_corr:
-                    correct_mc += 1
-            
-            # 2. Check TEXT questions via ChatGPT
-            text_analysis = []
-            correct_text = 0
-            
-            if text_answers:
+                    continue
+
+                # TEXT: answer keys and known verdicts first, the rest via ChatGPT
+                local = graded.get(q.id)
+                if local:
+                    grade_answer(ans, **local)
+                    text_analysis.append({
+                        "question_id": q.id,
+                        "user_answer": ans.text,
+                        **local
+                    })
+                else:
+                    unseen.append((q, ans))
+
+            if unseen:
                 try:
-                    # Prepare data for ChatGPT
-                    questions_payload = [
-                        {
-                            "question_id": a.question.id,
-                            "question": a.question.text,
-                            "type": a.question.type,
-                            "user_answer": a.text or ""
-                        }
-                        for a in text_answers
-                    ]
-                    
-                    # Call ChatGPT for TEXT questions check
                     result = await chatgpt.check_passage_answers(
-                        text=passage_text,
-                        questions=questions_payload,
-                        passage_id=passage_id
+                        text=passage.text,
+                        questions=[
+                            {
+                                "question_id": q.id,
+                                "question": q.text,
+                                "type": q.type,
+                                "user_answer": ans.text or ""
+                            }
+                            for q, ans in unseen
+                        ],
+                        passage_id=passage.id
                     )
-                    
-                    # Process results from ChatGPT
-                    text_analysis = result["analysis"]
-                    
-                    # Save scores to database
-                    for item in text_analysis:
-                        qid = item["question_id"]
-                        is_corr = bool(item.get("is_correct", False))
-                        
-                        await ReadingAnswer.filter(
-                            reading_id=reading_id, user_id=user_id,
-                            question_id=qid
-                        ).update(
-                            is_correct=is_corr,
-                            correct_answer=item.get("correct_answer", ""),
-                            explanation=item.get("explanation", "")
-                        )
-                        
-                        if is_corr:
-                            correct_text += 1
-                            
+                    gpt_analysis = result["analysis"]
+                    prompt_version = result.get("prompt_version")
+                    unseen_by_qid = {q.id: ans for q, ans in unseen}
+                    for item in gpt_analysis:
+                        ans = unseen_by_qid.get(item["question_id"])
+                        if ans:
+                            grade_answer(
+                                ans,
+                                is_correct=bool(item.get("is_correct", False)),
+                                correct_answer=item.get("correct_answer", ""),
+                                explanation=item.get("explanation", "")
+                            )
+                    text_analysis.extend(gpt_analysis)
+                    verdict_answers.extend(ans for _, ans in unseen)
+                    verdict_analysis.extend(gpt_analysis)
+
+                except ProviderUnavailableError:
+                    # OpenAI is down: nothing is written, the session is analysed again later
+                    raise
                 except Exception as e:
-                    # In case of ChatGPT error, mark all TEXT questions as incorrect
-                    for ans in text_answers:
-                        await ReadingAnswer.filter(
-                            reading_id=reading_id, user_id=user_id,
-                            question_id=ans.question.id
-                        ).update(
+                    # In case of ChatGPT error, mark unchecked TEXT questions as incorrect
+                    for q, ans in unseen:
+                        grade_answer(
+                            ans,
                             is_correct=False,
                             correct_answer="",
                             explanation=f"Error processing answer: {str(e)}"
                         )
-                        
                         text_analysis.append({
-                            "question_id": ans.question.id,
+                            "question_id": q.id,
                             "user_answer": ans.text,
                             "correct_answer": "",
                             "explanation": "Error processing answer",
                             "is_correct": False
                         })
-            
-            # 3. Combine results
-            combined_analysis = mc_analysis + text_analysis
-            
-            # 4. Calculate overall statistics
-            total_correct = correct_mc + correct_text
-            total_questions = len(multiple_choice_answers) + len(text_answers) + len(empty_qs)
+
+            total_correct = sum(1 for item in mc_analysis + text_analysis if item.get("is_correct"))
+            total_questions = len(submitted)
             accuracy = int((total_correct / total_questions) * 100) if total_questions else 0
-            
-            # 5. IELTS band calculation (official table, rounded to nearest 0.5)
-            def calculate_ielts_band(correct):
-                mapping = {
-                    range(39, 41): 9.0,
-                    range(37, 39): 8.5,
-                    range(35, 37): 8.0,
-                    range(32, 35): 7.5,
-                    range(30, 32): 7.0,
-                    range(26, 30): 6.5,
-                    range(23, 26): 6.0,
-                    range(18, 23): 5.5,
-                    range(16, 18): 5.0,
-                    range(13, 16): 4.5,
-                    range(10, 13): 4.0,
-                    range(7, 10): 3.5,
-                    range(5, 7): 3.0,
-                    range(3, 5): 2.5,
-                    range(1, 3): 2.0,
-                    range(0, 1): 0.0,
-                }
-                for score_range, band in mapping.items():
-                    if correct in score_range:
-                        return band
-                return 0.0
-
-            overall_score = calculate_ielts_band(total_correct)
-            
-            # 6. Save analysis result
-            await ReadingAnalyse.create(
-                passage_id=passage_id,
+            overall_score = reading_band(total_correct)
+
+            analyses.append(ReadingAnalyse(
+                passage_id=passage.id,
                 user_id=user_id,
                 correct_answers=total_correct,
                 overall_score=overall_score,
-                duration=(reading.end_time - reading.start_time) if (reading.start_time and reading.end_time) else timedelta(0)
-            )
-            
-            # 7. Return data in the same format
-            return [{
+                duration=duration,
+                prompt_version=prompt_version
+            ))
+            return {
                 "passages": {
-                    "passage_id": passage_id,
-                    "analysis": combined_analysis
+                    "passage_id": passage.id,
+                    "analysis": mc_analysis + text_analysis
                 },
                 "stats": {
                     "total_correct": total_correct,
@@ -284,12 +269,21 @@ class ReadingAnalyseService:
                     "accuracy": accuracy,
                     "overall_score": overall_score
                 }
-            }]
+            }
+
+        results = await asyncio.gather(*[analyse_passage(p) for p in passages])
+
+        # --- 3. Write ---
+        async with in_transaction():
+            if updated_answers:
+                await ReadingAnswer.bulk_update(updated_answers, fields=GRADED_FIELDS)
+            if new_answers:
+                await ReadingAnswer.bulk_create(new_answers)
+            await ReadingAnalyse.bulk_create(analyses)
+        if verdict_analysis:
+            await ReadingVerdictService.store(verdict_answers, verdict_analysis)
 
-        # Create tasks for all passages (even those without answers)
-        tasks = [analyse_passage(p.id, text_map[p.id]) for p in passages]
-        results = await asyncio.gather(*tasks)
-        return [r for r in results if r]
+        return [[r] for r in results]
 
     @staticmethod
     async def get_passage_analysis(passage_id: int, user_id: int):
@@ -297,8 +291,8 @@ class ReadingAnalyseService:
 
     @staticmethod
     async def get_all_analyses(reading_id: int, user_id: int):
-        reading = await Reading.get_or_none(id=reading_id).prefetch_related("passages")
+        reading = await Reading.get_or_none(id=reading_id)
         if not reading:
             return []
-        pids = [p.id for p in await reading.passages.all()]
+        pids = await reading.passages.all().values_list("id", flat=True)
         return await ReadingAnalyse.filter(passage_id__in=pids, user_id=user_id)
@@ -0,0 +1,104 @@
+import asyncio
+from models.tests import ReadingPassage, ReadingAnswerKey, ReadingAnswerVerdict, Constants
+from services.chatgpt import ChatGPTReadingIntegration
+from .reading_grader import canonical_form
+
+KEY_KINDS = {
+    ReadingAnswerKey.TRUE_FALSE_NOT_GIVEN,
+    ReadingAnswerKey.YES_NO_NOT_GIVEN,
+    ReadingAnswerKey.SHORT_ANSWER,
+    ReadingAnswerKey.FREE_FORM,
+}
+
+# A correct ChatGPT verdict must be reused this often before it becomes an accepted variant
+VERDICT_MIN_HITS = 2
+
+
+class ReadingAnswerKeyService:
+    """
+    Builds and loads answer keys for reading TEXT questions.
+    """
+
+    @staticmethod
+    async def get_keys(question_ids: list[int]) -> dict[int, ReadingAnswerKey]:
+        """
+        Load answer keys for the given questions, by question id.
+        """
+        if not question_ids:
+            return {}
+        keys = await ReadingAnswerKey.filter(question_id__in=question_ids)
+        return {k.question_id: k for k in keys}
+
+    @staticmethod
+    async def build(passage_ids: list[int] | None = None, overwrite: bool = False) -> int:
+        """
+        Derive answer keys for TEXT questions of the passage bank:
+        1. Ask ChatGPT once per passage for kind, canonical answer and variants.
+        2. Add answers that stored verdicts repeatedly marked as correct.
+        3. Save keys; existing keys are kept unless overwrite is set.
+        Returns the number of saved keys.
+        """
+        passages_qs = ReadingPassage.all() if passage_ids is None else ReadingPassage.filter(id__in=passage_ids)
+        passages = await passages_qs.prefetch_related("questions")
+
+        existing = set()
+        if not overwrite:
+            existing = set(await ReadingAnswerKey.all().values_list("question_id", flat=True))
+
+        chatgpt = ChatGPTReadingIntegration()
+
+        async def build_passage(passage: ReadingPassage) -> int:
+            questions = [
+                q for q in passage.questions
+                if q.type == Constants.QuestionType.TEXT and q.id not in existing
+            ]
+            if not questions:
+                return 0
+
+            items = await chatgpt.derive_answer_keys(
+                text=passage.text,
+                questions=[{"question_id": q.id, "question": q.text} for q in questions],
+                passage_id=passage.id,
+            )
+            items_by_qid = {item["question_id"]: item for item in items}
+
+            verdicts = await ReadingAnswerVerdict.filter(
+                question_id__in=[q.id for q in questions],
+                is_correct=True,
+                hits__gte=VERDICT_MIN_HITS,
+            )
+            verified = {}
+            for v in verdicts:
+                verified.setdefault(v.question_id, []).append(v.answer)
+
+            saved = 0
+            for q in questions:
+                item = items_by_qid.get(q.id)
+                if not item:
+                    continue
+                kind = item.get("kind")
+                if kind not in KEY_KINDS:
+                    kind = ReadingAnswerKey.FREE_FORM
+
+                accepted = []
+                if kind == ReadingAnswerKey.SHORT_ANSWER:
+                    seen = {canonical_form(item.get("canonical_answer"))}
+                    for answer in list(item.get("accepted_answers") or []) + verified.get(q.id, []):
+                        form = canonical_form(answer)
+                        if form and form not in seen:
+                            seen.add(form)
+                            accepted.append(answer)
+
+                await ReadingAnswerKey.update_or_create(
+                    defaults={
+                        "kind": kind,
+                        "canonical_answer": (item.get("canonical_answer") or "").strip(),
+                        "accepted_answers": accepted,
+                    },
+                    question_id=q.id,
+                )
+                saved += 1
+            return saved
+
+        results = await asyncio.gather(*[build_passage(p) for p in passages])
+        return sum(results)
@@ -0,0 +1,67 @@
+import re
+from models.tests import ReadingAnswerKey
+
+_PUNCTUATION = re.compile(r"[^\w\s%.-]|(?<!\d)[.-]|[.-](?!\d)")
+_ARTICLES = {"a", "an", "the"}
+
+# Spellings accepted for TRUE/FALSE/NOT GIVEN and YES/NO/NOT GIVEN answers
+_JUDGEMENT_ALIASES = {
+    "true": "TRUE", "t": "TRUE",
+    "false": "FALSE", "f": "FALSE",
+    "yes": "YES", "y": "YES",
+    "no": "NO", "n": "NO",
+    "not given": "NOT GIVEN", "notgiven": "NOT GIVEN", "ng": "NOT GIVEN",
+}
+_JUDGEMENT_KINDS = {ReadingAnswerKey.TRUE_FALSE_NOT_GIVEN, ReadingAnswerKey.YES_NO_NOT_GIVEN}
+
+
+def canonical_form(text: str) -> str:
+    """
+    Comparable form of a short answer: lowercase, no punctuation, no articles.
+    """
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    words = [w for w in text.split() if w not in _ARTICLES]
+    return " ".join(words)
+
+
+def judgement(text: str) -> str | None:
+    """
+    Map a TRUE/FALSE/NOT GIVEN style answer to its canonical spelling.
+    """
+    return _JUDGEMENT_ALIASES.get(canonical_form(text))
+
+
+class ReadingGrader:
+    """
+    Deterministic grader for reading TEXT questions that have an answer key.
+    """
+
+    @staticmethod
+    def can_grade(key: ReadingAnswerKey | None) -> bool:
+        return bool(key and key.kind != ReadingAnswerKey.FREE_FORM and key.canonical_answer)
+
+    @staticmethod
+    def grade(key: ReadingAnswerKey | None, answer_text: str) -> dict | None:
+        """
+        Grade an answer against its key.
+        Returns None when the question is free-form and needs ChatGPT.
+        """
+        if not ReadingGrader.can_grade(key):
+            return None
+
+        if key.kind in _JUDGEMENT_KINDS:
+            expected = judgement(key.canonical_answer) or key.canonical_answer.strip().upper()
+            is_correct = judgement(answer_text) == expected
+            correct_answer = expected
+        else:
+            accepted = {canonical_form(key.canonical_answer)}
+            accepted.update(canonical_form(a) for a in key.accepted_answers or [])
+            accepted.discard("")
+            is_correct = canonical_form(answer_text) in accepted
+            correct_answer = key.canonical_answer
+
+        return {
+            "is_correct": is_correct,
+            "correct_answer": correct_answer,
+            "explanation": "" if is_correct else f"The correct answer is: {correct_answer}",
+        }
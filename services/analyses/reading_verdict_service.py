@@ -0,0 +1,72 @@
+from tortoise.expressions import F
+from models.tests import ReadingAnswer, ReadingAnswerVerdict
+from services.chatgpt.reading_integration import normalize_answer
+
+
+class ReadingVerdictService:
+    """
+    Persistent store of ChatGPT verdicts for TEXT answers, keyed by
+    (question_id, normalized answer). Consulted before sending answers to ChatGPT.
+    """
+    MAX_ANSWER_LENGTH = 255
+
+    @staticmethod
+    def key(answer: ReadingAnswer) -> str | None:
+        """
+        Normalized answer used as the verdict key, or None if it cannot be stored.
+        """
+        normalized = normalize_answer(answer.text)
+        if not normalized or len(normalized) > ReadingVerdictService.MAX_ANSWER_LENGTH:
+            return None
+        return normalized
+
+    @staticmethod
+    async def lookup(answers: list[ReadingAnswer]) -> dict[int, ReadingAnswerVerdict]:
+        """
+        Return known verdicts for the given answers, by question id.
+        """
+        wanted = {}
+        for ans in answers:
+            normalized = ReadingVerdictService.key(ans)
+            if normalized:
+                wanted[ans.question_id] = normalized
+        if not wanted:
+            return {}
+
+        candidates = await ReadingAnswerVerdict.filter(
+            question_id__in=list(wanted),
+            answer__in=list(set(wanted.values())),
+        )
+        found = {
+            v.question_id: v for v in candidates
+            if wanted.get(v.question_id) == v.answer
+        }
+        if found:
+            await ReadingAnswerVerdict.filter(
+                id__in=[v.id for v in found.values()]
+            ).update(hits=F("hits") + 1)
+        return found
+
+    @staticmethod
+    async def store(answers: list[ReadingAnswer], analysis: list[dict]) -> None:
+        """
+        Save ChatGPT verdicts for answers that have no verdict yet.
+        """
+        answers_by_qid = {a.question_id: a for a in answers}
+        verdicts = []
+        for item in analysis:
+            ans = answers_by_qid.get(item.get("question_id"))
+            if not ans or not isinstance(item.get("is_correct"), bool):
+                continue
+            normalized = ReadingVerdictService.key(ans)
+            if not normalized:
+                continue
+            verdicts.append(ReadingAnswerVerdict(
+                question_id=ans.question_id,
+                answer=normalized,
+                is_correct=item["is_correct"],
+                correct_answer=item.get("correct_answer", ""),
+                explanation=item.get("explanation", ""),
+            ))
+        if verdicts:
+            await ReadingAnswerVerdict.bulk_create(verdicts, ignore_conflicts=True)
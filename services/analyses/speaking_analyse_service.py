@@ -1,6 +1,8 @@
 from fastapi import HTTPException, status
+from tortoise.exceptions import IntegrityError
 from tortoise.transactions import in_transaction
 from datetime import timedelta
+from typing import Any, AsyncIterator, Optional
 from services.chatgpt import ChatGPTSpeakingIntegration
 from models.analyses import SpeakingAnalyse
 from models.tests import Speaking, SpeakingAnswer, SpeakingStatus
@@ -22,26 +24,65 @@ def analyse_to_dict(analyse: SpeakingAnalyse) -> dict:
 
 class SpeakingAnalyseService:
     @staticmethod
-    async def analyse(test_id: int, lang_code: str, t: dict) -> dict:
+    async def _get_test(test_id: int, t: dict) -> tuple[Speaking, Optional[SpeakingAnalyse]]:
         test = await Speaking.get_or_none(id=test_id)
         if not test:
             raise HTTPException(status.HTTP_404_NOT_FOUND, t.get("speaking_test_not_found", "Speaking test not found"))
         if test.status != SpeakingStatus.COMPLETED.value:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, t.get("speaking_test_not_completed", "Speaking test is not completed"))
+        return test, await SpeakingAnalyse.get_or_none(speaking_id=test.id)
 
-        existing = await SpeakingAnalyse.get_or_none(speaking_id=test.id)
-        if existing:
-            return analyse_to_dict(existing)
-
+    @staticmethod
+    async def _get_parts(test_id: int) -> list:
         answers = await SpeakingAnswer.filter(question__speaking_id=test_id).order_by("question__part").select_related("question")
         # Always prepare part1, part2, part3 (use fake if missing)
         fake_answer = type("FakeAnswer", (), {"question": type("Q", (), {"title": "", "content": ""})(), "text_answer": ""})
-        part1 = answers[0] if len(answers) > 0 else fake_answer
-        part2 = answers[1] if len(answers) > 1 else fake_answer
-        part3 = answers[2] if len(answers) > 2 else fake_answer
+        return [answers[i] if len(answers) > i else fake_answer for i in range(3)]
+
+    @staticmethod
+    async def analyse(test_id: int, lang_code: str, t: dict) -> dict:
+        test, existing = await SpeakingAnalyseService._get_test(test_id, t)
+        if existing:
+            return analyse_to_dict(existing)
 
+        parts = await SpeakingAnalyseService._get_parts(test_id)
         chatgpt = ChatGPTSpeakingIntegration()
-        analysis = await chatgpt.generate_ielts_speaking_analyse(part1, part2, part3, lang_code=lang_code)
+        analysis = await chatgpt.generate_ielts_speaking_analyse(*parts, lang_code=lang_code)
+        return await SpeakingAnalyseService.save(test, parts, analysis, t)
+
+    @staticmethod
+    async def analyse_stream(test_id: int, lang_code: str, t: dict) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Streamed analyse(). The test is checked right away (HTTPException as usual);
+        the returned iterator yields the ChatGPT "field"/"delta" events (scores
+        first), then ("result", analyse_to_dict(...)) once the analysis is saved.
+        """
+        test, existing = await SpeakingAnalyseService._get_test(test_id, t)
+        return SpeakingAnalyseService._stream(test, existing, lang_code, t)
+
+    @staticmethod
+    async def _stream(
+        test: Speaking, existing: Optional[SpeakingAnalyse], lang_code: str, t: dict
+    ) -> AsyncIterator[tuple[str, Any]]:
+        if existing:
+            yield "result", analyse_to_dict(existing)
+            return
+
+        parts = await SpeakingAnalyseService._get_parts(test.id)
+        chatgpt = ChatGPTSpeakingIntegration()
+        async for event, payload in chatgpt.generate_ielts_speaking_analyse_stream(*parts, lang_code=lang_code):
+            if event == "done":
+                yield "result", await SpeakingAnalyseService.save(test, parts, payload, t)
+            else:
+                yield event, payload
+
+    @staticmethod
+    async def save(test: Speaking, parts: list, analysis: dict, t: dict) -> dict:
+        """
+        Apply the scoring rules to a ChatGPT analysis and store it for the test.
+        If a concurrent request saved one first, that analysis is returned.
+        """
+        part1, part2, part3 = parts
 
         # For missing parts, set 0 and feedback
         if not getattr(part1, "text_answer", None):
@@ -73,19 +114,23 @@ class SpeakingAnalyseService:
         analysis["timing"] = duration.total_seconds()
 
         # Save analysis to DB if not exists
-        speaking_analyse = await SpeakingAnalyse.create(
-            speaking_id=test.id,
-            feedback=analysis.get("feedback"),
-            overall_band_score=analysis.get("overall_band_score"),
-            fluency_and_coherence_score=analysis.get("fluency_and_coherence_score"),
-            fluency_and_coherence_feedback=analysis.get("fluency_and_coherence_feedback"),
-            lexical_resource_score=analysis.get("lexical_resource_score"),
-            lexical_resource_feedback=analysis.get("lexical_resource_feedback"),
-            grammatical_range_and_accuracy_score=analysis.get("grammatical_range_and_accuracy_score"),
-            grammatical_range_and_accuracy_feedback=analysis.get("grammatical_range_and_accuracy_feedback"),
-            pronunciation_score=analysis.get("pronunciation_score"),
-            pronunciation_feedback=analysis.get("pronunciation_feedback"),
-            duration=duration,
-        )
+        try:
+            speaking_analyse = await SpeakingAnalyse.create(
+                speaking_id=test.id,
+                feedback=analysis.get("feedback"),
+                overall_band_score=analysis.get("overall_band_score"),
+                fluency_and_coherence_score=analysis.get("fluency_and_coherence_score"),
+                fluency_and_coherence_feedback=analysis.get("fluency_and_coherence_feedback"),
+                lexical_resource_score=analysis.get("lexical_resource_score"),
+                lexical_resource_feedback=analysis.get("lexical_resource_feedback"),
+                grammatical_range_and_accuracy_score=analysis.get("grammatical_range_and_accuracy_score"),
+                grammatical_range_and_accuracy_feedback=analysis.get("grammatical_range_and_accuracy_feedback"),
+                pronunciation_score=analysis.get("pronunciation_score"),
+                pronunciation_feedback=analysis.get("pronunciation_feedback"),
+                duration=duration,
+                prompt_version=analysis.get("prompt_version"),
+            )
+        except IntegrityError:
+            speaking_analyse = await SpeakingAnalyse.get(speaking_id=test.id)
 
         return analyse_to_dict(speaking_analyse)
\ No newline at end of file
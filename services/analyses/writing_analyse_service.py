@@ -1,14 +1,37 @@
 from fastapi import HTTPException, status
 from datetime import timedelta
+from typing import Any, AsyncIterator, Optional
+from tortoise.exceptions import IntegrityError
 from services.chatgpt import ChatGPTWritingIntegration
+from services.chatgpt.writing_integration import writing_analysis_batcher
 from models.analyses import WritingAnalyse
 from models.tests import Writing, WritingStatus
 
+def analyse_to_dict(analyse: WritingAnalyse) -> dict:
+    def score(value):
+        return float(value) if value is not None else None
+
+    return {
+        "task_achievement_feedback": analyse.task_achievement_feedback,
+        "task_achievement_score": score(analyse.task_achievement_score),
+        "lexical_resource_feedback": analyse.lexical_resource_feedback,
+        "lexical_resource_score": score(analyse.lexical_resource_score),
+        "coherence_and_cohesion_feedback": analyse.coherence_and_cohesion_feedback,
+        "coherence_and_cohesion_score": score(analyse.coherence_and_cohesion_score),
+        "grammatical_range_and_accuracy_feedback": analyse.grammatical_range_and_accuracy_feedback,
+        "grammatical_range_and_accuracy_score": score(analyse.grammatical_range_and_accuracy_score),
+        "word_count_feedback": analyse.word_count_feedback,
+        "word_count_score": score(analyse.word_count_score),
+        "overall_band_score": score(analyse.overall_band_score),
+        "total_feedback": analyse.total_feedback,
+        "timing": analyse.duration.total_seconds() if analyse.duration else None,
+    }
+
 class WritingAnalyseService:
     @staticmethod
-    async def analyse(test_id: int, lang_code: str, t: dict) -> WritingAnalyse:
+    async def _get_test(test_id: int, t: dict) -> tuple[Writing, Optional[WritingAnalyse]]:
         """
-        Analyse a completed Writing test and save the result.
+        The completed test with its parts, and its saved analysis if there is one.
         """
         test = await Writing.get_or_none(id=test_id).prefetch_related("part1", "part2")
         if not test:
@@ -19,13 +42,60 @@ class WritingAnalyseService:
         
         existing = await WritingAnalyse.get_or_none(writing_id=test.id)
         if existing:
-            return existing
+            return test, existing
         
         if not test.part1 or not test.part2:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, t.get("writing_parts_not_found", "Writing parts not found"))
+        return test, None
+
+    @staticmethod
+    async def analyse(test_id: int, lang_code: str, t: dict, batched: bool = False) -> WritingAnalyse:
+        """
+        Analyse a completed Writing test and save the result.
+        With `batched`, the test may be graded together with other queued tests
+        (WritingAnalysisBatcher), which trades a short wait for fewer requests.
+        """
+        test, existing = await WritingAnalyseService._get_test(test_id, t)
+        if existing:
+            return existing
 
-        chatgpt = ChatGPTWritingIntegration()
-        analysis = await chatgpt.analyse_writing(test.part1, test.part2, lang_code=lang_code)
+        if batched:
+            analysis = await writing_analysis_batcher.analyse(test.part1, test.part2, lang_code=lang_code)
+        else:
+            chatgpt = ChatGPTWritingIntegration()
+            analysis = await chatgpt.analyse_writing(test.part1, test.part2, lang_code=lang_code)
+        return await WritingAnalyseService.save(test, analysis, t)
+
+    @staticmethod
+    async def analyse_stream(test_id: int, lang_code: str, t: dict) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Streamed analyse(). The test is checked right away (HTTPException as usual);
+        the returned iterator yields the ChatGPT "field"/"delta" events, then
+        ("result", analyse_to_dict(...)) once the analysis is saved.
+        An existing analysis is returned as the result event alone.
+        """
+        test, existing = await WritingAnalyseService._get_test(test_id, t)
+        return WritingAnalyseService._stream(test, existing, lang_code, t)
+
+    @staticmethod
+    async def _stream(
+        test: Writing, existing: Optional[WritingAnalyse], lang_code: str, t: dict
+    ) -> AsyncIterator[tuple[str, Any]]:
+        if existing is None:
+            chatgpt = ChatGPTWritingIntegration()
+            async for event, payload in chatgpt.analyse_writing_stream(test.part1, test.part2, lang_code=lang_code):
+                if event == "done":
+                    existing = await WritingAnalyseService.save(test, payload, t)
+                else:
+                    yield event, payload
+        yield "result", analyse_to_dict(existing)
+
+    @staticmethod
+    async def save(test: Writing, analysis: dict, t: dict) -> WritingAnalyse:
+        """
+        Compute the overall band from a ChatGPT analysis and store it for the test.
+        If a concurrent request saved one first, that analysis is returned.
+        """
         if not analysis:
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, t.get("writing_analysis_failed", "Failed to analyse writing test"))
 
@@ -111,23 +181,27 @@ class WritingAnalyseService:
                 safe_feedback(task_response)
             ).strip()
 
-        writing_analyse = await WritingAnalyse.create(
-            writing=test,
-            # Task 1
-            task_achievement_score=task_achievement.get("Score", 0) or task_achievement.get("score", 0),
-            task_achievement_feedback=task_achievement.get("Feedback", "") or task_achievement.get("feedback", ""),
-            lexical_resource_score=lexical.get("Score", 0) or lexical.get("score", 0),
-            lexical_resource_feedback=lexical.get("Feedback", "") or lexical.get("feedback", ""),
-            coherence_and_cohesion_score=coherence.get("Score", 0) or coherence.get("score", 0),
-            coherence_and_cohesion_feedback=coherence.get("Feedback", "") or coherence.get("feedback", ""),
-            grammatical_range_and_accuracy_score=grammar.get("Score", 0) or grammar.get("score", 0),
-            grammatical_range_and_accuracy_feedback=grammar.get("Feedback", "") or grammar.get("feedback", ""),
-            word_count_score=word_count.get("Score", 0) or word_count.get("score", 0),
-            word_count_feedback=word_count.get("Feedback", "") or word_count.get("feedback", ""),
-            timing_feedback=timing.get("Feedback", "") or timing.get("feedback", ""),
-            # General
-            overall_band_score=overall_band_score,
-            total_feedback=total_feedback,
-            duration=duration,
-        )
+        try:
+            writing_analyse = await WritingAnalyse.create(
+                writing=test,
+                # Task 1
+                task_achievement_score=task_achievement.get("Score", 0) or task_achievement.get("score", 0),
+                task_achievement_feedback=task_achievement.get("Feedback", "") or task_achievement.get("feedback", ""),
+                lexical_resource_score=lexical.get("Score", 0) or lexical.get("score", 0),
+                lexical_resource_feedback=lexical.get("Feedback", "") or lexical.get("feedback", ""),
+                coherence_and_cohesion_score=coherence.get("Score", 0) or coherence.get("score", 0),
+                coherence_and_cohesion_feedback=coherence.get("Feedback", "") or coherence.get("feedback", ""),
+                grammatical_range_and_accuracy_score=grammar.get("Score", 0) or grammar.get("score", 0),
+                grammatical_range_and_accuracy_feedback=grammar.get("Feedback", "") or grammar.get("feedback", ""),
+                word_count_score=word_count.get("Score", 0) or word_count.get("score", 0),
+                word_count_feedback=word_count.get("Feedback", "") or word_count.get("feedback", ""),
+                timing_feedback=timing.get("Feedback", "") or timing.get("feedback", ""),
+                # General
+                overall_band_score=overall_band_score,
+                total_feedback=total_feedback,
+                duration=duration,
+                prompt_version=analysis.get("prompt_version"),
+            )
+        except IntegrityError:
+            return await WritingAnalyse.get(writing_id=test.id)
         return writing_analyse
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+from config import (
+    AUDIO_PREPROCESS_ENABLED,
+    AUDIO_PREPROCESS_WORKERS,
+    AUDIO_PREPROCESS_TIMEOUT,
+    AUDIO_SILENCE_THRESHOLD_DB,
+    AUDIO_BITRATE,
+    FFMPEG_BINARY,
+)
+
+logger = logging.getLogger("audio_preprocessor")
+
+# Output format: mono 16 kHz Opus in an Ogg container (accepted by Whisper)
+OUTPUT_EXTENSION = ".ogg"
+SAMPLE_RATE = 16000
+
+
+def _silence_filter(threshold_db: int) -> str:
+    """
+    ffmpeg filter that trims leading and trailing silence:
+    trim the start, reverse, trim the start again, reverse back.
+    """
+    trim = f"silenceremove=start_periods=1:start_duration=0.2:start_threshold={threshold_db}dB"
+    return f"{trim},areverse,{trim},areverse"
+
+
+def preprocess_file(
+    src: str,
+    dst: str,
+    ffmpeg: str = FFMPEG_BINARY,
+    threshold_db: int = AUDIO_SILENCE_THRESHOLD_DB,
+    bitrate: str = AUDIO_BITRATE,
+    timeout: float = AUDIO_PREPROCESS_TIMEOUT,
+) -> bool:
+    """
+    Decode src, trim silence, downmix to mono 16 kHz and encode to Opus at dst.
+    Runs in a worker process; returns False if ffmpeg is missing or fails.
+    """
+    command = [
+        ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", src,
+        "-vn",
+        "-af", _silence_filter(threshold_db),
+        "-ac", "1",
+        "-ar", str(SAMPLE_RATE),
+        "-c:a", "libopus",
+        "-b:a", bitrate,
+        dst,
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0 and os.path.exists(dst) and os.path.getsize(dst) > 0
+
+
+class AudioPreprocessor:
+    """
+    Runs ffmpeg pre-processing of uploaded audio in a process pool,
+    so decoding and encoding never block the event loop.
+    Falls back to the original file when disabled or when ffmpeg is unavailable.
+    """
+
+    def __init__(self, enabled: bool = AUDIO_PREPROCESS_ENABLED, workers: int = AUDIO_PREPROCESS_WORKERS):
+        self.enabled = enabled and shutil.which(FFMPEG_BINARY) is not None
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if enabled and not self.enabled:
+            logger.warning(f"{FFMPEG_BINARY} not found, audio pre-processing disabled")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def process(self, src: Path, folder: Path) -> Path:
+        """
+        Pre-process src into a new file in folder and remove src.
+        On failure src is moved into folder unchanged. Returns the stored path.
+        """
+        if self.enabled:
+            dst = folder / f"{uuid4().hex}{OUTPUT_EXTENSION}"
+            loop = asyncio.get_running_loop()
+            try:
+                ok = await loop.run_in_executor(self._get_executor(), preprocess_file, str(src), str(dst))
+            except Exception as e:
+                logger.warning(f"Audio pre-processing failed for {src.name}: {e}")
+                ok = False
+            if ok:
+                src.unlink(missing_ok=True)
+                return dst
+            dst.unlink(missing_ok=True)
+
+        stored = folder / src.name
+        await asyncio.to_thread(shutil.move, str(src), str(stored))
+        return stored
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Singleton instance for import
+audio_preprocessor = AudioPreprocessor()
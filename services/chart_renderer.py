@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+from config import BASE_DIR, CHART_RENDER_WORKERS, DIAGRAM_FORMAT, DIAGRAM_GC_GRACE
+
+logger = logging.getLogger("chart_renderer")
+
+MEDIA_DIR = BASE_DIR / "media"
+DIAGRAMS_DIR = MEDIA_DIR / "writing" / "diagrams"
+CHART_TYPES = ("bar", "line", "pie")
+CHART_FIELDS = ("categories", "year1", "year2", "data_year1", "data_year2")
+DIAGRAM_FORMATS = ("png", "svg")
+# Bump when the chart style changes, so existing files are not reused
+CHART_STYLE_VERSION = 1
+
+
+def diagram_key(chart_type: str, diagram_data: dict) -> str:
+    """
+    Stable name of a diagram: sha256 of the chart type, its data and the style version.
+    """
+    payload = json.dumps(
+        {
+            "v": CHART_STYLE_VERSION,
+            "chart_type": chart_type,
+            **{field: diagram_data[field] for field in CHART_FIELDS},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _init_worker():
+    """
+    Import matplotlib once per worker process, so renders do not pay for it.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+    from matplotlib.figure import Figure  # noqa: F401
+
+
+def _draw_bar(fig, categories, year1, year2, data_year1, data_year2):
+    ax = fig.add_subplot()
+    bar_width = 0.35
+    x = range(len(categories))
+    ax.bar(x, data_year1, width=bar_width, label=str(year1), alpha=0.7)
+    ax.bar([i + bar_width for i in x], data_year2, width=bar_width, label=str(year2), alpha=0.7)
+    ax.set_xlabel("Categories", fontsize=12)
+    ax.set_ylabel("Percentage of Expenditure", fontsize=12)
+    ax.set_title(f"Comparison of Household Expenditure by Category ({year1} vs {year2})", fontsize=14)
+    ax.set_xticks([i + bar_width / 2 for i in x])
+    ax.set_xticklabels(categories, fontsize=10)
+    ax.legend()
+
+
+def _draw_line(fig, categories, year1, year2, data_year1, data_year2):
+    ax = fig.add_subplot()
+    ax.plot(categories, data_year1, marker="o", label=str(year1))
+    ax.plot(categories, data_year2, marker="o", label=str(year2))
+    ax.set_xlabel("Categories")
+    ax.set_ylabel("Percentage of Expenditure")
+    ax.set_title(f"Trend of Household Expenditure ({year1} vs {year2})")
+    ax.legend()
+
+
+def _draw_pie(fig, categories, year1, year2, data_year1, data_year2):
+    axs = fig.subplots(1, 2)
+    axs[0].pie(data_year1, labels=categories, autopct="%1.1f%%", startangle=140)
+    axs[0].set_title(f"Distribution of Household Expenditure ({year1})")
+    axs[1].pie(data_year2, labels=categories, autopct="%1.1f%%", startangle=140)
+    axs[1].set_title(f"Distribution of Household Expenditure ({year2})")
+
+
+_DRAW = {"bar": _draw_bar, "line": _draw_line, "pie": _draw_pie}
+_FIGSIZE = {"bar": (8, 6), "line": (8, 6), "pie": (12, 6)}
+
+
+def render_chart(chart_type: str, diagram_data: dict, fmt: str = "png") -> bytes:
+    """
+    Render a Task 1 chart to PNG or SVG bytes with the object-oriented Agg API.
+    No pyplot global state is touched, so this is safe in any thread or process.
+    """
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=_FIGSIZE[chart_type])
+    FigureCanvasAgg(fig)
+    _DRAW[chart_type](fig, **{field: diagram_data[field] for field in CHART_FIELDS})
+    buffer = io.BytesIO()
+    # Keep SVG text as <text> elements instead of glyph paths: several times smaller
+    with matplotlib.rc_context({"svg.fonttype": "none"}):
+        fig.savefig(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def render_chart_file(chart_type: str, diagram_data: dict, filename: str, fmt: str = "png") -> str:
+    """
+    Render a chart into filename unless it already exists.
+    Runs in a worker process; returns the file path.
+    """
+    if not os.path.exists(filename):
+        image = render_chart(chart_type, diagram_data, fmt)
+        # Write under a temporary name first, so readers never see a partial file
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "wb") as f:
+            f.write(image)
+        os.replace(tmp_filename, filename)
+    return filename
+
+
+class ChartRenderer:
+    """
+    Renders writing diagrams in a process pool with warm workers,
+    so matplotlib never blocks the event loop.
+
+    Files are named after diagram_key(), so the same chart is rendered once,
+    concurrent requests for it share one render, and later ones hit the disk cache.
+    """
+
+    def __init__(
+        self,
+        workers: int = CHART_RENDER_WORKERS,
+        output_dir: Path = DIAGRAMS_DIR,
+        media_dir: Path = MEDIA_DIR,
+        fmt: str = DIAGRAM_FORMAT,
+    ):
+        if fmt not in DIAGRAM_FORMATS:
+            raise ValueError(f"Unsupported diagram format: {fmt}")
+        self.workers = workers
+        self.output_dir = output_dir
+        self.media_dir = media_dir
+        self.fmt = fmt
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: dict[Path, asyncio.Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._executor
+
+    def path_for(self, chart_type: str, diagram_data: dict) -> Path:
+        return self.output_dir / f"{diagram_key(chart_type, diagram_data)}.{self.fmt}"
+
+    def relative(self, path: Path) -> str:
+        """
+        Path relative to the media folder, as stored in WritingPart1.diagram.
+        """
+        return path.relative_to(self.media_dir).as_posix()
+
+    async def render(self, chart_type: str, diagram_data: dict) -> str:
+        """
+        Make sure the chart file exists and return its path relative to the media
+        folder, e.g. "writing/diagrams/<key>.png". Raises ValueError for unknown chart types.
+        """
+        if chart_type not in CHART_TYPES:
+            raise ValueError(f"Unknown chart type: {chart_type}")
+
+        path = self.path_for(chart_type, diagram_data)
+        if path.exists():
+            return self.relative(path)
+
+        pending = self._pending.get(path)
+        if pending is None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(
+                self._get_executor(), render_chart_file, chart_type, diagram_data, str(path), self.fmt
+            )
+            self._pending[path] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(path, None))
+        try:
+            await asyncio.shield(pending)
+        except BrokenProcessPool:
+            # A worker died: start a fresh pool next time
+            logger.error("Chart render worker failed, restarting the pool")
+            self.shutdown()
+            raise
+        return self.relative(path)
+
+    def collect_garbage(self, referenced: set[str], grace: float = DIAGRAM_GC_GRACE) -> int:
+        """
+        Delete diagram files not in referenced (paths relative to the media folder)
+        and older than grace seconds, so charts that are being rendered or waiting
+        in the task pool are not touched. Returns the number of deleted files.
+        """
+        if not self.output_dir.exists():
+            return 0
+        deadline = time.time() - grace
+        deleted = 0
+        for path in self.output_dir.iterdir():
+            if not path.is_file() or self.relative(path) in referenced:
+                continue
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+                    deleted += 1
+            except FileNotFoundError:
+                continue
+        return deleted
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Singleton instance for import
+chart_renderer = ChartRenderer()
@@ -1,7 +1,110 @@
 from fastapi import HTTPException
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Optional, TypeVar
+import asyncio
+import httpx
 import openai
-from config import OPENAI_API_KEY
+from pydantic import ValidationError
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_TIMEOUT,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_MODEL_CONCURRENCY,
+    OPENAI_STRUCTURED_RETRIES,
+    OPENAI_BASE_URL,
+)
+from .json_stream import JsonStreamParser
+from .resilience import call_openai
+from .response_cache import response_cache
+from .schemas import StrictModel, response_format
+from .telemetry import llm_telemetry
+
+ModelT = TypeVar("ModelT", bound=StrictModel)
+
+# Process-wide clients (one per API key) and concurrency limits
+_clients: dict[str, openai.AsyncOpenAI] = {}
+_global_semaphore: Optional[asyncio.Semaphore] = None
+_model_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def get_async_client(api_key: str) -> openai.AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for the key, creating it on first use.
+    The underlying HTTP pool keeps connections alive between requests.
+    The SDK's own retries are off: call_openai retries within a deadline.
+    """
+    client = _clients.get(api_key)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            timeout=OPENAI_TIMEOUT,
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=OPENAI_TIMEOUT,
+            ),
+        )
+        _clients[api_key] = client
+    return client
+
+
+def get_model_semaphore(model: str) -> Optional[asyncio.Semaphore]:
+    """
+    Return the per-model semaphore, or None if the model has no own limit.
+    """
+    if model not in OPENAI_MODEL_CONCURRENCY:
+        return None
+    if model not in _model_semaphores:
+        _model_semaphores[model] = asyncio.Semaphore(OPENAI_MODEL_CONCURRENCY[model])
+    return _model_semaphores[model]
+
+
+def get_global_semaphore() -> asyncio.Semaphore:
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    return _global_semaphore
+
+
+class _ConcurrencyLimit:
+    """
+    Async context manager that holds the global and the per-model slot.
+    """
+    def __init__(self, model: str):
+        self.model_semaphore = get_model_semaphore(model)
+        self.global_semaphore = get_global_semaphore()
+
+    async def __aenter__(self):
+        if self.model_semaphore:
+            await self.model_semaphore.acquire()
+        try:
+            await self.global_semaphore.acquire()
+        except BaseException:
+            if self.model_semaphore:
+                self.model_semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.global_semaphore.release()
+        if self.model_semaphore:
+            self.model_semaphore.release()
+        return False
+
+
+async def close_async_clients():
+    """
+    Close all shared clients (on application or worker shutdown).
+    """
+    for client in list(_clients.values()):
+        await client.close()
+    _clients.clear()
+
 
 class BaseChatGPTIntegration:
     """
@@ -11,4 +114,182 @@ class BaseChatGPTIntegration:
         key = api_key or OPENAI_API_KEY
         if not key:
             raise HTTPException(status_code=500, detail="OpenAI API key not provided")
-        self.async_client = openai.AsyncOpenAI(api_key=key)
\ No newline at end of file
+        self.async_client = get_async_client(key)
+
+    def _limit(self, model: str) -> _ConcurrencyLimit:
+        """
+        Concurrency slot for a call to the given model.
+        """
+        return _ConcurrencyLimit(model)
+
+    async def _chat_completion(self, model: str, messages: list[dict], feature: str = "chat", **kwargs):
+        """
+        Create a chat completion, queueing locally when the concurrency limit is reached.
+        Retried, hedged and circuit-broken by call_openai. Tokens, latency and
+        retries are recorded in llm_telemetry under `feature`, the call site.
+        """
+        async def request():
+            async with self._limit(model):
+                return await self.async_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **kwargs
+                )
+
+        with llm_telemetry.call(feature, model) as record:
+            response = await call_openai(model, request, record=record)
+            record.add_usage(getattr(response, "usage", None))
+        return response
+
+    async def _cached_chat_completion(
+        self,
+        model: str,
+        messages: list[dict],
+        parse: Callable[[str], Any],
+        feature: str = "chat",
+        **kwargs
+    ) -> Any:
+        """
+        Chat completion backed by the shared response cache.
+        Only use for deterministic (temperature 0) prompts. The raw content is
+        cached only after `parse` accepted it, so malformed replies are retried.
+        """
+        key = response_cache.make_key(model, messages, kwargs)
+        cached = await response_cache.get(key)
+        if cached is not None:
+            try:
+                result = parse(cached)
+            except Exception:
+                pass
+            else:
+                llm_telemetry.cache_hit(feature, model)
+                return result
+
+        response = await self._chat_completion(model=model, messages=messages, feature=feature, **kwargs)
+        raw = response.choices[0].message.content
+        result = parse(raw)
+        await response_cache.set(key, raw)
+        return result
+
+    async def _structured_completion(
+        self,
+        model: str,
+        messages: list[dict],
+        schema: type[ModelT],
+        cached: bool = False,
+        retries: int = OPENAI_STRUCTURED_RETRIES,
+        feature: Optional[str] = None,
+        **kwargs
+    ) -> ModelT:
+        """
+        Chat completion constrained to the JSON schema of `schema` (strict structured
+        outputs) and validated into it with pydantic's JSON parser. A reply that still
+        does not validate (truncated, refused) is re-requested up to `retries` times.
+        Pass cached=True for deterministic prompts to use the response cache.
+        `feature` names the call site in telemetry (default: the schema name).
+        """
+        feature = feature or schema.__name__
+
+        def parse(raw: Optional[str]) -> ModelT:
+            return schema.model_validate_json(raw or "")
+
+        kwargs["response_format"] = response_format(schema)
+        for attempt in range(retries + 1):
+            try:
+                if cached:
+                    return await self._cached_chat_completion(
+                        model=model, messages=messages, parse=parse, feature=feature, **kwargs
+                    )
+                response = await self._chat_completion(model=model, messages=messages, feature=feature, **kwargs)
+                return parse(response.choices[0].message.content)
+            except ValidationError as e:
+                if attempt == retries:
+                    raise HTTPException(
+                        status_code=502,
+                        detail=f"OpenAI returned an invalid {schema.__name__}: {e.error_count()} errors",
+                    )
+
+    async def _stream_structured_completion(
+        self,
+        model: str,
+        messages: list[dict],
+        schema: type[ModelT],
+        feature: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Streaming variant of a cached _structured_completion. Yields the
+        JsonStreamParser events ("field" / "delta") while the reply is generated,
+        then ("done", <validated schema instance>). The complete reply is stored
+        in the response cache under the same key as the non-streaming call.
+        """
+        feature = feature or schema.__name__
+        kwargs["response_format"] = response_format(schema)
+        key = response_cache.make_key(model, messages, kwargs)
+        parser = JsonStreamParser()
+
+        cached = await response_cache.get(key)
+        if cached is not None:
+            try:
+                result = schema.model_validate_json(cached)
+            except ValidationError:
+                pass
+            else:
+                llm_telemetry.cache_hit(feature, model)
+                for event in parser.feed(cached):
+                    yield event
+                yield "done", result
+                return
+
+        chunks: list[str] = []
+        with llm_telemetry.call(feature, model) as record:
+            async with self._limit(model):
+                # Retried until the response starts; no hedging, a second stream would stay open
+                stream = await call_openai(
+                    model,
+                    lambda: self.async_client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **kwargs
+                    ),
+                    hedge_after=0,
+                    record=record,
+                )
+                async for chunk in stream:
+                    # The last chunk carries the usage and no choices
+                    record.add_usage(getattr(chunk, "usage", None))
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if not text:
+                        continue
+                    chunks.append(text)
+                    for event in parser.feed(text):
+                        yield event
+
+        raw = "".join(chunks)
+        try:
+            result = schema.model_validate_json(raw)
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=502,
+                detail=f"OpenAI returned an invalid {schema.__name__}: {e.error_count()} errors",
+            )
+        await response_cache.set(key, raw)
+        yield "done", result
+
+    async def _transcription(self, model: str, feature: str = "transcription", **kwargs):
+        """
+        Create an audio transcription under the same concurrency limits.
+        A file argument is rewound before each retry; hedging is off, as
+        parallel requests would read the same file handle.
+        """
+        async def request():
+            audio_file = kwargs.get("file")
+            if hasattr(audio_file, "seek"):
+                audio_file.seek(0)
+            async with self._limit(model):
+                return await self.async_client.audio.transcriptions.create(model=model, **kwargs)
+
+        with llm_telemetry.call(feature, model) as record:
+            return await call_openai(model, request, hedge_after=0, record=record)
@@ -0,0 +1,137 @@
+import json
+from typing import Iterator, Optional
+
+# Events produced by JsonStreamParser.feed
+FIELD = "field"  # a scalar value is complete: {"path": ..., "value": ...}
+DELTA = "delta"  # more characters of a string value: {"path": ..., "text": ...}
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LITERAL_END = set(",}] \t\r\n")
+
+
+class _Container:
+    __slots__ = ("is_object", "key", "index", "expects_key")
+
+    def __init__(self, is_object: bool):
+        self.is_object = is_object
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expects_key = is_object
+
+
+class JsonStreamParser:
+    """
+    Incremental JSON reader for streamed model output. Text is fed in chunks as
+    it arrives; each call yields the scalar values completed by the chunk and the
+    new characters of the string being written, addressed by dotted paths such
+    as "Task1.TaskAchievement.Score" or "analysis.0.is_correct".
+
+    Every character is looked at once, so a whole reply costs O(n).
+    Well-formed input is assumed: structured outputs guarantee it, and the full
+    text is still validated against the schema once the stream ends.
+    """
+
+    def __init__(self):
+        self._stack: list[_Container] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._string: list[str] = []
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._literal: list[str] = []
+
+    def _path(self) -> str:
+        return ".".join(
+            container.key if container.is_object else str(container.index)
+            for container in self._stack
+        )
+
+    def _value_done(self):
+        """
+        A value of the innermost container is complete.
+        """
+        if self._stack and not self._stack[-1].is_object:
+            self._stack[-1].index += 1
+
+    def _finish_literal(self) -> tuple[str, dict]:
+        text = "".join(self._literal)
+        self._literal.clear()
+        event = (FIELD, {"path": self._path(), "value": json.loads(text)})
+        self._value_done()
+        return event
+
+    def feed(self, chunk: str) -> Iterator[tuple[str, dict]]:
+        delta: list[str] = []
+        for ch in chunk:
+            if self._in_string:
+                if self._escape is not None:
+                    self._escape += ch
+                    if self._escape[0] == "u":
+                        if len(self._escape) < 5:
+                            continue
+                        code = int(self._escape[1:], 16)
+                        self._escape = None
+                        if 0xD800 <= code < 0xDC00:
+                            # First half of a surrogate pair, wait for the second
+                            self._high_surrogate = code
+                            continue
+                        if self._high_surrogate is not None and 0xDC00 <= code < 0xE000:
+                            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                        self._high_surrogate = None
+                        decoded = chr(code)
+                    else:
+                        decoded = _ESCAPES.get(self._escape, self._escape)
+                    self._escape = None
+                    self._string.append(decoded)
+                    delta.append(decoded)
+                elif ch == "\\":
+                    self._escape = ""
+                elif ch == '"':
+                    self._in_string = False
+                    text = "".join(self._string)
+                    self._string.clear()
+                    if self._string_is_key:
+                        self._stack[-1].key = text
+                    else:
+                        if delta:
+                            yield DELTA, {"path": self._path(), "text": "".join(delta)}
+                        yield FIELD, {"path": self._path(), "value": text}
+                        self._value_done()
+                    delta.clear()
+                else:
+                    self._string.append(ch)
+                    delta.append(ch)
+                continue
+
+            if self._literal:
+                if ch not in _LITERAL_END:
+                    self._literal.append(ch)
+                    continue
+                yield self._finish_literal()
+
+            if ch == '"':
+                self._in_string = True
+                self._string_is_key = bool(self._stack) and self._stack[-1].expects_key
+            elif ch in "{[":
+                self._stack.append(_Container(is_object=ch == "{"))
+            elif ch in "}]":
+                self._stack.pop()
+                self._value_done()
+            elif ch == ":":
+                self._stack[-1].expects_key = False
+            elif ch == ",":
+                if self._stack and self._stack[-1].is_object:
+                    self._stack[-1].expects_key = True
+            elif not ch.isspace():
+                self._literal.append(ch)
+
+        # Part of a string value arrived without its closing quote yet
+        if self._in_string and not self._string_is_key and delta:
+            yield DELTA, {"path": self._path(), "text": "".join(delta)}
+
+    def close(self) -> Iterator[tuple[str, dict]]:
+        """
+        Flush a number or literal at the very end of the input (a bare top-level value).
+        """
+        if self._literal:
+            yield self._finish_literal()
@@ -0,0 +1,137 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+(?=[\"'(\[]?[A-Z0-9])")
+_WORD = re.compile(r"[a-z0-9]+")
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ed", "es", "ly", "s")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers him his how i if in into is it its itself just me more most my no nor not now of off on
+once only or other our ours out over own same she should so some such than that the their theirs them then
+there these they this those through to too under until up very was we were what when where which while who
+whom why will with would you your according passage text mentioned stated does
+""".split())
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def stem(word: str) -> str:
+    """
+    Crude suffix stripping, enough to match "emissions" with "emission" or "reduced" with "reduce".
+    """
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text: str) -> list[str]:
+    return [stem(w) for w in _WORD.findall((text or "").lower()) if w not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for English text (about 4 characters per token).
+    """
+    return len(text) // 4 + 1
+
+
+class PassageIndex:
+    """
+    BM25 index over the sentences of a reading passage, used to send ChatGPT
+    only the part of the passage a question is about.
+    """
+
+    def __init__(self, text: str):
+        self.sentences: list[str] = []
+        # Index of the paragraph each sentence belongs to, to keep breaks in excerpts
+        self.paragraph_of: list[int] = []
+        for number, paragraph in enumerate(_PARAGRAPH_SPLIT.split(text.strip())):
+            for sentence in _SENTENCE_SPLIT.split(paragraph.strip()):
+                if sentence.strip():
+                    self.sentences.append(" ".join(sentence.split()))
+                    self.paragraph_of.append(number)
+
+        self.tokens = [estimate_tokens(s) for s in self.sentences]
+        self.total_tokens = sum(self.tokens)
+        self._counts = [Counter(terms(s)) for s in self.sentences]
+        self._lengths = [sum(c.values()) for c in self._counts]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0
+        frequency = Counter(term for counts in self._counts for term in counts)
+        n = len(self.sentences)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequency.items()}
+
+    def scores(self, query: str) -> list[float]:
+        query_terms = set(terms(query)) & self._idf.keys()
+        result = []
+        for counts, length in zip(self._counts, self._lengths):
+            score = 0.0
+            for term in query_terms:
+                tf = counts.get(term)
+                if tf:
+                    norm = _K1 * (1 - _B + _B * length / (self._avg_length or 1))
+                    score += self._idf[term] * tf * (_K1 + 1) / (tf + norm)
+            result.append(score)
+        return result
+
+    def relevant(self, query: str, budget: int, context: int = 1) -> set[int]:
+        """
+        Ids of the best-matching sentences for the query, each with `context`
+        neighbours on both sides, within about `budget` tokens. Empty when
+        nothing in the passage matches the query.
+        """
+        ranked = sorted(
+            ((score, i) for i, score in enumerate(self.scores(query)) if score > 0),
+            reverse=True,
+        )
+        chosen: set[int] = set()
+        used = 0
+        for _, i in ranked:
+            window = {
+                j for j in range(i - context, i + context + 1)
+                if 0 <= j < len(self.sentences) and j not in chosen
+            }
+            cost = sum(self.tokens[j] for j in window)
+            if chosen and used + cost > budget:
+                break
+            chosen |= window
+            used += cost
+        return chosen
+
+    def excerpt(self, ids: set[int]) -> str:
+        """
+        The chosen sentences in passage order. Skipped text is marked with "…"
+        and paragraph breaks are kept.
+        """
+        parts = []
+        previous = None
+        for i in sorted(ids):
+            if previous is not None:
+                if i != previous + 1:
+                    parts.append(" … ")
+                elif self.paragraph_of[i] != self.paragraph_of[previous]:
+                    parts.append("\n\n")
+                else:
+                    parts.append(" ")
+            elif i > 0:
+                parts.append("… ")
+            parts.append(self.sentences[i])
+            previous = i
+        if previous is not None and previous < len(self.sentences) - 1:
+            parts.append(" …")
+        return "".join(parts)
+
+
+@lru_cache(maxsize=256)
+def get_passage_index(text: str) -> PassageIndex:
+    """
+    Index of a passage text; passages come from a small fixed bank, so indexes are kept.
+    """
+    return PassageIndex(text)
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from config import PROMPT_RELOAD_INTERVAL
+
+logger = logging.getLogger("prompt_registry")
+
+PROMPTS_DIR = Path(__file__).parent / "prompts"
+
+LANGUAGES = {
+    "uz": "Uzbek",
+    "ru": "Russian",
+    "en": "English",
+}
+
+
+class Prompt:
+    """
+    A prompt template, or a template with its placeholders filled in.
+    `version` identifies the template text, so it stays the same for every
+    rendering of one template.
+    """
+    __slots__ = ("name", "text", "version")
+
+    def __init__(self, name: str, text: str, version: str):
+        self.name = name
+        self.text = text
+        self.version = version
+
+    @property
+    def label(self) -> str:
+        """
+        "name@version", as stored with analyses.
+        """
+        return f"{self.name}@{self.version}"
+
+
+class _Entry:
+    __slots__ = ("prompt", "mtime", "checked")
+
+    def __init__(self, prompt: Prompt, mtime: float):
+        self.prompt = prompt
+        self.mtime = mtime
+        self.checked = time.monotonic()
+
+
+@lru_cache(maxsize=256)
+def _render(text: str, values: tuple[tuple[str, str], ...]) -> str:
+    for key, value in values:
+        text = text.replace(f"({key})", value)
+    return text
+
+
+class PromptRegistry:
+    """
+    The prompt templates in services/chatgpt/prompts, read once into memory
+    instead of from disk on every request. A template is looked up by its file
+    name without ".txt"; placeholders are written as "(key)" like "(level)".
+
+    With a reload interval, a file's modification time is checked at most that
+    often when it is used and a changed file is read again, so prompts can be
+    edited without a restart. Rendered texts are cached per template text, so
+    a reload also invalidates them; the per-language renders of the loaded
+    templates are made up front.
+    """
+
+    def __init__(self, directory: Path = PROMPTS_DIR, reload_interval: float = PROMPT_RELOAD_INTERVAL):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._entries: dict[str, _Entry] = {}
+        for path in sorted(directory.glob("*.txt")):
+            self._load(path.stem)
+        for name, entry in self._entries.items():
+            if "(language)" in entry.prompt.text:
+                for lang_code in LANGUAGES:
+                    self.for_language(name, lang_code)
+
+    def _load(self, name: str) -> _Entry:
+        path = self.directory / f"{name}.txt"
+        mtime = os.stat(path).st_mtime
+        text = path.read_text(encoding="utf-8")
+        version = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+        previous = self._entries.get(name)
+        if previous and previous.prompt.version != version:
+            logger.info(f"Prompt {name} reloaded: {previous.prompt.version} -> {version}")
+        entry = self._entries[name] = _Entry(Prompt(name, text, version), mtime)
+        return entry
+
+    def get(self, name: str) -> Prompt:
+        """
+        The template as it currently is on disk. Raises KeyError for an unknown name.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            if not (self.directory / f"{name}.txt").exists():
+                raise KeyError(f"Unknown prompt: {name}")
+            entry = self._load(name)
+        elif self.reload_interval > 0 and time.monotonic() - entry.checked >= self.reload_interval:
+            entry.checked = time.monotonic()
+            try:
+                if os.stat(self.directory / f"{name}.txt").st_mtime != entry.mtime:
+                    entry = self._load(name)
+            except OSError as e:
+                logger.warning(f"Prompt {name} could not be reloaded, keeping the loaded one: {e}")
+        return entry.prompt
+
+    def render(self, name: str, /, **values: str) -> Prompt:
+        """
+        The template with each "(key)" replaced by its value.
+        """
+        template = self.get(name)
+        text = _render(template.text, tuple(sorted(values.items())))
+        return Prompt(template.name, text, template.version)
+
+    def for_language(self, name: str, lang_code: str) -> Prompt:
+        """
+        A template that asks for answers in the user's language, rendered for it.
+        """
+        language = LANGUAGES.get(lang_code, "English")
+        return self.render(name, language=language, language_upper=language.upper())
+
+# Singleton instance for import
+prompt_registry = PromptRegistry()
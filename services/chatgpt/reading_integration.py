@@ -1,35 +1,19 @@
-import os
 import json
-import aiofiles
 import asyncio
+from typing import Optional
 from fastapi import HTTPException, status
 from openai import OpenAIError
+from config import READING_CHECK_BATCH_MAX, READING_CHECK_BATCH_WINDOW, READING_EXCERPT_MAX_SHARE, READING_EXCERPT_TOKENS
 from .base_integration import BaseChatGPTIntegration
+from .passage_index import get_passage_index
+from .prompt_registry import prompt_registry
+from .schemas import GeneratedReadingPassages, ReadingAnswerChecks, ReadingAnswerKeys
 
-PROMPTS_PATH = os.path.join(os.path.dirname(__file__), "prompts")
-
-async def load_prompt(prompt_file: str) -> str:
-    path = os.path.join(PROMPTS_PATH, prompt_file)
-    async with aiofiles.open(path, "r", encoding="utf-8") as f:
-        return await f.read()
-
-
-def extract_json_array(text: str) -> str:
+def normalize_answer(text: str) -> str:
     """
-    Extract the outermost JSON array from text, handling nested brackets.
+    Normalize a user answer for comparison and caching: trim, collapse spaces, lowercase.
     """
-    start = text.find('[')
-    if start == -1:
-        return text
-    stack = []
-    for i, ch in enumerate(text[start:], start):
-        if ch == '[':
-            stack.append(ch)
-        elif ch == ']':
-            stack.pop()
-            if not stack:
-                return text[start:i+1]
-    return text
+    return " ".join((text or "").split()).lower()
 
 
 class ChatGPTReadingIntegration(BaseChatGPTIntegration):
@@ -43,30 +27,24 @@ class ChatGPTReadingIntegration(BaseChatGPTIntegration):
         Generate a three-passage reading test for the specified difficulty level.
         Returns JSON string of the test data.
         """
-        prompt_part1 = await load_prompt("reading_13.txt")
-        prompt_part2 = await load_prompt("reading_14.txt")
-        prompt_part1 = prompt_part1.replace("(level)", level)
-        prompt_part2 = prompt_part2.replace("(level)", level)
+        prompt_part1 = prompt_registry.render("reading_13", level=level).text
+        prompt_part2 = prompt_registry.render("reading_14", level=level).text
 
         kwargs.setdefault("max_tokens", 6000)
         kwargs.setdefault("temperature", 0.0)
 
-        resp1, resp2 = await asyncio.gather(
-            self._generate_response(prompt_part1, **kwargs),
-            self._generate_response(prompt_part2, **kwargs)
+        # Each half is validated and, if malformed, re-requested on its own
+        passages1, passages2 = await asyncio.gather(
+            self._generate_passages(prompt_part1, **kwargs),
+            self._generate_passages(prompt_part2, **kwargs)
         )
 
-        # Clean and parse JSON arrays
-        cleaned1 = extract_json_array(resp1.replace("```json", "").replace("```", "").strip())
-        passages1 = json.loads(cleaned1)
-        p1 = next((p for p in passages1 if p.get("number") == 1), None)
-        p3 = next((p for p in passages1 if p.get("number") == 3), None)
+        p1 = next((p for p in passages1 if p["number"] == 1), None)
+        p3 = next((p for p in passages1 if p["number"] == 3), None)
         if not (p1 and p3):
             raise HTTPException(status_code=500, detail="Failed to extract passages 1 and 3")
 
-        cleaned2 = extract_json_array(resp2.replace("```json", "").replace("```", "").strip())
-        passages2 = json.loads(cleaned2)
-        p2 = next((p for p in passages2 if p.get("number") == 2), None)
+        p2 = next((p for p in passages2 if p["number"] == 2), None)
         if not p2:
             raise HTTPException(status_code=500, detail="Failed to extract passage 2")
 
@@ -77,8 +55,7 @@ class ChatGPTReadingIntegration(BaseChatGPTIntegration):
         """
         Generate reading tasks and return both the raw response and the prompt used.
         """
-        prompt = await load_prompt("reading.txt")
-        prompt = prompt.replace("(level)", level)
+        prompt = prompt_registry.render("reading", level=level).text
         kwargs.setdefault("max_tokens", 6000)
         kwargs.setdefault("temperature", 0.0)
         response = await self._generate_response(prompt, **kwargs)
@@ -91,63 +68,249 @@ class ChatGPTReadingIntegration(BaseChatGPTIntegration):
         passage_id: int = None,
         **kwargs
     ) -> dict:
-        prompt_template = await load_prompt("reading-question-answer.txt")
-        payload = [{
+        """
+        Check free-form answers to the questions of a passage.
+        Checks of the same passage from concurrent sessions are sent together
+        (see PassageCheckBatcher); stats are counted from the verdicts.
+        """
+        if passage_id is not None and not kwargs:
+            analysis = await passage_check_batcher.check(passage_id, text, questions)
+        else:
+            analysis = await self.check_answers(text, questions, passage_id, **kwargs)
+        prompt_versions = {item.pop("prompt_version") for item in analysis}
+
+        total_correct = sum(1 for item in analysis if item["is_correct"])
+        total_questions = len(analysis)
+        accuracy = int(total_correct / total_questions * 100) if total_questions else 0
+        return {
+            "passage_id": passage_id,
+            "analysis": analysis,
+            "prompt_version": ",".join(sorted(prompt_versions)) or None,
+            "stats": {
+                "total_correct": total_correct,
+                "total_questions": total_questions,
+                "accuracy": accuracy,
+                "overall_score": round(accuracy * 9 / 100),
+            }
+        }
+
+    async def check_answers(
+        self,
+        text: str,
+        questions: list[dict],
+        passage_id: int = None,
+        **kwargs
+    ) -> list[dict]:
+        """
+        One ChatGPT request for a list of answers ({"question_id", "question", "user_answer"}).
+        Identical (question, normalized answer) pairs are checked once, and the
+        prompt carries only the sentences relevant to the questions (PassageIndex)
+        unless they would cover most of the passage anyway.
+        Returns one verdict per input answer, in input order, each with the
+        "prompt_version" it was made with.
+        """
+        prompt_template = prompt_registry.get("reading-question-answer")
+        unique = {}
+        for q in questions:
+            unique.setdefault((q["question_id"], normalize_answer(q.get("user_answer"))), q)
+        # Sorted, so the same answers give the same prompt and hit the response cache
+        keys = sorted(unique)
+        ids = {key: number for number, key in enumerate(keys, 1)}
+
+        index = get_passage_index(text)
+        relevant: set[int] = set()
+        for key in keys:
+            found = index.relevant(f"{unique[key].get('question', '')} {key[1]}", READING_EXCERPT_TOKENS)
+            if not found:
+                # Nothing in the passage matches the question: let ChatGPT read all of it
+                relevant = set(range(len(index.sentences)))
+                break
+            relevant |= found
+        excerpt_tokens = sum(index.tokens[i] for i in relevant)
+        if excerpt_tokens < READING_EXCERPT_MAX_SHARE * index.total_tokens:
+            text = index.excerpt(relevant)
+
+        payload = {
             "passage_id": passage_id,
             "text": text,
-            "questions": questions
-        }]
-        prompt = prompt_template.replace("(data)", json.dumps(payload, ensure_ascii=False))
+            "questions": [
+                {"id": ids[key], "question": unique[key].get("question", ""), "user_answer": key[1]}
+                for key in keys
+            ],
+        }
+        prompt = prompt_template.text.replace("(data)", json.dumps(payload, ensure_ascii=False))
 
-        kwargs.setdefault("max_tokens", 6000)
+        # A verdict is a few dozen tokens; leave room for longer explanations
+        kwargs.setdefault("max_tokens", 100 + 120 * len(keys))
         kwargs.setdefault("temperature", 0.0)
+
         try:
-            resp = await self.async_client.chat.completions.create(
+            result = await self._structured_completion(
                 model="gpt-4o",
+                feature="reading_check",
                 messages=[{"role": "user", "content": prompt}],
+                schema=ReadingAnswerChecks,
+                cached=True,
                 **kwargs
             )
-            raw = resp.choices[0].message.content
         except OpenAIError as e:
             raise HTTPException(status_code=502, detail=f"OpenAI API error: {e}")
 
-        raw = raw.replace("```json", "").replace("```", "").strip()
-
-        arr_text = extract_json_array(raw)
+        verdicts = {item.question_id: item for item in result.analysis}
+        analysis = []
+        for q in questions:
+            verdict = verdicts.get(ids[(q["question_id"], normalize_answer(q.get("user_answer")))])
+            if verdict is None:
+                continue
+            analysis.append({
+                "question_id": q["question_id"],
+                "user_answer": q.get("user_answer") or "",
+                "correct_answer": verdict.correct_answer,
+                "explanation": verdict.explanation,
+                "is_correct": verdict.is_correct,
+                "prompt_version": prompt_template.label,
+            })
+        return analysis
 
-        try:
-            arr = json.loads(arr_text)
-        except Exception as e:
-            raise HTTPException(status_code=502, detail=f"JSON parse error: {e}")
-
-        target = next((item for item in arr if (
-            isinstance(item, dict)
-            and "passages" in item
-            and item["passages"].get("passage_id") == passage_id
-        )), None)
+    async def derive_answer_keys(
+        self,
+        text: str,
+        questions: list[dict],
+        passage_id: int = None,
+        **kwargs
+    ) -> list[dict]:
+        """
+        Derive answer keys (kind, canonical answer, accepted variants) for the
+        TEXT questions of a passage. Used offline to prepare local grading.
+        """
+        prompt_template = prompt_registry.get("reading-answer-keys").text
+        payload = {
+            "passage_id": passage_id,
+            "text": text,
+            "questions": sorted(questions, key=lambda q: q.get("question_id") or 0),
+        }
+        prompt = prompt_template.replace("(data)", json.dumps(payload, ensure_ascii=False))
 
-        if not target:
-            raise HTTPException(status_code=502, detail=f"No analysis found for passage_id {passage_id}")
+        kwargs.setdefault("max_tokens", 6000)
+        kwargs.setdefault("temperature", 0.0)
 
-        passages = target["passages"]
-        stats = target.get("stats", {})
+        try:
+            result = await self._structured_completion(
+                model="gpt-4o",
+                feature="reading_answer_keys",
+                messages=[{"role": "user", "content": prompt}],
+                schema=ReadingAnswerKeys,
+                cached=True,
+                **kwargs
+            )
+        except OpenAIError as e:
+            raise HTTPException(status_code=502, detail=f"OpenAI API error: {e}")
+        return [item.model_dump() for item in result.keys]
 
-        return {
-            "passage_id": passages.get("passage_id"),
-            "analysis": passages.get("analysis", []),
-            "stats": stats
-        }
+    async def _generate_passages(self, prompt: str, **kwargs) -> list[dict]:
+        """
+        Generated reading passages for a test prompt, as plain dicts.
+        """
+        try:
+            result = await self._structured_completion(
+                model="gpt-4o",
+                feature="reading_generation",
+                messages=[{"role": "user", "content": prompt}],
+                schema=GeneratedReadingPassages,
+                **kwargs
+            )
+        except OpenAIError as e:
+            raise HTTPException(status_code=502, detail=f"OpenAI API error: {e}")
+        return [passage.model_dump() for passage in result.passages]
 
     async def _generate_response(self, prompt: str, **kwargs) -> str:
         """
         Internal helper to call OpenAI's chat completion endpoint.
         """
         try:
-            response = await self.async_client.chat.completions.create(
+            response = await self._chat_completion(
                 model="gpt-4o",
+                feature="reading_generation",
                 messages=[{"role": "user", "content": prompt}],
                 **kwargs
             )
             return response.choices[0].message.content
         except OpenAIError as e:
             raise HTTPException(status_code=502, detail=f"OpenAI API error: {e}")
+
+
+class _Batch:
+    __slots__ = ("text", "requests", "size", "timer")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.requests: list[tuple[list[dict], asyncio.Future]] = []
+        self.size = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class PassageCheckBatcher:
+    """
+    Micro-batcher for answer checks. Checks of the same passage that arrive
+    within `window` seconds (several users finishing the same test) are sent
+    as one ChatGPT request of up to about `max_items` answers, and answers
+    given by more than one user are checked once.
+    """
+
+    def __init__(self, window: float = READING_CHECK_BATCH_WINDOW, max_items: int = READING_CHECK_BATCH_MAX):
+        self.window = window
+        self.max_items = max_items
+        self._batches: dict[int, _Batch] = {}
+        self._running: set[asyncio.Task] = set()
+
+    async def check(self, passage_id: int, text: str, questions: list[dict]) -> list[dict]:
+        """
+        Verdicts for these answers, as returned by ChatGPTReadingIntegration.check_answers.
+        """
+        if self.window <= 0:
+            return await ChatGPTReadingIntegration().check_answers(text, questions, passage_id)
+
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(passage_id)
+        if batch is None:
+            batch = self._batches[passage_id] = _Batch(text)
+            batch.timer = loop.call_later(self.window, self._flush, passage_id)
+        future = loop.create_future()
+        batch.requests.append((questions, future))
+        batch.size += len(questions)
+        if batch.size >= self.max_items:
+            self._flush(passage_id)
+        return await future
+
+    def _flush(self, passage_id: int):
+        batch = self._batches.pop(passage_id, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.create_task(self._run(passage_id, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, passage_id: int, batch: _Batch):
+        questions = [q for batch_questions, _ in batch.requests for q in batch_questions]
+        try:
+            analysis = await ChatGPTReadingIntegration().check_answers(batch.text, questions, passage_id)
+        except Exception as e:
+            for _, future in batch.requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_key = {(item["question_id"], normalize_answer(item["user_answer"])): item for item in analysis}
+        for batch_questions, future in batch.requests:
+            if future.done():
+                continue
+            verdicts = []
+            for q in batch_questions:
+                item = by_key.get((q["question_id"], normalize_answer(q.get("user_answer"))))
+                if item:
+                    verdicts.append({**item, "user_answer": q.get("user_answer") or ""})
+            future.set_result(verdicts)
+
+# Singleton instance for import
+passage_check_batcher = PassageCheckBatcher()
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import openai
+from fastapi import HTTPException, status
+
+from config import (
+    OPENAI_CALL_DEADLINE,
+    OPENAI_RETRIES,
+    OPENAI_RETRY_BASE_DELAY,
+    OPENAI_RETRY_MAX_DELAY,
+    OPENAI_HEDGE_AFTER,
+    OPENAI_BREAKER_THRESHOLD,
+    OPENAI_BREAKER_RESET,
+)
+
+logger = logging.getLogger("openai_resilience")
+
+T = TypeVar("T")
+
+
+class ProviderUnavailableError(HTTPException):
+    """
+    OpenAI is failing for a model: its circuit breaker is open, or every
+    attempt within the call deadline failed. Callers with a queued path
+    (arq jobs) use it to defer the work instead of failing the request.
+    """
+    def __init__(self, model: str, retry_after: float):
+        self.model = model
+        self.retry_after = max(retry_after, 1.0)
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"OpenAI is temporarily unavailable for {model}, please try again later",
+            headers={"Retry-After": str(math.ceil(self.retry_after))},
+        )
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Errors worth another attempt: timeouts, dropped connections, 429 and 5xx.
+    An exhausted quota is also a 429 but will not fix itself.
+    """
+    if isinstance(error, openai.RateLimitError):
+        return getattr(error, "code", None) != "insufficient_quota"
+    return isinstance(
+        error, (asyncio.TimeoutError, openai.APIConnectionError, openai.InternalServerError)
+    )
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """
+    Seconds from the Retry-After header of a 429/503 response, if any.
+    """
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter, so clients retrying at once spread out.
+    """
+    return random.uniform(0, min(OPENAI_RETRY_MAX_DELAY, OPENAI_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker. After `threshold` consecutive transient failures it opens
+    and calls fail at once with ProviderUnavailableError. After `reset_timeout`
+    seconds one trial call is let through: success closes the breaker,
+    failure opens it for another period.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, threshold: int = OPENAI_BREAKER_THRESHOLD, reset_timeout: float = OPENAI_BREAKER_RESET):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def allow(self) -> bool:
+        """
+        Whether a call may start now. In the half-open state only one trial runs at a time.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        A call ended without an outcome (cancelled): let the next trial through.
+        """
+        self._trial = False
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker(model)
+    return breaker
+
+
+def is_available(model: str) -> bool:
+    """
+    False while the model's breaker is open; used to route work to the queue up front.
+    """
+    return get_breaker(model).state != CircuitBreaker.OPEN
+
+
+async def _attempt(breaker: CircuitBreaker, request: Callable[[], Awaitable[T]]) -> T:
+    try:
+        result = await request()
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception as e:
+        # Client errors (400, 401, ...) mean the provider itself is up
+        if is_transient(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
+async def _hedged(
+    breaker: CircuitBreaker, request: Callable[[], Awaitable[T]], hedge_after: float, record=None
+) -> T:
+    """
+    Run the request; if it has not finished after hedge_after seconds, start an
+    identical one and return whichever succeeds first. The other is cancelled.
+    """
+    first = asyncio.ensure_future(_attempt(breaker, request))
+    tasks = {first}
+    try:
+        if not hedge_after:
+            return await first
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done and breaker.state == CircuitBreaker.CLOSED:
+            tasks.add(asyncio.ensure_future(_attempt(breaker, request)))
+            if record is not None:
+                record.hedges += 1
+        pending = tasks
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call_openai(
+    model: str,
+    request: Callable[[], Awaitable[T]],
+    deadline: float = OPENAI_CALL_DEADLINE,
+    retries: int = OPENAI_RETRIES,
+    hedge_after: Optional[float] = None,
+    record=None,
+) -> T:
+    """
+    Run an OpenAI request with the resilience policy of its model:
+    - every attempt is bounded by what is left of `deadline`;
+    - transient errors are retried up to `retries` times with jittered backoff
+      (or the server's Retry-After), as long as the deadline allows;
+    - with hedge_after (default OPENAI_HEDGE_AFTER[model]) a slow attempt gets a
+      parallel duplicate. Only for idempotent requests with no side effects;
+    - the model's circuit breaker fails calls fast while OpenAI is degraded.
+    `request` must start a new request on every call. Retries and hedged
+    duplicates are counted on `record` (a telemetry CallRecord) if given.
+    Raises ProviderUnavailableError when no attempt succeeded in time;
+    other errors (bad request, authentication) are raised unchanged.
+    """
+    breaker = get_breaker(model)
+    if hedge_after is None:
+        hedge_after = OPENAI_HEDGE_AFTER.get(model, 0)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    delay = 0.0
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise ProviderUnavailableError(model, breaker.retry_after())
+        remaining = end - loop.time()
+        if remaining <= 0:
+            breaker.release()
+            break
+        try:
+            return await asyncio.wait_for(_hedged(breaker, request, hedge_after, record), timeout=remaining)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            if isinstance(e, asyncio.TimeoutError):
+                breaker.record_failure()
+            delay = max(backoff_delay(attempt), _retry_after(e) or 0)
+            if attempt == retries or loop.time() + delay >= end:
+                logger.warning(f"{model} call failed after {attempt + 1} attempts: {e!r}")
+                raise ProviderUnavailableError(model, max(delay, breaker.retry_after())) from e
+            logger.info(f"{model} call failed ({e!r}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            if record is not None:
+                record.retries += 1
+
+    raise ProviderUnavailableError(model, max(delay, breaker.retry_after()))
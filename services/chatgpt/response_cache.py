@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from config import REDIS_URL, LLM_CACHE_ENABLED, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger("llm_cache")
+
+
+class LLMResponseCache:
+    """
+    Content-addressed Redis cache for deterministic OpenAI responses.
+
+    Entries are keyed by a hash of model, messages and request parameters,
+    expire after a TTL and are evicted oldest-first once the cache grows
+    beyond the configured number of entries.
+    """
+    PREFIX = "llm_cache"
+    INDEX_KEY = "llm_cache:index"
+    STATS_KEY = "llm_cache:stats"
+
+    def __init__(
+        self,
+        redis_url: str = REDIS_URL,
+        ttl: int = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        enabled: bool = LLM_CACHE_ENABLED,
+    ):
+        self.redis = Redis.from_url(redis_url, decode_responses=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict], params: dict) -> str:
+        """
+        Build a stable hash of everything that influences the completion.
+        """
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.PREFIX}:{key}"
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached response or None, counting hits and misses.
+        """
+        if not self.enabled:
+            return None
+        try:
+            value = await self.redis.get(self._entry_key(key))
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hincrby(self.STATS_KEY, "hits" if value is not None else "misses", 1)
+                if value is not None:
+                    pipe.zadd(self.INDEX_KEY, {key: time.time()})
+                await pipe.execute()
+            return value
+        except RedisError as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+
+    async def set(self, key: str, value: str):
+        """
+        Store a response and evict the oldest entries above the size bound.
+        """
+        if not self.enabled or not value:
+            return
+        try:
+            now = time.time()
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(self._entry_key(key), value, ex=self.ttl)
+                pipe.zadd(self.INDEX_KEY, {key: now})
+                # Index members of entries that already expired
+                pipe.zremrangebyscore(self.INDEX_KEY, "-inf", now - self.ttl)
+                pipe.zcard(self.INDEX_KEY)
+                *_, size = await pipe.execute()
+
+            excess = size - self.max_entries
+            if excess > 0:
+                evicted = await self.redis.zpopmin(self.INDEX_KEY, excess)
+                if evicted:
+                    await self.redis.delete(*[self._entry_key(k) for k, _ in evicted])
+                    await self.redis.hincrby(self.STATS_KEY, "evictions", len(evicted))
+        except RedisError as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    async def stats(self) -> dict:
+        """
+        Return hit, miss and eviction counters and the current size.
+        """
+        data = await self.redis.hgetall(self.STATS_KEY)
+        size = await self.redis.zcard(self.INDEX_KEY)
+        return {
+            "hits": int(data.get("hits", 0)),
+            "misses": int(data.get("misses", 0)),
+            "evictions": int(data.get("evictions", 0)),
+            "size": size,
+        }
+
+# Singleton instance for import
+response_cache = LLMResponseCache()
@@ -0,0 +1,173 @@
+from typing import Literal
+from pydantic import BaseModel, ConfigDict
+
+
+class StrictModel(BaseModel):
+    """
+    Base for ChatGPT response models: no extra keys, every field required,
+    as OpenAI structured outputs expect in strict mode.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+
+def response_format(model: type[StrictModel]) -> dict:
+    """
+    `response_format` argument that makes OpenAI return JSON matching the model.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": model.model_json_schema(),
+            "strict": True,
+        },
+    }
+
+
+# === Writing ===
+
+class WritingTask1Question(StrictModel):
+    question: str
+    chart_type: Literal["bar", "line", "pie"]
+    categories: list[str]
+    year1: int
+    year2: int
+    data_year1: list[float]
+    data_year2: list[float]
+
+
+class WritingTask2Question(StrictModel):
+    question: str
+
+
+class WritingCriterion(StrictModel):
+    Score: float
+    Feedback: str
+
+
+class WritingTimingFeedback(StrictModel):
+    Feedback: str
+
+
+class WritingTask1Analysis(StrictModel):
+    TaskAchievement: WritingCriterion
+    CoherenceAndCohesion: WritingCriterion
+    LexicalResource: WritingCriterion
+    GrammaticalRangeAndAccuracy: WritingCriterion
+    WordCount: WritingCriterion
+    TimingFeedback: WritingTimingFeedback
+
+
+class WritingTask2Analysis(StrictModel):
+    TaskResponse: WritingCriterion
+    CoherenceAndCohesion: WritingCriterion
+    LexicalResource: WritingCriterion
+    GrammaticalRangeAndAccuracy: WritingCriterion
+    WordCount: WritingCriterion
+    TimingFeedback: WritingTimingFeedback
+
+
+class WritingAnalysis(StrictModel):
+    """
+    The overall band is left out on purpose: WritingAnalyseService computes it from the criteria.
+    """
+    Task1: WritingTask1Analysis
+    Task2: WritingTask2Analysis
+    overall_feedback: str
+
+
+class WritingCandidateAnalysis(WritingAnalysis):
+    candidate: int
+
+
+class WritingAnalyses(StrictModel):
+    """
+    Several candidates graded in one request, matched back by their "candidate" number.
+    """
+    analyses: list[WritingCandidateAnalysis]
+
+
+# === Speaking ===
+
+class SpeakingPartQuestions(StrictModel):
+    title: str
+    question: list[str]
+
+
+class SpeakingQuestions(StrictModel):
+    part1: SpeakingPartQuestions
+    part2: SpeakingPartQuestions
+    part3: SpeakingPartQuestions
+
+
+class SpeakingAnalysis(StrictModel):
+    """
+    Scores come before feedback, so a streamed reply shows all of them within the first tokens.
+    """
+    fluency_and_coherence_score: float
+    lexical_resource_score: float
+    grammatical_range_and_accuracy_score: float
+    pronunciation_score: float
+    overall_band_score: float
+    part1_score: float
+    part2_score: float
+    part3_score: float
+    fluency_and_coherence_feedback: str
+    lexical_resource_feedback: str
+    grammatical_range_and_accuracy_feedback: str
+    pronunciation_feedback: str
+    feedback: str
+    part1_feedback: str
+    part2_feedback: str
+    part3_feedback: str
+
+
+# === Reading ===
+
+class ReadingAnswerCheck(StrictModel):
+    question_id: int
+    correct_answer: str
+    explanation: str
+    is_correct: bool
+
+
+class ReadingAnswerChecks(StrictModel):
+    """
+    Verdicts only: user answers are not echoed back and stats are counted locally.
+    """
+    analysis: list[ReadingAnswerCheck]
+
+
+class ReadingAnswerKeyItem(StrictModel):
+    question_id: int
+    kind: Literal["true_false_not_given", "yes_no_not_given", "short_answer", "free_form"]
+    canonical_answer: str
+    accepted_answers: list[str]
+
+
+class ReadingAnswerKeys(StrictModel):
+    keys: list[ReadingAnswerKeyItem]
+
+
+class GeneratedReadingAnswer(StrictModel):
+    text: str
+    is_correct: bool
+
+
+class GeneratedReadingQuestion(StrictModel):
+    text: str
+    type: Literal["TEXT", "MULTIPLE_CHOICE"]
+    score: int
+    answers: list[GeneratedReadingAnswer]
+
+
+class GeneratedReadingPassage(StrictModel):
+    number: int
+    skill: str
+    title: str
+    passage: str
+    questions: list[GeneratedReadingQuestion]
+
+
+class GeneratedReadingPassages(StrictModel):
+    passages: list[GeneratedReadingPassage]
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from config import LLM_METRICS_ENABLED, LLM_METRICS_FLUSH_INTERVAL, LLM_METRICS_WINDOW, REDIS_URL
+from .resilience import ProviderUnavailableError
+
+logger = logging.getLogger("llm_telemetry")
+
+# Upper bounds of the latency histogram, in seconds
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+OUTCOMES = ("ok", "error", "unavailable", "cancelled", "cache_hit")
+
+
+class CallRecord:
+    """
+    One OpenAI call as seen by a call site. call_openai adds its retries and
+    hedged duplicates; the integration adds the token usage of the response.
+    """
+    __slots__ = ("feature", "model", "started", "retries", "hedges", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, feature: str, model: str):
+        self.feature = feature
+        self.model = model
+        self.started = time.perf_counter()
+        self.retries = 0
+        self.hedges = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add_usage(self, usage):
+        """
+        Token counts of an OpenAI response (`response.usage`, None when not reported).
+        """
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+
+class _Call:
+    """
+    Context manager around one call: the outcome follows from how the block exits.
+    """
+    __slots__ = ("telemetry", "record")
+
+    def __init__(self, telemetry: "LLMTelemetry", record: CallRecord):
+        self.telemetry = telemetry
+        self.record = record
+
+    def __enter__(self) -> CallRecord:
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            outcome = "cancelled"
+        elif issubclass(exc_type, ProviderUnavailableError):
+            outcome = "unavailable"
+        else:
+            outcome = "error"
+        self.telemetry.finish(self.record, outcome)
+        return False
+
+
+class LLMTelemetry:
+    """
+    Cost and latency of OpenAI calls per call site ("feature") and model:
+    calls by outcome, prompt and completion tokens, retries, hedges, cache hits
+    and a latency histogram.
+
+    Calls are counted in memory and flushed to Redis at most every
+    `flush_interval` seconds, into running totals (served as Prometheus
+    counters by /metrics) and per-minute buckets kept for `window` seconds
+    (the rolling summary). The API and the arq worker flush into the same
+    keys, so both show the whole deployment. Redis errors are logged and the
+    counts are kept for the next flush.
+    """
+    PREFIX = "llm_metrics"
+
+    def __init__(
+        self,
+        redis_url: str = REDIS_URL,
+        enabled: bool = LLM_METRICS_ENABLED,
+        flush_interval: float = LLM_METRICS_FLUSH_INTERVAL,
+        window: int = LLM_METRICS_WINDOW,
+    ):
+        self.redis = Redis.from_url(redis_url, decode_responses=True)
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.window = window
+        # {(minute, feature, model): {field: value}} not yet written to Redis
+        self._pending: dict[tuple[int, str, str], dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._last_flush = time.monotonic()
+        self._flushing: Optional[asyncio.Task] = None
+
+    @property
+    def totals_key(self) -> str:
+        return f"{self.PREFIX}:total"
+
+    def minute_key(self, minute: int) -> str:
+        return f"{self.PREFIX}:minute:{minute}"
+
+    def call(self, feature: str, model: str) -> _Call:
+        """
+        with llm_telemetry.call("writing_analysis", "gpt-4o") as record: ...
+        """
+        return _Call(self, CallRecord(feature, model))
+
+    def cache_hit(self, feature: str, model: str):
+        """
+        A reply served from the response cache instead of OpenAI.
+        """
+        self.finish(CallRecord(feature, model), "cache_hit")
+
+    def finish(self, record: CallRecord, outcome: str):
+        if not self.enabled:
+            return
+        latency = time.perf_counter() - record.started
+        counts = self._pending[(int(time.time() // 60), record.feature, record.model)]
+        counts[outcome] += 1
+        if outcome != "cache_hit":
+            counts["prompt_tokens"] += record.prompt_tokens
+            counts["completion_tokens"] += record.completion_tokens
+            counts["retries"] += record.retries
+            counts["hedges"] += record.hedges
+            counts["latency_sum"] += latency
+            counts[f"bucket_{self._bucket(latency)}"] += 1
+        self._maybe_flush()
+
+    @staticmethod
+    def _bucket(latency: float) -> int:
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                return index
+        return len(LATENCY_BUCKETS)
+
+    def _maybe_flush(self):
+        if self._flushing is not None or time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flushing = loop.create_task(self.flush())
+        self._flushing.add_done_callback(lambda _: setattr(self, "_flushing", None))
+
+    async def flush(self):
+        """
+        Write the counts gathered since the last flush to Redis.
+        """
+        self._last_flush = time.monotonic()
+        pending, self._pending = self._pending, defaultdict(lambda: defaultdict(float))
+        if not pending:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for (minute, feature, model), counts in pending.items():
+                    minute_key = self.minute_key(minute)
+                    for field, value in counts.items():
+                        name = f"{feature}|{model}|{field}"
+                        pipe.hincrbyfloat(self.totals_key, name, value)
+                        pipe.hincrbyfloat(minute_key, name, value)
+                    pipe.expire(minute_key, self.window + 60)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"LLM metrics not flushed, keeping them for the next try: {e}")
+            for key, counts in pending.items():
+                for field, value in counts.items():
+                    self._pending[key][field] += value
+
+    @staticmethod
+    def _parse(raw: dict[str, str]) -> dict[tuple[str, str], dict[str, float]]:
+        series: dict[tuple[str, str], dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for name, value in raw.items():
+            feature, model, field = name.rsplit("|", 2)
+            series[(feature, model)][field] += float(value)
+        return series
+
+    async def totals(self) -> dict[tuple[str, str], dict[str, float]]:
+        """
+        Running totals per (feature, model), including this process's unflushed counts.
+        Raises RedisError if they cannot be read.
+        """
+        await self.flush()
+        return self._parse(await self.redis.hgetall(self.totals_key))
+
+    async def summary(self, seconds: Optional[int] = None) -> list[dict]:
+        """
+        Calls, tokens and latency per (feature, model) over the last `seconds`
+        (at most the configured window), most expensive first.
+        Raises RedisError if they cannot be read.
+        """
+        await self.flush()
+        seconds = min(seconds or self.window, self.window)
+        now = int(time.time() // 60)
+        minutes = range(now - seconds // 60, now + 1)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for minute in minutes:
+                pipe.hgetall(self.minute_key(minute))
+            buckets = await pipe.execute()
+
+        series: dict[tuple[str, str], dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for raw in buckets:
+            for key, counts in self._parse(raw).items():
+                for field, value in counts.items():
+                    series[key][field] += value
+
+        rows = []
+        for (feature, model), counts in series.items():
+            requests = sum(counts[outcome] for outcome in OUTCOMES if outcome != "cache_hit")
+            lookups = requests + counts["cache_hit"]
+            rows.append({
+                "feature": feature,
+                "model": model,
+                "calls": {outcome: int(counts[outcome]) for outcome in OUTCOMES},
+                "prompt_tokens": int(counts["prompt_tokens"]),
+                "completion_tokens": int(counts["completion_tokens"]),
+                "retries": int(counts["retries"]),
+                "hedges": int(counts["hedges"]),
+                "cache_hit_rate": round(counts["cache_hit"] / lookups, 3) if lookups else 0.0,
+                "avg_latency": round(counts["latency_sum"] / requests, 3) if requests else None,
+                "p95_latency": self._quantile(counts, requests, 0.95),
+            })
+        rows.sort(key=lambda row: row["prompt_tokens"] + row["completion_tokens"], reverse=True)
+        return rows
+
+    @staticmethod
+    def _quantile(counts: dict[str, float], total: float, q: float) -> Optional[float]:
+        """
+        Upper bound of the histogram bucket holding the q-quantile (None above the last bound).
+        """
+        seen = 0.0
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            seen += counts.get(f"bucket_{index}", 0)
+            if total and seen >= q * total:
+                return bound
+        return None
+
+    async def render_prometheus(self) -> str:
+        """
+        Running totals in the Prometheus text exposition format.
+        """
+        series = sorted((await self.totals()).items())
+        lines = [
+            "# HELP llm_calls_total OpenAI calls by call site, model and outcome.",
+            "# TYPE llm_calls_total counter",
+        ]
+        for (feature, model), counts in series:
+            for outcome in OUTCOMES:
+                lines.append(f'llm_calls_total{{feature="{feature}",model="{model}",outcome="{outcome}"}} {counts[outcome]:g}')
+        for field, help_text in (
+            ("prompt_tokens", "Prompt tokens sent."),
+            ("completion_tokens", "Completion tokens received."),
+            ("retries", "Retried attempts of OpenAI calls."),
+            ("hedges", "Hedged duplicate requests started."),
+        ):
+            lines += [f"# HELP llm_{field}_total {help_text}", f"# TYPE llm_{field}_total counter"]
+            for (feature, model), counts in series:
+                lines.append(f'llm_{field}_total{{feature="{feature}",model="{model}"}} {counts[field]:g}')
+
+        lines += [
+            "# HELP llm_latency_seconds Time of OpenAI calls including retries.",
+            "# TYPE llm_latency_seconds histogram",
+        ]
+        for (feature, model), counts in series:
+            labels = f'feature="{feature}",model="{model}"'
+            cumulative = 0.0
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                cumulative += counts.get(f"bucket_{index}", 0)
+                lines.append(f'llm_latency_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative:g}')
+            cumulative += counts.get(f"bucket_{len(LATENCY_BUCKETS)}", 0)
+            lines.append(f'llm_latency_seconds_bucket{{{labels},le="+Inf"}} {cumulative:g}')
+            lines.append(f"llm_latency_seconds_sum{{{labels}}} {counts['latency_sum']:g}")
+            lines.append(f"llm_latency_seconds_count{{{labels}}} {cumulative:g}")
+        return "\n".join(lines) + "\n"
+
+# Singleton instance for import
+llm_telemetry = LLMTelemetry()
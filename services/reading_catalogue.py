@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Optional
+
+from models.tests import ReadingPassage, ReadingQuestion, ReadingVariant
+from config import READING_CATALOGUE_MAX_AGE
+
+# Passages used for generated sessions (fixture bank)
+BANK_MIN_PASSAGE_ID = 20
+BANK_MAX_PASSAGE_ID = 102
+
+
+class _Entry:
+    """
+    Read-only record: attributes are set once in __init__.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _init(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+
+class VariantEntry(_Entry):
+    __slots__ = ("id", "question_id", "text", "is_correct")
+
+    def __init__(self, id: int, question_id: int, text: str, is_correct: bool):
+        self._init(id=id, question_id=question_id, text=text, is_correct=is_correct)
+
+
+class QuestionEntry(_Entry):
+    __slots__ = ("id", "passage_id", "text", "type", "score", "variants", "correct_variant")
+
+    def __init__(self, id: int, passage_id: int, text: str, type: str, score: int, variants: tuple):
+        correct_variant = next((v for v in variants if v.is_correct), None)
+        self._init(
+            id=id, passage_id=passage_id, text=text, type=type, score=score,
+            variants=variants, correct_variant=correct_variant,
+        )
+
+
+class PassageEntry(_Entry):
+    __slots__ = ("id", "level", "number", "title", "text", "skills", "questions")
+
+    def __init__(self, id: int, level: str, number: Optional[int], title: str, text: str, skills: Optional[str], questions: tuple):
+        self._init(id=id, level=level, number=number, title=title, text=text, skills=skills, questions=questions)
+
+
+class ReadingCatalogue:
+    """
+    Process-local, read-only copy of the reading passage bank
+    (passages, questions and variants), loaded with three queries.
+    It is reloaded after admin edits and when older than READING_CATALOGUE_MAX_AGE.
+    """
+
+    def __init__(self, max_age: int = READING_CATALOGUE_MAX_AGE):
+        self.max_age = max_age
+        self._passages: dict[int, PassageEntry] = {}
+        self._questions: dict[int, QuestionEntry] = {}
+        self._loaded_at: float = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def load(self):
+        """
+        Load the whole passage bank and swap it in at once.
+        """
+        passage_rows = await ReadingPassage.all().values("id", "level", "number", "title", "text", "skills")
+        question_rows = await ReadingQuestion.all().order_by("id").values("id", "passage_id", "text", "type", "score")
+        variant_rows = await ReadingVariant.all().order_by("id").values("id", "question_id", "text", "is_correct")
+
+        variants_by_qid: dict[int, list] = {}
+        for row in variant_rows:
+            variants_by_qid.setdefault(row["question_id"], []).append(VariantEntry(**row))
+
+        questions: dict[int, QuestionEntry] = {}
+        questions_by_pid: dict[int, list] = {}
+        for row in question_rows:
+            question = QuestionEntry(
+                id=row["id"],
+                passage_id=row["passage_id"],
+                text=row["text"],
+                type=getattr(row["type"], "value", row["type"]),
+                score=row["score"],
+                variants=tuple(variants_by_qid.get(row["id"], ())),
+            )
+            questions[question.id] = question
+            questions_by_pid.setdefault(question.passage_id, []).append(question)
+
+        passages = {
+            row["id"]: PassageEntry(
+                id=row["id"],
+                level=getattr(row["level"], "value", row["level"]),
+                number=row["number"],
+                title=row["title"],
+                text=row["text"],
+                skills=row["skills"],
+                questions=tuple(questions_by_pid.get(row["id"], ())),
+            )
+            for row in passage_rows
+        }
+
+        self._passages, self._questions = passages, questions
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """
+        Mark the catalogue stale; the next access reloads it.
+        """
+        self._loaded_at = 0.0
+
+    async def ensure_loaded(self):
+        if self._loaded_at and time.monotonic() - self._loaded_at < self.max_age:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded_at and time.monotonic() - self._loaded_at < self.max_age:
+                return
+            await self.load()
+
+    async def get_passage(self, passage_id: int) -> Optional[PassageEntry]:
+        await self.ensure_loaded()
+        return self._passages.get(passage_id)
+
+    async def get_passages(self, passage_ids: list[int]) -> list[PassageEntry]:
+        """
+        Passages in the given order; unknown ids are skipped.
+        """
+        await self.ensure_loaded()
+        return [self._passages[pid] for pid in passage_ids if pid in self._passages]
+
+    async def get_question(self, question_id: int) -> Optional[QuestionEntry]:
+        await self.ensure_loaded()
+        return self._questions.get(question_id)
+
+    async def bank_passage_ids(self) -> list[int]:
+        """
+        Sorted ids of the passages used for new sessions.
+        """
+        await self.ensure_loaded()
+        return sorted(
+            pid for pid in self._passages
+            if BANK_MIN_PASSAGE_ID <= pid <= BANK_MAX_PASSAGE_ID
+        )
+
+# Singleton instance for import
+reading_catalogue = ReadingCatalogue()
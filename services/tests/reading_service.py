@@ -2,17 +2,21 @@ from fastapi import HTTPException, status
 from typing import List, Dict, Any
 from tortoise.transactions import in_transaction
 from datetime import datetime, timedelta, timezone
+from arq.jobs import Job, JobStatus
 import json
 import random
 
 from models.tests import (
-    ReadingPassage, ReadingQuestion, ReadingVariant,
-    Reading, ReadingAnswer,
+    ReadingPassage, Reading, ReadingAnswer,
     Constants, TestTypeEnum
 )
+from models.analyses import ReadingAnalyse
 from services.analyses import ReadingAnalyseService
 from services.chatgpt import ChatGPTReadingIntegration
+from services.reading_catalogue import reading_catalogue
 from utils import get_user_actual_test_price
+from utils.ielts_score import reading_band
+from config import ANALYSIS_MAX_WAIT
 from models import TokenTransaction, TransactionType, User
 
 DIFFICULTY_ORDER = ["easy", "medium", "hard"]
@@ -80,8 +84,8 @@ class ReadingService:
                 detail=t.get("insufficient_tokens", "Insufficient tokens")
             )
 
-        # Get passages from database
-        passage_ids = [p.id for p in await ReadingPassage.filter(id__gte=20, id__lte=102)]
+        # Get passages from the in-memory catalogue
+        passage_ids = await reading_catalogue.bank_passage_ids()
         if len(passage_ids) < 3:
             raise HTTPException(
                 status_code=400,
@@ -91,7 +95,7 @@ class ReadingService:
         # Select random passage set
         start_idx = random.randint(0, len(passage_ids) - 3)
         selected_ids = passage_ids[start_idx:start_idx+3]
-        passages = await ReadingPassage.filter(id__in=selected_ids).prefetch_related("questions__variants")
+        passages = await ReadingPassage.filter(id__in=selected_ids)
 
         # Create session and process payment
         async with in_transaction():
@@ -117,25 +121,31 @@ class ReadingService:
             )
             
             # Associate passages with session
-            for passage in passages:
-                await session.passages.add(passage)
+            await session.passages.add(*passages)
                 
             # Create blank answers
-            await ReadingService._create_blank_answers(session)
+            await ReadingService._create_blank_answers(session, [p.id for p in passages])
             
-        return await ReadingService._format_session_data(session)
+        return await ReadingService._format_session_data(session, [p.id for p in passages])
 
     @staticmethod
-    async def _create_blank_answers(session: Reading):
+    async def _session_passage_ids(session: Reading) -> List[int]:
+        """
+        Ids of the passages linked to the session, in id order.
+        """
+        return sorted(await session.passages.all().values_list("id", flat=True))
+
+    @staticmethod
+    async def _create_blank_answers(session: Reading, passage_ids: List[int] = None):
         """
         Create blank answers for all questions in the reading session.
         """
-        passages = await session.passages.all()
-        passage_ids = [p.id for p in passages]
+        if passage_ids is None:
+            passage_ids = await ReadingService._session_passage_ids(session)
         if not passage_ids:
             return
 
-        questions = await ReadingQuestion.filter(passage_id__in=passage_ids)
+        passages = await reading_catalogue.get_passages(passage_ids)
 
         answers = [
             ReadingAnswer(
@@ -144,16 +154,19 @@ class ReadingService:
                 question_id=question.id,
                 status=ReadingAnswer.NOT_ANSWERED,
             )
-            for question in questions
+            for passage in passages
+            for question in passage.questions
         ]
         await ReadingAnswer.bulk_create(answers)
 
     @staticmethod
-    async def _format_session_data(session: Reading) -> Dict[str, Any]:
+    async def _format_session_data(session: Reading, passage_ids: List[int] = None) -> Dict[str, Any]:
         """
         Format reading session data for response.
         """
-        passages = await session.passages.all().prefetch_related("questions__variants")
+        if passage_ids is None:
+            passage_ids = await ReadingService._session_passage_ids(session)
+        passages = await reading_catalogue.get_passages(sorted(passage_ids))
         return {
             "id": session.id,
             "start_time": session.start_time,
@@ -163,7 +176,7 @@ class ReadingService:
                     "id": passage.id,
                     "title": passage.title,
                     "skills": passage.skills,
-                    "questions_count": await passage.questions.all().count(),
+                    "questions_count": len(passage.questions),
                 }
                 for passage in passages
             ],
@@ -175,7 +188,8 @@ class ReadingService:
     ) -> int:
         """
         Save answers for a reading session passage. No analysis here!
-        Only checks session status.
+        Checks session status and that every question belongs to the session,
+        then upserts all answers in one statement.
         """
         # Validate session exists
         session = await Reading.get_or_none(id=session_id, user_id=user_id)
@@ -192,28 +206,47 @@ class ReadingService:
                 detail=t.get("session_already_completed_or_cancelled", "Session already completed or cancelled")
             )
 
-        # Save answers
-        async with in_transaction():
-            for ans in answers:
-                await ReadingAnswer.update_or_create(
-                    defaults={
-                        "text": ans.get("answer", "").strip(),
-                        "status": ReadingAnswer.ANSWERED,
-                    },
-                    user_id=user_id,
-                    reading_id=session_id,
-                    question_id=ans["question_id"],
+        # Keep the last answer per question
+        submitted = {}
+        for ans in answers:
+            submitted[ans["question_id"]] = (ans.get("answer") or "").strip()
+
+        # Validate questions belong to the session's passages
+        passage_ids = set(await ReadingService._session_passage_ids(session))
+        for question_id in submitted:
+            question = await reading_catalogue.get_question(question_id)
+            if not question or question.passage_id not in passage_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=t.get("invalid_question_ids", "Questions do not belong to this reading session")
                 )
-                
-        return len(answers)
+
+        # Save answers with a single upsert
+        if submitted:
+            await ReadingAnswer.bulk_create(
+                [
+                    ReadingAnswer(
+                        user_id=user_id,
+                        reading_id=session_id,
+                        question_id=question_id,
+                        text=text,
+                        status=ReadingAnswer.ANSWERED,
+                    )
+                    for question_id, text in submitted.items()
+                ],
+                on_conflict=["reading_id", "user_id", "question_id"],
+                update_fields=["text", "status", "updated_at"],
+            )
+
+        return len(submitted)
 
     @staticmethod
-    async def finish_session(session_id: int, user_id: int, t: dict) -> Dict[str, Any]:
+    async def _complete_session(session_id: int, user_id: int, t: dict) -> Reading:
         """
-        Finish reading session and get analysis.
+        Validate the session and mark it as completed.
         """
         # Validate session exists
-        session = await Reading.get_or_none(id=session_id, user_id=user_id).prefetch_related("passages")
+        session = await Reading.get_or_none(id=session_id, user_id=user_id)
         if not session:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -227,16 +260,114 @@ class ReadingService:
                 detail=t.get("session_already_completed_or_cancelled", "Session already completed or cancelled")
             )
 
-        # Mark as completed and analyze
         session.status = Constants.ReadingStatus.COMPLETED.value
         session.end_time = datetime.now(timezone.utc)
         await session.save()
+        return session
+
+    @staticmethod
+    def _analysis_job_id(session_id: int) -> str:
+        return f"analyse_reading:{session_id}"
+
+    @staticmethod
+    async def finish_session(session_id: int, user_id: int, t: dict) -> Dict[str, Any]:
+        """
+        Finish reading session and get analysis.
+        """
+        session = await ReadingService._complete_session(session_id, user_id, t)
 
         # Generate analysis
         await ReadingAnalyseService.analyse(session_id, user_id)
         
         return await ReadingService._full_analysis_response(session, user_id)
 
+    @staticmethod
+    async def finish_session_background(session_id: int, user_id: int, t: dict, redis) -> Dict[str, Any]:
+        """
+        Finish reading session and queue the analysis on the arq worker.
+        The result is fetched with get_analysis_status.
+        """
+        await ReadingService._complete_session(session_id, user_id, t)
+
+        job_id = ReadingService._analysis_job_id(session_id)
+        await redis.enqueue_job("analyse_reading", reading_id=session_id, user_id=user_id, _job_id=job_id)
+
+        return {
+            "session_id": session_id,
+            "job_id": job_id,
+            "status": JobStatus.queued.value,
+            "message": t.get("analysis_started", "Analysis started, please try again later"),
+        }
+
+    @staticmethod
+    async def _is_analysed(session: Reading, user_id: int) -> bool:
+        """
+        True when every passage of the session has an analysis.
+        """
+        passage_ids = await ReadingService._session_passage_ids(session)
+        analysed = await ReadingAnalyse.filter(passage_id__in=passage_ids, user_id=user_id).count()
+        return analysed >= len(passage_ids)
+
+    @staticmethod
+    async def get_analysis_status(session_id: int, user_id: int, t: dict, redis, wait: float = 0) -> Dict[str, Any]:
+        """
+        Status of a background analysis. Waits up to `wait` seconds
+        (capped by ANALYSIS_MAX_WAIT) for a queued job to finish, then
+        returns the full analysis once it is ready.
+        """
+        session = await Reading.get_or_none(id=session_id, user_id=user_id)
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=t.get("session_not_found", "Session not found")
+            )
+
+        if session.status != Constants.ReadingStatus.COMPLETED.value:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=t.get("session_not_completed", "Session not completed")
+            )
+
+        job_id = ReadingService._analysis_job_id(session_id)
+        job = Job(job_id, redis)
+        job_status = await job.status()
+
+        if job_status in (JobStatus.queued, JobStatus.deferred, JobStatus.in_progress) and wait > 0:
+            try:
+                await job.result(timeout=min(wait, ANALYSIS_MAX_WAIT))
+            except Exception:
+                # Still running or failed; a failure is reported below from the job result
+                pass
+            job_status = await job.status()
+
+        if await ReadingService._is_analysed(session, user_id):
+            return {
+                "session_id": session_id,
+                "job_id": job_id,
+                "status": JobStatus.complete.value,
+                "result": await ReadingService._full_analysis_response(session, user_id),
+            }
+
+        if job_status == JobStatus.complete:
+            info = await job.result_info()
+            if info and not info.success:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=t.get("analysis_not_found", "Failed to generate analysis")
+                )
+
+        if job_status == JobStatus.not_found:
+            # Job result expired or lost: queue it again, analysed passages are skipped
+            await redis.enqueue_job("analyse_reading", reading_id=session_id, user_id=user_id, _job_id=job_id)
+            job_status = JobStatus.queued
+
+        return {
+            "session_id": session_id,
+            "job_id": job_id,
+            "status": job_status.value,
+            "message": t.get("analysis_started", "Analysis started, please try again later"),
+        }
+
     @staticmethod
     async def cancel_session(session_id: int, user_id: int, t: dict) -> Dict[str, Any]:
         """
@@ -302,7 +433,7 @@ class ReadingService:
         Get analysis for a completed session.
         """
         # Validate session exists
-        session = await Reading.get_or_none(id=session_id, user_id=user_id).prefetch_related("passages")
+        session = await Reading.get_or_none(id=session_id, user_id=user_id)
         if not session:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -324,17 +455,17 @@ class ReadingService:
         Generate detailed analysis response.
         """
         # Load passages and questions
-        passages = await session.passages.all().prefetch_related("questions__variants")
-        passage_ids = [p.id for p in passages]
+        passage_ids = await ReadingService._session_passage_ids(session)
+        passages = await reading_catalogue.get_passages(passage_ids)
 
         # Load existing analyses and answers
-        analyses = await ReadingAnalyseService.get_all_analyses(session.id, user_id)
+        analyses = await ReadingAnalyse.filter(passage_id__in=passage_ids, user_id=user_id)
         analyses_by_pid = {a.passage_id: a for a in analyses}
         answers = await ReadingAnswer.filter(
             user_id=user_id,
             reading_id=session.id,
             question_id__in=[q.id for p in passages for q in p.questions]
-        ).select_related("question")
+        )
         answers_by_qid = {a.question_id: a for a in answers}
 
         # Format passage results
@@ -358,7 +489,7 @@ class ReadingService:
                 if ans and ans.correct_answer not in (None, "default", ""):
                     corr_ans = ans.correct_answer
                 elif question.type == "MULTIPLE_CHOICE":
-                    correct_var = next((v for v in question.variants if v.is_correct), None)
+                    correct_var = question.correct_variant
                     corr_ans = correct_var.text if correct_var else ""
                 else:
                     corr_ans = ""
@@ -393,31 +524,7 @@ class ReadingService:
             })
 
         # Compute overall IELTS band (use IELTS mapping, not percent)
-        def calculate_ielts_band(correct):
-            mapping = {
-                range(39, 41): 9.0,
-                range(37, 39): 8.5,
-                range(35, 37): 8.0,
-                range(32, 35): 7.5,
-                range(30, 32): 7.0,
-                range(26, 30): 6.5,
-                range(23, 26): 6.0,
-                range(18, 23): 5.5,
-                range(16, 18): 5.0,
-                range(13, 16): 4.5,
-                range(10, 13): 4.0,
-                range(7, 10): 3.5,
-                range(5, 7): 3.0,
-                range(3, 5): 2.5,
-                range(1, 3): 2.0,
-                range(0, 1): 0.0,
-            }
-            for score_range, band in mapping.items():
-                if total_correct in score_range:
-                    return band
-            return 0.0
-
-        band = calculate_ielts_band(total_correct)
+        band = reading_band(total_correct)
 
         # Calculate elapsed time
         elapsed = (session.end_time - session.start_time).total_seconds() / 60
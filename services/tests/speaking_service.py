@@ -1,9 +1,11 @@
 from fastapi import HTTPException, status, UploadFile
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Optional
 from tortoise.transactions import in_transaction
 from datetime import datetime, timezone
+import asyncio
 import json
 import os
+import time
 from uuid import uuid4
 from pathlib import Path
 import aiofiles
@@ -16,35 +18,47 @@ from models.tests import (
     TestTypeEnum,
     SpeakingPart,
 )
+from models.analyses import SpeakingAnalyse
 from services.analyses import SpeakingAnalyseService
+from services.analyses.speaking_analyse_service import analyse_to_dict
+from services.audio_preprocessor import audio_preprocessor
+from services.chatgpt.resilience import ProviderUnavailableError
 from services.chatgpt.speaking_integration import ChatGPTSpeakingIntegration
+from services.transcription import TranscriptionUnavailable, transcription_backend
+from .task_pool import speaking_question_pool
 from utils.get_actual_price import get_user_actual_test_price
 from models import TokenTransaction, TransactionType, User
-from config import BASE_DIR
+from config import ANALYSIS_STREAM_FALLBACK_DELAY, ANALYSIS_STREAM_MAX_WAIT, BASE_DIR
 
 MEDIA_ROOT = BASE_DIR / "media" / "user_audios"
 MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
+UPLOAD_STAGING_ROOT = BASE_DIR / "media" / "tmp"
+UPLOAD_STAGING_ROOT.mkdir(parents=True, exist_ok=True)
 
 PART_MAP = {
     "part1": SpeakingPart.PART_1.value,
     "part2": SpeakingPart.PART_2.value,
     "part3": SpeakingPart.PART_3.value,
 }
+PART_KEYS = {part: part_key for part_key, part in PART_MAP.items()}
+# Seconds between parts_status checks while a streamed analysis waits for the worker
+STREAM_POLL_INTERVAL = 1.0
 
 async def save_upload_file_async(upload_file: UploadFile, folder: Path = MEDIA_ROOT) -> str:
     """
-    Save uploaded audio file with unique name.
+    Stream uploaded audio file to a staging file in 1 MB chunks, pre-process it
+    (silence trimming, mono 16 kHz, Opus) and store it in folder with a unique name.
+    Returns the path relative to BASE_DIR.
     """
     ext = os.path.splitext(upload_file.filename)[1]
-    filename = f"{uuid4().hex}{ext}"
-    file_path = folder / filename
-    async with aiofiles.open(file_path, "wb") as out_file:
+    staging_path = UPLOAD_STAGING_ROOT / f"{uuid4().hex}{ext}"
+    async with aiofiles.open(staging_path, "wb") as out_file:
         while True:
             chunk = await upload_file.read(1024 * 1024)
             if not chunk:
                 break
             await out_file.write(chunk)
-    await upload_file.seek(0)
+    file_path = await audio_preprocessor.process(staging_path, folder)
     return str(file_path.relative_to(BASE_DIR))
 
 class SpeakingService:
@@ -65,15 +79,17 @@ class SpeakingService:
                 detail=t.get("insufficient_tokens", "Insufficient tokens")
             )
 
-        # Generate questions using ChatGPT
-        chatgpt = ChatGPTSpeakingIntegration()
-        try:
-            questions_data = await chatgpt.generate_ielts_speaking_questions(user_id=user.id)
-        except Exception:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=t.get("question_generation_failed", "Failed to generate questions")
-            )
+        # Take a ready question set from the pool, generate one only if it is empty
+        questions_data = await speaking_question_pool.pop()
+        if not questions_data:
+            chatgpt = ChatGPTSpeakingIntegration()
+            try:
+                questions_data = await chatgpt.generate_ielts_speaking_questions(user_id=user.id)
+            except Exception:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=t.get("question_generation_failed", "Failed to generate questions")
+                )
 
         # Create session transaction
         async with in_transaction():
@@ -159,11 +175,12 @@ class SpeakingService:
         }
 
     @staticmethod
-    async def submit_answers(
-        session_id: int, user_id: int, audio_files: Dict[str, Optional[UploadFile]], t: dict, lang_code: str = "en"
-    ) -> Dict[str, Any]:
+    async def _validate_submission(
+        session_id: int, user_id: int, audio_files: Dict[str, Optional[UploadFile]], t: dict
+    ) -> tuple[Speaking, list]:
         """
-        Submit audio answers and perform analysis.
+        Check the session and match uploaded files to questions.
+        Returns the session and (part_key, question, audio) tuples.
         """
         # Validate session exists
         session = await Speaking.get_or_none(id=session_id, user_id=user_id)
@@ -189,60 +206,290 @@ class SpeakingService:
             )
 
         part_map = {q.part: q for q in questions}
-        chatgpt = ChatGPTSpeakingIntegration()
 
-        # Process audio files and save answers
-        async with in_transaction():
-            # Part 1 is required
-            if not audio_files.get("part1"):
+        # Part 1 is required
+        if not audio_files.get("part1"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=t.get("part1_audio_required", "Part 1 audio is required")
+            )
+
+        parts = []
+        for part_key in ["part1", "part2", "part3"]:
+            audio = audio_files.get(part_key)
+            if not audio:
+                continue
+
+            question = part_map.get(PART_MAP[part_key])
+            if not question:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=t.get("part1_audio_required", "Part 1 audio is required")
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=t.get("question_not_found", f"Question for {part_key} not found")
                 )
-                
-            answers = {}
-            for part_key in ["part1", "part2", "part3"]:
-                audio = audio_files.get(part_key)
-                if not audio:
-                    continue
-                    
-                question = part_map.get(PART_MAP[part_key])
-                if not question:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail=t.get("question_not_found", f"Question for {part_key} not found")
-                    )
-                    
-                # Save audio and transcribe
-                audio_path = await save_upload_file_async(audio)
-                text = await chatgpt.transcribe_audio_file_async(audio)
-                
-                # Save answer
-                answer = await SpeakingAnswer.create(
+            parts.append((part_key, question, audio))
+        return session, parts
+
+    @staticmethod
+    async def submit_answers(
+        session_id: int,
+        user_id: int,
+        audio_files: Dict[str, Optional[UploadFile]],
+        t: dict,
+        lang_code: str = "en",
+        analyse: bool = True,
+        redis=None,
+    ) -> Dict[str, Any]:
+        """
+        Submit audio answers and perform analysis.
+        With analyse=False the answers are only transcribed (the analysis is streamed
+        separately); given `redis`, a delayed process_speaking job is queued in case
+        that stream never finishes.
+        If the analysis fails the parts stay transcribed and get_analysis retries it.
+        """
+        session, parts = await SpeakingService._validate_submission(session_id, user_id, audio_files, t)
+
+        async def process_part(audio: UploadFile) -> tuple[str, str]:
+            # Stream to disk, then transcribe from the saved file
+            audio_path = await save_upload_file_async(audio)
+            text = await transcription_backend.transcribe(BASE_DIR / audio_path)
+            return audio_path, text
+
+        # Save and transcribe all parts concurrently
+        results = await asyncio.gather(*[process_part(audio) for _, _, audio in parts])
+
+        # Save answers and mark session as completed
+        async with in_transaction():
+            for (_, question, _), (audio_path, text) in zip(parts, results):
+                await SpeakingAnswer.create(
                     question=question,
                     audio_answer=audio_path,
                     text_answer=text,
                 )
-                answers[part_key] = answer
 
-            # Mark session as completed
             session.status = SpeakingStatus.COMPLETED.value
             session.end_time = datetime.now(timezone.utc)
-            await session.save(update_fields=["status", "end_time"])
+            session.parts_status = {part_key: Speaking.PART_TRANSCRIBED for part_key, _, _ in parts}
+            await session.save(update_fields=["status", "end_time", "parts_status"])
 
-            # Get analysis
-            analyse = await SpeakingAnalyseService.analyse(session.id, lang_code=lang_code, t=t)
-            if not analyse:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=t.get("analysis_not_found", "Failed to generate analysis")
+        if not analyse:
+            if redis is not None:
+                # Finds the analysis already saved when the stream completed
+                await redis.enqueue_job(
+                    "process_speaking", test_id=session.id, lang_code=lang_code, t=t,
+                    _defer_by=ANALYSIS_STREAM_FALLBACK_DELAY,
                 )
+            return {
+                "message": t.get("answers_submitted", "Answers submitted successfully"),
+                "session_id": session.id,
+            }
+
+        # Get analysis
+        try:
+            analyse = await SpeakingAnalyseService.analyse(session.id, lang_code=lang_code, t=t)
+        except Exception:
+            await SpeakingService._mark_failed(session.id, session.parts_status)
+            raise
+        if not analyse:
+            await SpeakingService._mark_failed(session.id, session.parts_status)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=t.get("analysis_not_found", "Failed to generate analysis")
+            )
+
+        session.parts_status = {part_key: Speaking.PART_ANALYSED for part_key in session.parts_status}
+        await session.save(update_fields=["parts_status"])
 
         return {
             "message": t.get("answers_submitted", "Answers submitted successfully"),
             "analysis": analyse,
         }
 
+    @staticmethod
+    async def submit_answers_background(
+        session_id: int, user_id: int, audio_files: Dict[str, Optional[UploadFile]], t: dict, redis, lang_code: str = "en"
+    ) -> Dict[str, Any]:
+        """
+        Save audio answers and queue transcription and analysis on the arq worker.
+        Progress is tracked per part in Speaking.parts_status.
+        """
+        session, parts = await SpeakingService._validate_submission(session_id, user_id, audio_files, t)
+
+        audio_paths = await asyncio.gather(*[save_upload_file_async(audio) for _, _, audio in parts])
+
+        async with in_transaction():
+            for (_, question, _), audio_path in zip(parts, audio_paths):
+                await SpeakingAnswer.create(question=question, audio_answer=audio_path)
+
+            session.status = SpeakingStatus.COMPLETED.value
+            session.end_time = datetime.now(timezone.utc)
+            session.parts_status = {part_key: Speaking.PART_UPLOADED for part_key, _, _ in parts}
+            await session.save(update_fields=["status", "end_time", "parts_status"])
+
+        await redis.enqueue_job("process_speaking", test_id=session.id, lang_code=lang_code, t=t)
+
+        return {
+            "message": t.get("analysis_started", "Analysis started, please try again later"),
+            "session_id": session.id,
+            "parts": session.parts_status,
+        }
+
+    @staticmethod
+    async def process_answers(
+        session_id: int, lang_code: str, t: dict, retryable: bool = False
+    ) -> Optional[dict]:
+        """
+        Transcribe uploaded answers concurrently, then analyse the session.
+        parts_status is updated as each part finishes. On error the parts not
+        analysed yet are marked failed (get_analysis runs this again for them;
+        saved transcriptions are reused), unless the provider is unavailable and
+        retryable says the job runs again.
+        """
+        session = await Speaking.get_or_none(id=session_id)
+        if not session:
+            return None
+
+        answers = await SpeakingAnswer.filter(question__speaking_id=session_id).select_related("question")
+        parts_status = dict(session.parts_status or {})
+
+        async def set_status(part_key: str, value: str):
+            parts_status[part_key] = value
+            await Speaking.filter(id=session_id).update(parts_status=dict(parts_status))
+
+        async def transcribe(answer: SpeakingAnswer):
+            if answer.text_answer is None:
+                answer.text_answer = await transcription_backend.transcribe(BASE_DIR / answer.audio_answer)
+                await answer.save(update_fields=["text_answer"])
+            await set_status(PART_KEYS[answer.question.part], Speaking.PART_TRANSCRIBED)
+
+        try:
+            # Let every transcription finish so parts_status matches the saved answers
+            errors = [
+                result for result in await asyncio.gather(*[transcribe(a) for a in answers], return_exceptions=True)
+                if isinstance(result, Exception)
+            ]
+            if errors:
+                raise errors[0]
+            analyse = await SpeakingAnalyseService.analyse(session_id, lang_code=lang_code, t=t)
+        except Exception as e:
+            if (
+                retryable
+                and isinstance(e, (ProviderUnavailableError, TranscriptionUnavailable))
+                and e.retry_after is not None
+            ):
+                # The job is retried later; transcribed parts are kept
+                raise
+            await SpeakingService._mark_failed(session_id, parts_status)
+            raise
+
+        await Speaking.filter(id=session_id).update(
+            parts_status={part_key: Speaking.PART_ANALYSED for part_key in parts_status}
+        )
+        return analyse
+
+    @staticmethod
+    async def _mark_failed(session_id: int, parts_status: dict):
+        """
+        Mark the parts that are not analysed yet as failed.
+        """
+        await Speaking.filter(id=session_id).update(parts_status={
+            part_key: value if value == Speaking.PART_ANALYSED else Speaking.PART_FAILED
+            for part_key, value in parts_status.items()
+        })
+
+    @staticmethod
+    async def stream_analysis(
+        session_id: int, user_id: int, t: dict, lang_code: str = "en", wait: bool = True
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Analysis events of a completed session for an SSE response.
+        While the worker is still processing, "status" events report the parts;
+        otherwise the analysis is streamed ("field"/"delta", scores first).
+        Ends with "result" (the saved analysis) or "error".
+        Pass wait=False right after submit_answers(analyse=False), whose
+        transcribed parts are waiting for this very stream.
+        """
+        session = await Speaking.get_or_none(id=session_id, user_id=user_id)
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=t.get("session_not_found", "Session not found")
+            )
+        if session.status != SpeakingStatus.COMPLETED.value:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=t.get("session_not_completed", "Session not completed")
+            )
+        if not wait:
+            return SpeakingService._stream_and_mark(session.id, lang_code, t)
+        return SpeakingService._analysis_events(session, lang_code, t)
+
+    @staticmethod
+    async def _analysis_events(session: Speaking, lang_code: str, t: dict) -> AsyncIterator[tuple[str, Any]]:
+        parts_status = session.parts_status or {}
+        busy = (Speaking.PART_UPLOADED, Speaking.PART_TRANSCRIBED)
+        deadline = time.monotonic() + ANALYSIS_STREAM_MAX_WAIT
+        last_parts = None
+        # Wait for background processing (or another analysing request) to finish
+        while any(value in busy for value in parts_status.values()):
+            if await SpeakingAnalyse.exists(speaking_id=session.id):
+                break
+            if parts_status != last_parts:
+                last_parts = parts_status
+                yield "status", {"parts": parts_status}
+            if time.monotonic() >= deadline:
+                yield "error", {
+                    "status_code": status.HTTP_409_CONFLICT,
+                    "detail": t.get("analysis_started", "Analysis started, please try again later"),
+                }
+                return
+            await asyncio.sleep(STREAM_POLL_INTERVAL)
+            session = await Speaking.get(id=session.id)
+            parts_status = session.parts_status or {}
+
+        if Speaking.PART_FAILED in parts_status.values():
+            yield "error", {
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "detail": t.get("analysis_not_found", "Failed to generate analysis"),
+            }
+            return
+
+        async for event in SpeakingService._stream_and_mark(session.id, lang_code, t):
+            yield event
+
+    @staticmethod
+    async def _stream_and_mark(session_id: int, lang_code: str, t: dict) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Stream the analysis of transcribed answers and mark the parts analysed
+        when it completes. If it fails or the client goes away the parts stay
+        transcribed until the fallback job analyses them.
+        """
+        async for event in await SpeakingAnalyseService.analyse_stream(session_id, lang_code=lang_code, t=t):
+            yield event
+        session = await Speaking.get(id=session_id)
+        await Speaking.filter(id=session_id).update(
+            parts_status={part_key: Speaking.PART_ANALYSED for part_key in session.parts_status or {}}
+        )
+
+    @staticmethod
+    async def get_status(session_id: int, user_id: int, t: dict) -> Dict[str, Any]:
+        """
+        Processing state of a submitted session; includes the analysis once ready.
+        """
+        session = await Speaking.get_or_none(id=session_id, user_id=user_id)
+        if not session:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=t.get("session_not_found", "Session not found")
+            )
+
+        existing = await SpeakingAnalyse.get_or_none(speaking_id=session.id)
+        return {
+            "id": session.id,
+            "status": session.status,
+            "parts": session.parts_status or {},
+            "analysis": analyse_to_dict(existing) if existing else None,
+        }
+
     @staticmethod
     async def cancel_session(session_id: int, user_id: int, t: dict) -> dict:
         """
@@ -290,7 +537,8 @@ class SpeakingService:
         session.status = SpeakingStatus.STARTED.value
         session.start_time = datetime.now(timezone.utc)
         session.end_time = None
-        await session.save(update_fields=["status", "start_time", "end_time"])
+        session.parts_status = {}
+        await session.save(update_fields=["status", "start_time", "end_time", "parts_status"])
         return {"message": t.get("session_restarted", "Session restarted")}
     
     @staticmethod
@@ -309,10 +557,22 @@ class SpeakingService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=t.get("session_not_completed", "Session not completed")
             )
+        parts = (session.parts_status or {}).values()
+        if Speaking.PART_UPLOADED in parts or Speaking.PART_TRANSCRIBED in parts:
+            # Background transcription or a streamed analysis has not finished yet
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=t.get("analysis_started", "Analysis started, please try again later")
+            )
         lang_code = "en"
         if request:
             lang_code = request.headers.get("Accept-Language", "en").split(",")[0].lower()
-        analyse = await SpeakingAnalyseService.analyse(session.id, lang_code=lang_code, t=t)
+        if Speaking.PART_FAILED in parts:
+            # A previous transcription or analysis failed: transcribe what is
+            # missing and analyse now
+            analyse = await SpeakingService.process_answers(session.id, lang_code=lang_code, t=t)
+        else:
+            analyse = await SpeakingAnalyseService.analyse(session.id, lang_code=lang_code, t=t)
         
         return {
             "analysis": {
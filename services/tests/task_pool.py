@@ -0,0 +1,389 @@
+import asyncio
+import hashlib
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from config import (
+    BASE_DIR,
+    REDIS_URL,
+    SPEAKING_POOL_SIZE,
+    WRITING_POOL_SIZE,
+    TASK_POOL_REFILL_BATCH,
+)
+from services.chart_renderer import chart_renderer
+from services.chatgpt import ChatGPTSpeakingIntegration, ChatGPTWritingIntegration
+
+logger = logging.getLogger("task_pool")
+
+FIXTURES_DIR = BASE_DIR / "fixtures"
+
+# Take the item at the head of the queue and forget its id, in one atomic
+# step. KEYS: queue, queued ids. Returns the raw item, or false if there is none.
+POP_SCRIPT = """
+local raw = redis.call("LPOP", KEYS[1])
+if raw then
+    redis.call("SREM", KEYS[2], cjson.decode(raw)["id"])
+end
+return raw
+"""
+
+# Append the items whose ids are not queued yet, atomically. KEYS: queue,
+# queued ids and optionally the ids of fixtures ever queued; ARGV: id, item,
+# id, item, ... Returns the number of items appended.
+PUSH_SCRIPT = """
+local added = 0
+for i = 1, #ARGV, 2 do
+    if redis.call("SADD", KEYS[2], ARGV[i]) == 1 then
+        redis.call("RPUSH", KEYS[1], ARGV[i + 1])
+        added = added + 1
+    end
+    if KEYS[3] then
+        redis.call("SADD", KEYS[3], ARGV[i])
+    end
+end
+return added
+"""
+
+# Take up to ARGV[1] items from the head of the list KEYS[1], atomically.
+TAKE_SCRIPT = """
+local taken = redis.call("LRANGE", KEYS[1], 0, tonumber(ARGV[1]) - 1)
+redis.call("LTRIM", KEYS[1], #taken, -1)
+return taken
+"""
+
+
+class TaskPool(ABC):
+    """
+    Redis list of ready-made test content, popped in O(1) when a session starts
+    and topped up by a scheduled arq job.
+
+    Every item carries a stable "id" and is handed out once: a popped item
+    leaves the pool for good, and an item whose id is queued already is not
+    pushed again. Curated fixtures are queued once; after that the pool is
+    kept up with generated items, so no user gets the same item twice.
+    Redis errors are logged and treated as an empty pool.
+    """
+    NAME = "base"
+
+    def __init__(
+        self,
+        redis_url: str = REDIS_URL,
+        size: int = 0,
+        refill_batch: int = TASK_POOL_REFILL_BATCH,
+    ):
+        self.redis = Redis.from_url(redis_url, decode_responses=True)
+        self.size = size
+        self.refill_batch = refill_batch
+        self._pop_script = self.redis.register_script(POP_SCRIPT)
+        self._push_script = self.redis.register_script(PUSH_SCRIPT)
+
+    @property
+    def queue_key(self) -> str:
+        return f"task_pool:{self.NAME}"
+
+    @property
+    def ids_key(self) -> str:
+        return f"task_pool:{self.NAME}:ids"
+
+    @property
+    def fixtures_key(self) -> str:
+        return f"task_pool:{self.NAME}:fixtures"
+
+    @staticmethod
+    def make_id(item: dict) -> str:
+        payload = json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @abstractmethod
+    async def generate(self) -> dict:
+        """
+        Create one new item (e.g. with ChatGPT).
+        """
+
+    def fixture_items(self) -> list[dict]:
+        """
+        Curated items used to fill the pool before anything is generated.
+        """
+        return []
+
+    async def length(self) -> int:
+        try:
+            return await self.redis.llen(self.queue_key)
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable: {e}")
+            return 0
+
+    async def items(self) -> list[dict]:
+        """
+        Everything currently queued, without taking it.
+        """
+        try:
+            return [json.loads(raw) for raw in await self.redis.lrange(self.queue_key, 0, -1)]
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable: {e}")
+            return []
+
+    async def push(self, items: list[dict], fixtures: bool = False) -> int:
+        """
+        Append items that are not queued yet. With fixtures=True they are also
+        recorded as queued fixtures (see new_fixtures). Returns the number added.
+        """
+        if not items:
+            return 0
+        args = []
+        for item in items:
+            item.setdefault("id", self.make_id(item))
+            args += [item["id"], json.dumps(item, ensure_ascii=False, default=str)]
+        keys = [self.queue_key, self.ids_key] + ([self.fixtures_key] if fixtures else [])
+        try:
+            return await self._push_script(keys=keys, args=args)
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable, {len(items)} items not queued: {e}")
+            return 0
+
+    async def pop(self) -> Optional[dict]:
+        """
+        Take the next item, or None if the pool is empty.
+        """
+        try:
+            raw = await self._pop_script(keys=[self.queue_key, self.ids_key])
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    async def new_fixtures(self) -> list[dict]:
+        """
+        Fixture items that have never been queued.
+        """
+        items = self.fixture_items()
+        if not items:
+            return []
+        for item in items:
+            item.setdefault("id", self.make_id(item))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for item in items:
+                pipe.sismember(self.fixtures_key, item["id"])
+            queued = await pipe.execute()
+        return [item for item, was_queued in zip(items, queued) if not was_queued]
+
+    async def refill(self) -> int:
+        """
+        Top the pool up to its size: curated fixtures first, then up to
+        refill_batch generated items. Returns the number of items added.
+        """
+        missing = self.size - await self.length()
+        if missing <= 0:
+            return 0
+
+        try:
+            fixtures = (await self.new_fixtures())[:missing]
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable, not refilled: {e}")
+            return 0
+        added = await self.push(fixtures, fixtures=True)
+        missing -= added
+
+        to_generate = min(missing, self.refill_batch)
+        if to_generate > 0:
+            results = await asyncio.gather(
+                *[self.generate() for _ in range(to_generate)], return_exceptions=True
+            )
+            generated = [r for r in results if isinstance(r, dict)]
+            for error in (r for r in results if isinstance(r, BaseException)):
+                logger.warning(f"{self.NAME} pool generation failed: {error}")
+            added += await self.push(generated)
+
+        logger.info(f"{self.NAME} pool refilled with {added} items")
+        return added
+
+
+class SpeakingQuestionPool(TaskPool):
+    """
+    Question sets for SpeakingService.start_session, in the same format as
+    ChatGPTSpeakingIntegration.generate_ielts_speaking_questions.
+    """
+    NAME = "speaking_questions"
+    PARTS = {"Part 1": "part1", "Part 2": "part2", "Part 3": "part3"}
+
+    def __init__(self, size: int = SPEAKING_POOL_SIZE, **kwargs):
+        super().__init__(size=size, **kwargs)
+
+    async def generate(self) -> dict:
+        return await ChatGPTSpeakingIntegration().generate_ielts_speaking_questions()
+
+    def fixture_items(self) -> list[dict]:
+        """
+        Question sets from fixtures/speaking_questions.json, one per speaking test.
+        """
+        path = FIXTURES_DIR / "speaking_questions.json"
+        if not path.exists():
+            return []
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+
+        sets: dict[int, dict] = {}
+        for row in rows:
+            part_key = self.PARTS.get(row.get("part"))
+            if not part_key:
+                continue
+            content = row["content"]
+            if isinstance(content, str):
+                try:
+                    content = json.loads(content)
+                except ValueError:
+                    content = [content]
+            sets.setdefault(row["speaking_id"], {})[part_key] = {"title": row["title"], "question": content}
+
+        return [
+            {"id": f"fixture:{speaking_id}", **parts}
+            for speaking_id, parts in sorted(sets.items())
+            if len(parts) == len(self.PARTS)
+        ]
+
+
+class WritingTaskPool(TaskPool):
+    """
+    Writing tasks for WritingService.start_session: both questions, the Task 1
+    chart data and its diagram already rendered to media/writing/diagrams.
+
+    A session whose other part was generated takes a single part (pop_part);
+    the unused half of the item is kept as a spare for the next such session,
+    and refill completes leftover halves by generating only the missing part.
+    """
+    NAME = "writing_tasks"
+    # Task fields of each part of an item
+    PARTS = {
+        "part1": ("part1_question", "chart_type", "diagram", "diagram_data"),
+        "part2": ("part2_question",),
+    }
+
+    def __init__(self, size: int = WRITING_POOL_SIZE, **kwargs):
+        super().__init__(size=size, **kwargs)
+        self._take_script = self.redis.register_script(TAKE_SCRIPT)
+
+    def spare_key(self, part: str) -> str:
+        return f"task_pool:{self.NAME}:spare:{part}"
+
+    async def pop_part(self, part: str) -> Optional[dict]:
+        """
+        Fields of one part ("part1" or "part2"): a spare half if there is one,
+        else the part of a whole item, whose other half becomes a spare.
+        None if the pool is empty.
+        """
+        try:
+            raw = await self.redis.lpop(self.spare_key(part))
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable: {e}")
+            return None
+        if raw:
+            return json.loads(raw)
+
+        item = await self.pop()
+        if item is None:
+            return None
+        other = "part2" if part == "part1" else "part1"
+        spare = {field: item[field] for field in self.PARTS[other]}
+        try:
+            await self.redis.rpush(self.spare_key(other), json.dumps(spare, ensure_ascii=False, default=str))
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable, spare {other} dropped: {e}")
+        return {field: item[field] for field in self.PARTS[part]}
+
+    async def complete_spares(self) -> int:
+        """
+        Generate the missing part of up to refill_batch spare halves of each part
+        and queue them as whole items. Halves that fail go back to the spares.
+        Returns the number of items queued.
+        """
+        integration = ChatGPTWritingIntegration()
+
+        async def complete(part: str, half: dict) -> dict:
+            if part == "part1":
+                part2_data = await integration.generate_writing_part2_question()
+                return {**half, "part2_question": part2_data["question"]}
+            return {**half, **await self.build_part1(await integration.generate_writing_part1_question())}
+
+        added = 0
+        for part in self.PARTS:
+            try:
+                taken = await self._take_script(keys=[self.spare_key(part)], args=[self.refill_batch])
+            except RedisError as e:
+                logger.warning(f"{self.NAME} pool unavailable, spares not completed: {e}")
+                return added
+            if not taken:
+                continue
+            results = await asyncio.gather(
+                *[complete(part, json.loads(raw)) for raw in taken], return_exceptions=True
+            )
+            failed = [raw for raw, result in zip(taken, results) if isinstance(result, BaseException)]
+            for error in (r for r in results if isinstance(r, BaseException)):
+                logger.warning(f"{self.NAME} spare {part} not completed: {error}")
+            if failed:
+                try:
+                    await self.redis.rpush(self.spare_key(part), *failed)
+                except RedisError as e:
+                    logger.warning(f"{self.NAME} pool unavailable, {len(failed)} spare {part} dropped: {e}")
+            added += await self.push([r for r in results if isinstance(r, dict)])
+        return added
+
+    async def refill(self) -> int:
+        return await self.complete_spares() + await super().refill()
+
+    async def diagrams(self) -> set[str]:
+        """
+        Diagram files of queued items and spare Task 1 halves, kept by the cleanup job.
+        """
+        diagrams = {item["diagram"] for item in await self.items()}
+        try:
+            spares = await self.redis.lrange(self.spare_key("part1"), 0, -1)
+        except RedisError as e:
+            logger.warning(f"{self.NAME} pool unavailable: {e}")
+            spares = []
+        diagrams.update(json.loads(raw)["diagram"] for raw in spares)
+        return diagrams
+
+    async def generate(self, user_id: Optional[int] = None) -> dict:
+        """
+        Generate both questions concurrently and render the Task 1 diagram.
+        Raises the error of the first part that could not be generated.
+        """
+        part1_data, part2_data = await ChatGPTWritingIntegration().generate_writing_questions(user_id=user_id)
+        for result in (part1_data, part2_data):
+            if isinstance(result, Exception):
+                raise result
+        return {
+            **await self.build_part1(part1_data),
+            "part2_question": part2_data["question"],
+        }
+
+    @staticmethod
+    async def build_part1(part1_data: dict) -> dict:
+        """
+        Task fields of a generated Task 1, with its diagram rendered.
+        Raises ValueError if ChatGPT picked a chart type we cannot draw.
+        """
+        chart_type = part1_data["chart_type"]
+        diagram_data = {
+            "chart_type": chart_type,
+            "categories": part1_data["categories"],
+            "year1": part1_data["year1"],
+            "year2": part1_data["year2"],
+            "data_year1": part1_data["data_year1"],
+            "data_year2": part1_data["data_year2"],
+        }
+        return {
+            "part1_question": part1_data["question"],
+            "chart_type": chart_type,
+            "diagram": await chart_renderer.render(chart_type, diagram_data),
+            "diagram_data": diagram_data,
+        }
+
+# Singleton instances for import
+speaking_question_pool = SpeakingQuestionPool()
+writing_task_pool = WritingTaskPool()
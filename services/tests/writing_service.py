@@ -1,7 +1,9 @@
 from fastapi import HTTPException, status
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Optional
 from tortoise.transactions import in_transaction
 from datetime import datetime, timezone
+from pathlib import Path
+import logging
 
 from models.tests import (
     Writing,
@@ -10,11 +12,17 @@ from models.tests import (
     WritingStatus,
     TestTypeEnum,
 )
-from services.analyses.writing_analyse_service import WritingAnalyseService
+from services.analyses.writing_analyse_service import WritingAnalyseService, analyse_to_dict
+from services.chart_renderer import CHART_TYPES, chart_renderer
+from services.chatgpt.resilience import ProviderUnavailableError
 from services.chatgpt.writing_integration import ChatGPTWritingIntegration
+from .task_pool import writing_task_pool
 from utils.get_actual_price import get_user_actual_test_price
 from models import TokenTransaction, TransactionType, User
 
+logger = logging.getLogger("writing_service")
+
+
 class WritingService:
     """
     Service for managing writing tests and sessions.
@@ -33,37 +41,10 @@ class WritingService:
                 detail=t.get("insufficient_tokens", "Insufficient tokens")
             )
 
-        # Generate questions using ChatGPT
-        chatgpt = ChatGPTWritingIntegration()
-        part1_data = await chatgpt.generate_writing_part1_question(user_id=user.id)
-        part2_data = await chatgpt.generate_writing_part2_question(user_id=user.id)
-
-        # Extract part 1 data
-        part1_question = part1_data["question"]
-        chart_type = part1_data["chart_type"]
-        categories = part1_data["categories"]
-        year1 = part1_data["year1"]
-        year2 = part1_data["year2"]
-        data_year1 = part1_data["data_year1"]
-        data_year2 = part1_data["data_year2"]
-
-        # Validate chart type
-        if chart_type not in ["bar", "line", "pie"]:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=t.get("unknown_chart_type", "Unknown chart type")
-            )
-
-        # Generate diagram
-        if chart_type == "bar":
-            diagram_path = chatgpt.create_bar_chart(categories, year1, year2, data_year1, data_year2)
-        elif chart_type == "line":
-            diagram_path = chatgpt.create_line_chart(categories, year1, year2, data_year1, data_year2)
-        elif chart_type == "pie":
-            diagram_path = chatgpt.create_pie_chart(categories, year1, year2, data_year1, data_year2)
-        diagram_path = diagram_path.replace("media/", "")
-
-        part2_question = part2_data["question"]
+        # Take a ready task from the pool, generate one only if it is empty
+        task = await writing_task_pool.pop()
+        if not task:
+            task = await WritingService._generate_task(user.id, t)
 
         # Create test session transaction
         async with in_transaction():
@@ -86,28 +67,72 @@ class WritingService:
             )
 
             # Create writing parts
-            diagram_data = {
-                "categories": categories,
-                "year1": year1,
-                "year2": year2,
-                "data_year1": data_year1,
-                "data_year2": data_year2,
-            }
             await WritingPart1.create(
                 writing=writing,
-                content=part1_question,
-                diagram=diagram_path,
-                diagram_data=diagram_data,
+                content=task["part1_question"],
+                diagram=task["diagram"],
+                diagram_data=task["diagram_data"],
                 answer="",
             )
             await WritingPart2.create(
                 writing=writing,
-                content=part2_question,
+                content=task["part2_question"],
                 answer="",
             )
 
         return await WritingService.get_session(writing.id, user.id, t)
 
+    @staticmethod
+    async def _generate_task(user_id: int, t: dict) -> Dict[str, Any]:
+        """
+        Generate both writing tasks concurrently. If only one of them fails,
+        replace it with the same part of a pooled task (the rest of that task
+        stays in the pool for the next such session); with an empty pool the
+        start fails like a failed generation. Questions other users have had
+        are never reused.
+        """
+        part1_data, part2_data = await ChatGPTWritingIntegration().generate_writing_questions(user_id=user_id)
+
+        task: Dict[str, Any] = {}
+        if not isinstance(part1_data, Exception):
+            try:
+                task.update(await writing_task_pool.build_part1(part1_data))
+            except (KeyError, ValueError) as e:
+                part1_data = e
+        if not isinstance(part2_data, Exception):
+            task["part2_question"] = part2_data["question"]
+
+        errors = {
+            part: result
+            for part, result in (("part1", part1_data), ("part2", part2_data))
+            if isinstance(result, Exception)
+        }
+        if len(errors) == 2:
+            logger.error(f"Writing generation failed for user {user_id}: {errors}")
+            for error in errors.values():
+                if isinstance(error, ProviderUnavailableError):
+                    # 503 with Retry-After rather than a generic failure
+                    raise error
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=t.get("question_generation_failed", "Failed to generate questions")
+            )
+
+        for part, error in errors.items():
+            logger.warning(f"Writing {part} generation failed for user {user_id}, using a replacement: {error!r}")
+            replacement = await writing_task_pool.pop_part(part)
+            if replacement is None:
+                if isinstance(error, ProviderUnavailableError):
+                    raise error
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=t.get("unknown_chart_type", "Unknown chart type")
+                    if isinstance(error, ValueError)
+                    else t.get("question_generation_failed", "Failed to generate questions")
+                )
+            task.update(replacement)
+        return task
+
     @staticmethod
     async def get_session(session_id: int, user_id: int, t: dict) -> "Writing":
         """
@@ -121,12 +146,48 @@ class WritingService:
             )
         return writing
 
+    @staticmethod
+    async def get_diagram(session_id: int, user_id: int, t: dict) -> Path:
+        """
+        Return the Task 1 diagram file of a session, rendering it first if it is missing.
+        """
+        part1 = await WritingPart1.get_or_none(writing_id=session_id, writing__user_id=user_id)
+        if not part1:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=t.get("session_not_found", "Session not found")
+            )
+
+        if part1.diagram and (chart_renderer.media_dir / part1.diagram).exists():
+            return chart_renderer.media_dir / part1.diagram
+
+        # Older sessions have no chart type in diagram_data and cannot be re-rendered
+        data = part1.diagram_data or {}
+        if data.get("chart_type") not in CHART_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=t.get("diagram_not_found", "Diagram not found")
+            )
+
+        diagram = await chart_renderer.render(data["chart_type"], data)
+        if part1.diagram != diagram:
+            part1.diagram = diagram
+            await part1.save(update_fields=["diagram"])
+        return chart_renderer.media_dir / diagram
+
     @staticmethod
     async def submit_answers(
-        session_id: int, user_id: int, part1_answer: str, part2_answer: str, t: dict, lang_code: str = "en"
+        session_id: int,
+        user_id: int,
+        part1_answer: str,
+        part2_answer: str,
+        t: dict,
+        lang_code: str = "en",
+        analyse: bool = True,
     ) -> Dict[str, Any]:
         """
         Submit answers and perform analysis.
+        With analyse=False only the answers are saved (the analysis is streamed separately).
         """
         # Validate session exists
         writing = await Writing.get_or_none(id=session_id, user_id=user_id).prefetch_related("part1", "part2")
@@ -156,39 +217,36 @@ class WritingService:
             writing.end_time = datetime.now(timezone.utc)
             await writing.save(update_fields=["status", "end_time"])
 
+        if not analyse:
+            return {
+                "message": t.get("answers_submitted", "Answers submitted successfully"),
+                "session_id": writing.id,
+            }
+
         # Get analysis
         writing_analyse = await WritingAnalyseService.analyse(writing.id, lang_code=lang_code, t=t)
 
         # Return results
         return {
             "message": t.get("answers_submitted", "Answers submitted successfully"),
-            "analysis": {
-                "task_achievement_feedback": writing_analyse.task_achievement_feedback,
-                "task_achievement_score": float(writing_analyse.task_achievement_score) 
-                    if writing_analyse.task_achievement_score is not None else None,
-                
-                "lexical_resource_feedback": writing_analyse.lexical_resource_feedback,
-                "lexical_resource_score": float(writing_analyse.lexical_resource_score) 
-                    if writing_analyse.lexical_resource_score is not None else None,
-                
-                "coherence_and_cohesion_feedback": writing_analyse.coherence_and_cohesion_feedback,
-                "coherence_and_cohesion_score": float(writing_analyse.coherence_and_cohesion_score) 
-                    if writing_analyse.coherence_and_cohesion_score is not None else None,
-                
-                "grammatical_range_and_accuracy_feedback": writing_analyse.grammatical_range_and_accuracy_feedback,
-                "grammatical_range_and_accuracy_score": float(writing_analyse.grammatical_range_and_accuracy_score) 
-                    if writing_analyse.grammatical_range_and_accuracy_score is not None else None,
-                
-                "word_count_feedback": writing_analyse.word_count_feedback,
-                "word_count_score": float(writing_analyse.word_count_score) 
-                    if writing_analyse.word_count_score is not None else None,
-                
-                "overall_band_score": float(writing_analyse.overall_band_score) 
-                    if writing_analyse.overall_band_score is not None else None,
-                
-                "total_feedback": writing_analyse.total_feedback,
-                "timing": writing_analyse.duration.total_seconds() if writing_analyse.duration else None,
-            },
+            "analysis": analyse_to_dict(writing_analyse),
+        }
+
+    @staticmethod
+    async def submit_answers_background(
+        session_id: int, user_id: int, part1_answer: str, part2_answer: str, t: dict, redis, lang_code: str = "en"
+    ) -> Dict[str, Any]:
+        """
+        Save answers and queue the analysis on the arq worker.
+        The result is fetched later from get_analysis.
+        """
+        await WritingService.submit_answers(
+            session_id, user_id, part1_answer, part2_answer, t, lang_code=lang_code, analyse=False
+        )
+        await redis.enqueue_job("analyse_writing", test_id=session_id, lang_code=lang_code, t=t)
+        return {
+            "message": t.get("analysis_started", "Analysis started, please try again later"),
+            "session_id": session_id,
         }
 
     @staticmethod
@@ -249,10 +307,7 @@ class WritingService:
         return {"message": t.get("session_restarted", "Session restarted")}
 
     @staticmethod
-    async def get_analysis(session_id: int, user_id: int, t: dict, request=None) -> Dict[str, Any]:
-        """
-        Get analysis for a completed session.
-        """
+    async def _get_completed(session_id: int, user_id: int, t: dict) -> "Writing":
         writing = await Writing.get_or_none(id=session_id, user_id=user_id)
         if not writing:
             raise HTTPException(
@@ -264,38 +319,29 @@ class WritingService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=t.get("session_not_completed", "Session not completed")
             )
-        
+        return writing
+
+    @staticmethod
+    async def get_analysis(session_id: int, user_id: int, t: dict, request=None) -> Dict[str, Any]:
+        """
+        Get analysis for a completed session.
+        """
+        writing = await WritingService._get_completed(session_id, user_id, t)
+
         lang_code = "en"
         if request:
             lang_code = request.headers.get("Accept-Language", "en").split(",")[0].lower()
         analyse = await WritingAnalyseService.analyse(writing.id, lang_code=lang_code, t=t)
         
-        return {
-            "analysis": {
-                "task_achievement_feedback": analyse.task_achievement_feedback,
-                "task_achievement_score": float(analyse.task_achievement_score) 
-                    if analyse.task_achievement_score is not None else None,
-                
-                "lexical_resource_feedback": analyse.lexical_resource_feedback,
-                "lexical_resource_score": float(analyse.lexical_resource_score) 
-                    if analyse.lexical_resource_score is not None else None,
-                
-                "coherence_and_cohesion_feedback": analyse.coherence_and_cohesion_feedback,
-                "coherence_and_cohesion_score": float(analyse.coherence_and_cohesion_score) 
-                    if analyse.coherence_and_cohesion_score is not None else None,
-                
-                "grammatical_range_and_accuracy_feedback": analyse.grammatical_range_and_accuracy_feedback,
-                "grammatical_range_and_accuracy_score": float(analyse.grammatical_range_and_accuracy_score) 
-                    if analyse.grammatical_range_and_accuracy_score is not None else None,
-                
-                "word_count_feedback": analyse.word_count_feedback,
-                "word_count_score": float(analyse.word_count_score) 
-                    if analyse.word_count_score is not None else None,
-                
-                "overall_band_score": float(analyse.overall_band_score) 
-                    if analyse.overall_band_score is not None else None,
-                
-                "total_feedback": analyse.total_feedback,
-                "timing": analyse.duration.total_seconds() if analyse.duration else None,
-            }
-        }
+        return {"analysis": analyse_to_dict(analyse)}
+
+    @staticmethod
+    async def stream_analysis(
+        session_id: int, user_id: int, t: dict, lang_code: str = "en"
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Analysis events of a completed session for an SSE response:
+        scores and feedback text as ChatGPT writes them, then the saved "result".
+        """
+        writing = await WritingService._get_completed(session_id, user_id, t)
+        return await WritingAnalyseService.analyse_stream(writing.id, lang_code=lang_code, t=t)
@@ -0,0 +1,33 @@
+import logging
+
+from config import TRANSCRIPTION_BACKEND, TRANSCRIPTION_FALLBACK
+from .base import TranscriptionBackend, TranscriptionUnavailable
+from .fallback import FallbackTranscriptionBackend
+from .local_backend import LocalWhisperBackend
+from .openai_backend import OpenAITranscriptionBackend
+
+BACKENDS = {
+    OpenAITranscriptionBackend.name: OpenAITranscriptionBackend,
+    LocalWhisperBackend.name: LocalWhisperBackend,
+}
+
+
+def get_transcription_backend(name: str = TRANSCRIPTION_BACKEND, fallback: str = TRANSCRIPTION_FALLBACK) -> TranscriptionBackend:
+    """
+    Build the configured backend, wrapped with the fallback one if set.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    if name == LocalWhisperBackend.name and not LocalWhisperBackend.is_available():
+        logging.getLogger("transcription").warning("faster-whisper is not installed, using OpenAI transcription")
+        name = OpenAITranscriptionBackend.name
+
+    backend = BACKENDS[name]()
+    if fallback and fallback != name:
+        if fallback not in BACKENDS:
+            raise ValueError(f"Unknown transcription fallback backend: {fallback}")
+        backend = FallbackTranscriptionBackend(backend, BACKENDS[fallback]())
+    return backend
+
+# Singleton instance for import
+transcription_backend = get_transcription_backend()
@@ -0,0 +1,38 @@
+import math
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+from fastapi import HTTPException, status
+
+
+class TranscriptionUnavailable(HTTPException):
+    """
+    The backend cannot transcribe right now (missing engine, rate limit, broken worker).
+    A fallback backend is tried; otherwise it is returned to the client as is.
+    `retry_after` is set when the backend is expected back after that many seconds,
+    so queued jobs can be deferred instead of failed.
+    """
+    def __init__(
+        self, detail: str, status_code: int = status.HTTP_503_SERVICE_UNAVAILABLE, retry_after: Optional[float] = None
+    ):
+        self.retry_after = retry_after
+        headers = {"Retry-After": str(math.ceil(retry_after))} if retry_after else None
+        super().__init__(status_code=status_code, detail=detail, headers=headers)
+
+
+class TranscriptionBackend(ABC):
+    """
+    Interface of a speech-to-text engine used by SpeakingService.
+    """
+    name = "base"
+
+    @abstractmethod
+    async def transcribe(self, audio_path: str | Path, lang: str = "en") -> str:
+        """
+        Text of the audio file, in `lang`.
+        """
+
+    def shutdown(self):
+        """
+        Release workers or clients held by the backend.
+        """
@@ -0,0 +1,29 @@
+import logging
+from pathlib import Path
+
+from .base import TranscriptionBackend, TranscriptionUnavailable
+
+logger = logging.getLogger("transcription")
+
+
+class FallbackTranscriptionBackend(TranscriptionBackend):
+    """
+    Uses the primary backend and switches to the fallback one
+    when the primary is rate limited or unavailable.
+    """
+
+    def __init__(self, primary: TranscriptionBackend, fallback: TranscriptionBackend):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    async def transcribe(self, audio_path: str | Path, lang: str = "en") -> str:
+        try:
+            return await self.primary.transcribe(audio_path, lang=lang)
+        except TranscriptionUnavailable as e:
+            logger.warning(f"Transcription falls back from {self.primary.name} to {self.fallback.name}: {e}")
+            return await self.fallback.transcribe(audio_path, lang=lang)
+
+    def shutdown(self):
+        self.primary.shutdown()
+        self.fallback.shutdown()
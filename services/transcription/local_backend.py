@@ -0,0 +1,84 @@
+import asyncio
+import importlib.util
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+from config import (
+    LOCAL_WHISPER_MODEL,
+    LOCAL_WHISPER_COMPUTE_TYPE,
+    LOCAL_WHISPER_WORKERS,
+    LOCAL_WHISPER_CPU_THREADS,
+)
+from .base import TranscriptionBackend, TranscriptionUnavailable
+
+logger = logging.getLogger("transcription")
+
+# Model loaded once per worker process
+_model = None
+
+
+def _load_model(model_name: str, compute_type: str, cpu_threads: int):
+    global _model
+    from faster_whisper import WhisperModel
+
+    _model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _transcribe(audio_path: str, lang: str) -> str:
+    segments, _ = _model.transcribe(audio_path, language=lang, vad_filter=True)
+    return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Offline Whisper on CPU (faster-whisper / CTranslate2) in a process pool.
+    Requires the optional `faster-whisper` package; the model is downloaded on first start.
+    """
+    name = "local"
+
+    def __init__(
+        self,
+        model_name: str = LOCAL_WHISPER_MODEL,
+        compute_type: str = LOCAL_WHISPER_COMPUTE_TYPE,
+        workers: int = LOCAL_WHISPER_WORKERS,
+        cpu_threads: int = LOCAL_WHISPER_CPU_THREADS,
+    ):
+        self.model_name = model_name
+        self.compute_type = compute_type
+        self.workers = workers
+        self.cpu_threads = cpu_threads
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def is_available() -> bool:
+        return importlib.util.find_spec("faster_whisper") is not None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_load_model,
+                initargs=(self.model_name, self.compute_type, self.cpu_threads),
+            )
+        return self._executor
+
+    async def transcribe(self, audio_path: str | Path, lang: str = "en") -> str:
+        if not self.is_available():
+            raise TranscriptionUnavailable("faster-whisper is not installed")
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), _transcribe, str(audio_path), lang)
+        except BrokenProcessPool as e:
+            # Model failed to load or a worker died: start a fresh pool next time
+            logger.error(f"Local transcription worker failed: {e}")
+            self.shutdown()
+            raise TranscriptionUnavailable("local transcription worker failed") from e
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,26 @@
+from pathlib import Path
+from fastapi import HTTPException
+from openai import RateLimitError
+
+from services.chatgpt.resilience import ProviderUnavailableError
+from services.chatgpt.speaking_integration import ChatGPTSpeakingIntegration
+from .base import TranscriptionBackend, TranscriptionUnavailable
+
+
+class OpenAITranscriptionBackend(TranscriptionBackend):
+    """
+    OpenAI whisper-1 API.
+    """
+    name = "openai"
+
+    async def transcribe(self, audio_path: str | Path, lang: str = "en") -> str:
+        try:
+            return await ChatGPTSpeakingIntegration().transcribe_audio_file_async(audio_path, lang=lang)
+        except ProviderUnavailableError as e:
+            # Transient errors were already retried; the circuit breaker may be open
+            raise TranscriptionUnavailable(e.detail, retry_after=e.retry_after) from e
+        except HTTPException as e:
+            # An exhausted quota is a 429 that is not retried
+            if isinstance(e.__cause__, RateLimitError):
+                raise TranscriptionUnavailable(e.detail) from e
+            raise
@@ -1,5 +1,7 @@
 import asyncio
+import functools
 from datetime import datetime, timezone
+from arq import Retry, cron
 from arq.connections import RedisSettings
 
 from services.analyses import (
@@ -8,8 +10,18 @@ from services.analyses import (
     SpeakingAnalyseService,
     WritingAnalyseService,
 )
+from services.tests.speaking_service import SpeakingService
+from services.tests.task_pool import speaking_question_pool, writing_task_pool
 from services.users.email_service import EmailService
-from models import User, UserActivityLog, Payment, Tariff, TokenTransaction, Message
+from services.chatgpt.base_integration import close_async_clients
+from services.chatgpt.reading_integration import passage_check_batcher
+from services.chatgpt.resilience import ProviderUnavailableError
+from services.chatgpt.telemetry import llm_telemetry
+from services.audio_preprocessor import audio_preprocessor
+from services.chart_renderer import chart_renderer
+from services.transcription import TranscriptionUnavailable, transcription_backend
+from config import WORKER_MAX_JOBS, WORKER_READING_CHECK_BATCH_WINDOW
+from models import User, UserActivityLog, Payment, Tariff, TokenTransaction, Message, WritingPart1
 
 from tortoise import Tortoise
 
@@ -40,24 +52,53 @@ async def ensure_tortoise():
 
 # === Analysis Tasks ===
 
+def defer_when_unavailable(func):
+    """
+    Re-queue the job for when OpenAI (or the transcription backend) accepts
+    calls again (circuit breaker reset or Retry-After) instead of failing it;
+    arq gives up after max_tries.
+    """
+    @functools.wraps(func)
+    async def wrapper(ctx, *args, **kwargs):
+        try:
+            return await func(ctx, *args, **kwargs)
+        except (ProviderUnavailableError, TranscriptionUnavailable) as e:
+            if e.retry_after is None:
+                raise
+            raise Retry(defer=e.retry_after)
+    return wrapper
+
+
 async def analyse_listening(ctx, session_id: int):
     await ensure_tortoise()
     await ListeningAnalyseService.analyse(session_id)
 
 
+@defer_when_unavailable
 async def analyse_reading(ctx, reading_id: int, user_id: int):
     await ensure_tortoise()
     await ReadingAnalyseService.analyse(reading_id, user_id)
 
 
+@defer_when_unavailable
 async def analyse_speaking(ctx, test_id: int, lang_code: str, t: dict):
     await ensure_tortoise()
     await SpeakingAnalyseService.analyse(test_id, lang_code=lang_code, t=t)
 
 
+@defer_when_unavailable
+async def process_speaking(ctx, test_id: int, lang_code: str, t: dict):
+    await ensure_tortoise()
+    # On the last try a provider outage marks the parts failed for get_analysis
+    await SpeakingService.process_answers(
+        test_id, lang_code=lang_code, t=t, retryable=ctx["job_try"] < WorkerSettings.max_tries
+    )
+
+
+@defer_when_unavailable
 async def analyse_writing(ctx, test_id: int, lang_code: str, t: dict):
     await ensure_tortoise()
-    await WritingAnalyseService.analyse(test_id, lang_code=lang_code, t=t)
+    await WritingAnalyseService.analyse(test_id, lang_code=lang_code, t=t, batched=True)
 
 
 # === Email Tasks ===
@@ -146,19 +187,47 @@ async def give_daily_tariff_bonus(ctx):
         )
 
 
+# === Task Pool Tasks ===
+
+async def refill_task_pools(ctx):
+    await speaking_question_pool.refill()
+    await writing_task_pool.refill()
+
+
+async def collect_writing_diagrams(ctx):
+    """
+    Delete diagram files that no writing part and no pooled task or spare half refers to.
+    """
+    await ensure_tortoise()
+    referenced = set(await WritingPart1.filter(diagram__isnull=False).values_list("diagram", flat=True))
+    referenced.update(await writing_task_pool.diagrams())
+    return await asyncio.to_thread(chart_renderer.collect_garbage, referenced)
+
+
 # === ARQ Worker Configuration ===
 
 class WorkerSettings:
     redis_settings = RedisSettings(host="localhost", port=6379)
+    # Analysis jobs mostly wait on OpenAI; running many at once lets them share batches
+    max_jobs = WORKER_MAX_JOBS
+    # arq's default; process_speaking gives up its parts on the last try
+    max_tries = 5
     functions = [
         analyse_listening,
         analyse_reading,
         analyse_speaking,
+        process_speaking,
         analyse_writing,
         send_email,
         log_user_activity,
         check_expired_tariffs,
         give_daily_tariff_bonus,
+        refill_task_pools,
+        collect_writing_diagrams,
+    ]
+    cron_jobs = [
+        cron(refill_task_pools, minute=set(range(0, 60, 10)), run_at_startup=True),
+        cron(collect_writing_diagrams, hour=4, minute=30),
     ]
 
     async def startup(self, ctx):
@@ -195,6 +264,9 @@ class WorkerSettings:
             )
             print("✅ Tortoise ORM initialized")
 
+            # Reading checks of concurrent jobs are batched per passage
+            passage_check_batcher.window = WORKER_READING_CHECK_BATCH_WINDOW
+
         except Exception as e:
             print(f"❌ Startup error: {e}")
             raise
@@ -202,6 +274,11 @@ class WorkerSettings:
     async def shutdown(self, ctx):
         try:
             await ctx["redis"].close()
+            await close_async_clients()
+            await llm_telemetry.flush()
+            audio_preprocessor.shutdown()
+            transcription_backend.shutdown()
+            chart_renderer.shutdown()
             await Tortoise.close_connections()
             print("🛑 Connections closed")
         except Exception as e:
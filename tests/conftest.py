@@ -0,0 +1,11 @@
+import os
+
+# Settings config.py requires without a default; real values come from .env
+for name, value in {
+    "SECRET_KEY": "test",
+    "DATABASE_URL": "sqlite://:memory:",
+    "ADMIN_USER_MODEL": "User",
+    "ADMIN_USER_MODEL_USERNAME_FIELD": "email",
+    "ADMIN_SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,18 @@
+from utils.ielts_score import (
+    LISTENING_BANDS,
+    READING_ACADEMIC_BANDS,
+    READING_GENERAL_BANDS,
+    band_score,
+    band_scores,
+)
+
+COUNTS = [-1, 0, 17, 40, 41]
+
+
+def test_band_scores_match_band_score():
+    for table in (LISTENING_BANDS, READING_ACADEMIC_BANDS, READING_GENERAL_BANDS):
+        assert band_scores(COUNTS, table) == [band_score(count, table) for count in COUNTS]
+
+
+def test_band_scores_clip_counts():
+    assert band_scores(COUNTS) == [0.0, 0.0, 5.0, 9.0, 9.0]
@@ -0,0 +1,23 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.metrics
+from api.metrics import router
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def test_metrics_hidden_without_token(monkeypatch):
+    monkeypatch.setattr(api.metrics, "METRICS_TOKEN", "")
+    for path in ("/metrics", "/metrics/llm/"):
+        assert client.get(path).status_code == 404
+        assert client.get(path, headers={"Authorization": "Bearer "}).status_code == 404
+
+
+def test_metrics_require_token(monkeypatch):
+    monkeypatch.setattr(api.metrics, "METRICS_TOKEN", "secret")
+    for path in ("/metrics", "/metrics/llm/"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
@@ -42,6 +42,7 @@ _TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "forbidden": "Forbidden",
         "no_answer_feedback": "No answer",
         "unknown_chart_type": "Unknown chart type",
+        "diagram_not_found": "Diagram not found",
 
         # --- Tests / Listening ---
         "no_listening_tests": "No listening tests available",
@@ -72,6 +73,7 @@ _TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "session_completed_successfully": "Reading session completed successfully",
         "session_restarted_successfully": "Reading session restarted successfully",
         "transaction_description": "Tokens deducted for test: {price}",
+        "invalid_question_ids": "Questions do not belong to this reading session",
 
         # --- Tests / Writing ---
         "no_writing_tests": "No writing tests available",
@@ -166,6 +168,7 @@ _TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "forbidden": "Доступ запрещён",
         "no_answer_feedback": "Нет ответа",
         "unknown_chart_type": "Неизвестный тип диаграммы",
+        "diagram_not_found": "Диаграмма не найдена",
 
         # --- Tests / Listening ---
         "no_listening_tests": "Нет доступных тестов прослушивания",
@@ -196,6 +199,7 @@ _TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "session_completed_successfully": "Сессия чтения успешно завершена",
         "session_restarted_successfully": "Сессия чтения успешно перезапущена",
         "transaction_description": "Списаны токены за тест: {price}",
+        "invalid_question_ids": "Вопросы не относятся к этой сессии чтения",
 
         # --- Tests / Writing ---
         "no_writing_tests": "Нет доступных тестов по письму",
@@ -290,6 +294,7 @@ _TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "forbidden": "Ruxsat yo'q",
         "no_answer_feedback": "Javob yo'q",
         "unknown_chart_type": "Noma'lum diagramma turi",
+        "diagram_not_found": "Diagramma topilmadi",
 
         # --- Tests / Listening ---
         "no_listening_tests": "Tinglash testlari mavjud emas",
@@ -320,6 +325,7 @@ _TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "session_completed_successfully": "O'qish sessiyasi muvaffaqiyatli yakunlandi",
         "session_restarted_successfully": "O'qish sessiyasi muvaffaqiyatli qayta boshlandi",
         "transaction_description": "Test uchun tokenlar yechib olindi: {price}",
+        "invalid_question_ids": "Savollar ushbu o'qish sessiyasiga tegishli emas",
 
         # --- Tests / Writing ---
         "no_writing_tests": "Yozish testlari mavjud emas",
@@ -1,6 +1,61 @@
 from models.analyses import ListeningAnalyse, SpeakingAnalyse, WritingAnalyse
 from models.tests import Reading
 
+MAX_CORRECT = 40
+
+
+def _band_table(thresholds: list[tuple[int, float]]) -> tuple[float, ...]:
+    """
+    Expand (minimum correct answers, band) pairs into a tuple indexed by the
+    number of correct answers (0..MAX_CORRECT).
+    """
+    table = [0.0] * (MAX_CORRECT + 1)
+    for minimum, band in sorted(thresholds):
+        table[minimum:] = [band] * (MAX_CORRECT + 1 - minimum)
+    return tuple(table)
+
+
+# IELTS Listening band conversion table (Academic/General Training)
+LISTENING_BANDS = _band_table([
+    (39, 9.0), (37, 8.5), (35, 8.0), (32, 7.5), (30, 7.0), (26, 6.5), (23, 6.0), (18, 5.5),
+    (16, 5.0), (13, 4.5), (10, 4.0), (7, 3.5), (5, 3.0), (3, 2.5), (1, 2.0), (0, 0.0),
+])
+
+# IELTS Academic Reading band conversion table
+READING_ACADEMIC_BANDS = _band_table([
+    (39, 9.0), (37, 8.5), (35, 8.0), (33, 7.5), (30, 7.0), (27, 6.5), (23, 6.0), (19, 5.5),
+    (15, 5.0), (13, 4.5), (10, 4.0), (8, 3.5), (6, 3.0), (4, 2.5), (1, 2.0), (0, 0.0),
+])
+
+# IELTS General Training Reading band conversion table
+READING_GENERAL_BANDS = _band_table([
+    (40, 9.0), (39, 8.5), (37, 8.0), (36, 7.5), (34, 7.0), (32, 6.5), (30, 6.0), (27, 5.5),
+    (23, 5.0), (19, 4.5), (15, 4.0), (12, 3.5), (9, 3.0), (6, 2.5), (1, 2.0), (0, 0.0),
+])
+
+
+def band_score(correct: int, table: tuple[float, ...] = LISTENING_BANDS) -> float:
+    """
+    Band for a number of correct answers; counts outside 0..40 are clipped.
+    """
+    return table[min(max(int(correct), 0), MAX_CORRECT)]
+
+
+def band_scores(correct_counts, table: tuple[float, ...] = LISTENING_BANDS) -> list[float]:
+    """
+    band_score for many sessions at once (recalculation jobs, leaderboards).
+    """
+    return [table[min(max(int(correct), 0), MAX_CORRECT)] for correct in correct_counts]
+
+
+def listening_band(correct: int) -> float:
+    return band_score(correct, LISTENING_BANDS)
+
+
+def reading_band(correct: int, general: bool = False) -> float:
+    return band_score(correct, READING_GENERAL_BANDS if general else READING_ACADEMIC_BANDS)
+
+
 class IELTSScoreCalculator:
     """
     Calculates average IELTS scores for users.
@@ -0,0 +1,77 @@
+import functools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+_EXECUTE_METHODS = ("execute_insert", "execute_query", "execute_many", "execute_query_dict", "execute_script")
+
+_current: ContextVar[Optional["QueryCounter"]] = ContextVar("query_counter", default=None)
+_inside: ContextVar[bool] = ContextVar("query_counter_inside", default=False)
+_installed = False
+
+
+class QueryCounter:
+    """
+    Number of SQL statements sent to the database inside a count_queries() block.
+    Statements of tasks started inside the block are included.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __repr__(self) -> str:
+        return f"QueryCounter(count={self.count})"
+
+
+def _wrap(method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        counter = _current.get()
+        if counter is None or _inside.get():
+            return await method(self, *args, **kwargs)
+        counter.count += 1
+        token = _inside.set(True)
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            _inside.reset(token)
+    return wrapper
+
+
+def _subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _subclasses(sub)
+
+
+def _install():
+    """
+    Wrap the execute_* methods of every loaded database client class once.
+    """
+    global _installed
+    if _installed:
+        return
+    for cls in _subclasses(BaseDBAsyncClient):
+        for name in _EXECUTE_METHODS:
+            if name in cls.__dict__:
+                setattr(cls, name, _wrap(cls.__dict__[name]))
+    _installed = True
+
+
+@asynccontextmanager
+async def count_queries():
+    """
+    Count database statements executed inside the block:
+
+        async with count_queries() as queries:
+            ...
+        logger.info(f"{queries.count} queries")
+    """
+    _install()
+    counter = QueryCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
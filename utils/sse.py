@@ -0,0 +1,69 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from config import ANALYSIS_STREAM_KEEPALIVE
+
+logger = logging.getLogger("sse")
+
+_FINISHED = object()
+# Strong references, so producers outlive a disconnected client
+_producers: set[asyncio.Task] = set()
+
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    One server-sent event frame.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _detached(events: AsyncIterator[tuple[str, Any]]) -> AsyncIterator[str]:
+    """
+    Run the event source in its own task and relay its events as SSE frames.
+    The task is not cancelled when the client disconnects, so an analysis that
+    has started is still finished and saved. Errors become an "error" event.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for event in events:
+                queue.put_nowait(event)
+        except HTTPException as e:
+            queue.put_nowait(("error", {"status_code": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            logger.exception(f"Event stream failed: {e}")
+            queue.put_nowait(("error", {"status_code": 500, "detail": "Internal server error"}))
+        finally:
+            queue.put_nowait(_FINISHED)
+
+    task = asyncio.create_task(produce())
+    _producers.add(task)
+    task.add_done_callback(_producers.discard)
+    while True:
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout=ANALYSIS_STREAM_KEEPALIVE)
+        except asyncio.TimeoutError:
+            # Comment line: keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+            continue
+        if item is _FINISHED:
+            break
+        yield sse_event(*item)
+    await task
+
+
+def sse_response(events: AsyncIterator[tuple[str, Any]]) -> StreamingResponse:
+    """
+    text/event-stream response for (event, data) pairs, with proxy buffering disabled.
+    """
+    return StreamingResponse(
+        _detached(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )